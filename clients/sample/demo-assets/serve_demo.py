@@ -1,15 +1,317 @@
+#!/usr/bin/env python3
+"""
+Demo Assets Server
+
+Purpose: Serves the mock Stripe / email / cancellation pages used in live
+demos and the screen-recorded walkthroughs (marketing/DEMO_RECORDING_GUIDE.md).
+
+    - one thread per connection with HTTP/1.1 keep-alive, so a slow client
+      never blocks the page being demoed
+    - in-memory LRU cache of small files, revalidated by mtime on every hit
+    - ETag / If-None-Match -> 304 Not Modified (gzip / br bodies get their
+      own -gz / -br ETag, so caches never mix up representations)
+    - /dir -> 301 /dir/, so pages' relative links resolve
+    - serves precompressed .br / .gz siblings when present (see
+      execution/bundle_deployments.py), otherwise gzips text files once and
+      caches the result
+    - files too large for the cache are streamed with sendfile (zero-copy)
+
+Usage:
+    python3 serve_demo.py                     # http://localhost:8080
+    python3 serve_demo.py --port 9000 --directory ../../../marketing/bundle   # then open /x-dental/
+    python3 serve_demo.py --legacy            # old single-threaded server (for comparison)
+
+Load test: python3 execution/benchmark_demo_server.py
+"""
+
+import os
+import gzip
+import stat
+import hashlib
+import argparse
+import mimetypes
+import threading
 import http.server
 import socketserver
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import unquote, urlsplit
 
 PORT = 8080
-DIRECTORY = "."
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+CACHE_MAX_FILE_BYTES = 1024 * 1024      # larger files go through sendfile
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+MIN_GZIP_BYTES = 512
+ETAG_SUFFIXES = {"br": "-br", "gzip": "-gz"}   # per Content-Encoding, appended inside the quotes
+
+
+# =============================================================================
+# File cache
+# =============================================================================
+
+class CachedFile:
+    __slots__ = ("mtime_ns", "size", "etag", "body", "variants", "content_type", "last_modified")
+
+    def __init__(self, path: str, st: os.stat_result, body: bytes):
+        self.mtime_ns, self.size, self.body = st.st_mtime_ns, st.st_size, body
+        self.etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+        self.content_type = guess_type(path)
+        self.last_modified = formatdate(st.st_mtime, usegmt=True)
+        self.variants = {}                  # encoding -> compressed body
+        for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+            try:
+                with open(path + suffix, "rb") as f:
+                    self.variants[encoding] = f.read()
+            except OSError:
+                pass
+        if "gzip" not in self.variants and len(body) >= MIN_GZIP_BYTES and \
+                self.content_type.startswith(COMPRESSIBLE_TYPES):
+            self.variants["gzip"] = gzip.compress(body, compresslevel=6, mtime=0)
+
+    def cost(self) -> int:
+        return len(self.body) + sum(len(v) for v in self.variants.values())
+
+
+class FileCache:
+    """Thread-safe LRU keyed by path; an entry is only used while its mtime/size still match."""
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, path: str, st: os.stat_result):
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry and entry.mtime_ns == st.st_mtime_ns and entry.size == st.st_size:
+                self.entries.move_to_end(path)
+                self.hits += 1
+                return entry
+        with open(path, "rb") as f:
+            entry = CachedFile(path, st, f.read())
+        with self.lock:
+            self.misses += 1
+            old = self.entries.pop(path, None)
+            if old:
+                self.bytes -= old.cost()
+            self.entries[path] = entry
+            self.bytes += entry.cost()
+            while self.bytes > self.max_bytes and len(self.entries) > 1:
+                _, evicted = self.entries.popitem(last=False)
+                self.bytes -= evicted.cost()
+        return entry
+
+
+def guess_type(path: str) -> str:
+    content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    if content_type.startswith("text/") or content_type in ("application/javascript", "application/json"):
+        content_type += "; charset=utf-8"
+    return content_type
+
+
+def accepted_encodings(header: str) -> set:
+    """Codings the client accepts (q=0 means refused)."""
+    accepted = set()
+    for part in (header or "").split(","):
+        name, _, params = part.partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name.strip() and q > 0:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+# =============================================================================
+# Handler
+# =============================================================================
+
+class DemoHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server_version = "DemoAssets/2.0"
+    root = DIRECTORY
+    cache = None
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        self.serve(send_body=True)
+
+    def do_HEAD(self):
+        self.serve(send_body=False)
+
+    def resolve(self):
+        """URL path -> file path inside root (None if outside or missing).
+
+        A directory requested without its trailing slash resolves to the
+        directory itself, which serve() answers with a redirect.
+        """
+        url_path = urlsplit(self.path).path
+        path = os.path.realpath(os.path.join(self.root, unquote(url_path).lstrip("/")))
+        if path != self.root and not path.startswith(self.root + os.sep):
+            return None
+        if os.path.isdir(path) and url_path.endswith("/"):
+            path = os.path.join(path, "index.html")
+        return path
+
+    def redirect_to_directory(self):
+        """301 to the URL with a trailing slash, so the page's relative links resolve."""
+        parts = urlsplit(self.path)
+        location = "/" + parts.path.lstrip("/") + "/"    # never "//host/": no open redirect
+        if parts.query:
+            location += "?" + parts.query
+        self.send_response(301)
+        self.send_header("Location", location)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def error(self, status: int, message: str):
+        body = f"{status} {message}\n".encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def serve(self, send_body: bool):
+        path = self.resolve()
+        try:
+            st = os.stat(path) if path else None
+        except OSError:
+            st = None
+        if st is not None and stat.S_ISDIR(st.st_mode):
+            return self.redirect_to_directory()
+        if st is None or not stat.S_ISREG(st.st_mode):
+            return self.error(404, "Not Found")
+
+        if st.st_size > CACHE_MAX_FILE_BYTES:
+            return self.serve_large(path, st, send_body)
+
+        entry = self.cache.get(path, st)
+        cache_control = "no-cache" if entry.content_type.startswith("text/html") else "public, max-age=3600"
+        body, encoding = entry.body, None
+        accepted = accepted_encodings(self.headers.get("Accept-Encoding"))
+        for candidate in ("br", "gzip"):
+            if candidate in accepted and candidate in entry.variants:
+                body, encoding = entry.variants[candidate], candidate
+                break
+        # each representation gets its own strong validator (RFC 9110 8.8.3)
+        etag = entry.etag[:-1] + ETAG_SUFFIXES[encoding] + '"' if encoding else entry.etag
+
+        if self.not_modified(etag, st):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", cache_control)
+            if entry.variants:
+                self.send_header("Vary", "Accept-Encoding")
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", entry.content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", entry.last_modified)
+        self.send_header("Cache-Control", cache_control)
+        if entry.variants:
+            self.send_header("Vary", "Accept-Encoding")
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def serve_large(self, path: str, st: os.stat_result, send_body: bool):
+        etag = f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+        if self.not_modified(etag, st):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", guess_type(path))
+        self.send_header("Content-Length", str(st.st_size))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", formatdate(st.st_mtime, usegmt=True))
+        self.send_header("Cache-Control", "public, max-age=3600")
+        self.end_headers()
+        if send_body:
+            with open(path, "rb") as f:
+                self.connection.sendfile(f)
+
+    def not_modified(self, etag: str, st: os.stat_result) -> bool:
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            tags = [t.strip() for t in if_none_match.split(",")]
+            return "*" in tags or etag in tags or f"W/{etag}" in tags
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since:
+            try:
+                return int(st.st_mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+
+class DemoServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    verbose = False
+
+
+# =============================================================================
+# Entry point
+# =============================================================================
+
+def run_legacy(port: int, directory: str):
+    """The original single-threaded server, kept for load-test comparisons."""
+    class Handler(http.server.SimpleHTTPRequestHandler):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, directory=directory, **kwargs)
+
+        def log_message(self, format, *args):
+            pass
+
+    with socketserver.TCPServer(("", port), Handler) as httpd:
+        print(f"✅ Demo Assets Server (legacy) running at http://localhost:{port}")
+        httpd.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Demo assets server")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--directory", default=DIRECTORY)
+    parser.add_argument("--legacy", action="store_true", help="Old single-threaded SimpleHTTPRequestHandler")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    directory = os.path.realpath(args.directory)
+    if args.legacy:
+        socketserver.TCPServer.allow_reuse_address = True
+        return run_legacy(args.port, directory)
+
+    handler = type("Handler", (DemoHandler,), {"root": directory, "cache": FileCache()})
+    server = DemoServer(("", args.port), handler)
+    server.verbose = args.verbose
+    print(f"✅ Demo Assets Server running at http://localhost:{args.port}")
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".html"):
+            print(f"👉 http://localhost:{args.port}/{name}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
 
-class Handler(http.server.SimpleHTTPRequestHandler):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, directory=DIRECTORY, **kwargs)
 
-with socketserver.TCPServer(("", PORT), Handler) as httpd:
-    print(f"✅ Demo Assets Server running at http://localhost:{PORT}")
-    print(f"👉 Mock Stripe: http://localhost:{PORT}/stripe-checkout.html")
-    print(f"👉 Mock Email: http://localhost:{PORT}/email-confirmation.html")
-    httpd.serve_forever()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,592 @@
+#!/usr/bin/env python3
+"""
+Rollup-Based Analytics Engine
+
+Purpose: Produces the monthly analytics report data for n8n-9-monthly-analytics
+(the exact JSON `Aggregate Analytics` hands to `Generate Report HTML`) from
+daily per-clinic rollups stored locally, instead of fetching a month of raw
+bookings and booking_events on every run.
+
+How it works:
+    - bookings (by created_at) and booking_events are streamed with keyset
+      pagination, one page in memory at a time
+    - each row is folded into per-day counters in a single pass
+    - closed (UTC) days are stored in SQLite and marked rolled; a report for a
+      month / quarter / year reads the rollups and only fetches the days that
+      are missing, plus today's partial day
+    - bookings edited after their day was rolled (cancellations, actual_status,
+      reviews) are detected through bookings.updated_at and their days are
+      re-rolled (requires platform/widget/sql/16_bookings_updated_at.sql)
+
+Unique / returning patients are not additive across days, so rollups keep one
+row per (clinic, day, patient email) and the report counts them per period.
+
+Usage:
+    python3 analytics_rollup.py report                     # Current month to date
+    python3 analytics_rollup.py report --month 2026-09
+    python3 analytics_rollup.py report --quarter 2026-Q3 --clinic butkevica
+    python3 analytics_rollup.py report --year 2026
+    python3 analytics_rollup.py parity --synthetic 50000   # Offline check vs Aggregate Analytics
+
+Environment Variables:
+    SUPABASE_URL - Supabase project URL
+    SUPABASE_SERVICE_KEY - Service role key
+    ANALYTICS_DIR - Local rollup directory (default: /home/n8n/analytics)
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+from decimal import Decimal, ROUND_HALF_UP
+from datetime import date as date_cls, datetime, timedelta, timezone
+
+from env_config import load_env
+from slot_availability import parse_ts
+from postgrest_client import PostgrestClient
+from config_mirror import mirrored_rows
+
+# Configuration
+ANALYTICS_DIR = os.getenv("ANALYTICS_DIR", "/home/n8n/analytics")
+ROLLUP_FILE = os.path.join(ANALYTICS_DIR, "analytics_rollups.sqlite")
+PAGE_SIZE = 1000
+REQUEST_TIMEOUT = 30
+CHANGE_OVERLAP_SECONDS = 600
+
+MONTH_NAMES_LV = ["Janvāris", "Februāris", "Marts", "Aprīlis", "Maijs", "Jūnijs", "Jūlijs",
+                  "Augusts", "Septembris", "Oktobris", "Novembris", "Decembris"]
+FUNNEL_EVENTS = ["widget_open", "step_1_service", "step_2_specialist", "step_3_datetime",
+                 "step_4_details", "step_5_payment", "booking_complete"]
+BOOKING_COLUMNS = ("id,clinic_id,status,actual_status,amount_cents,service_id,service_name,"
+                   "customer_email,created_at,start_time,review_requested_at,review_completed_at")
+EVENT_COLUMNS = "id,business_id,event_type,created_at"
+EXCLUDED_STATUSES = ("pending", "expired")
+ALL = "*"
+
+
+# =============================================================================
+# Helpers
+# =============================================================================
+
+def js_to_fixed(value: float, digits: int) -> str:
+    """Number.prototype.toFixed (round half up on the exact binary value)."""
+    return str(Decimal(value).quantize(Decimal(1).scaleb(-digits), rounding=ROUND_HALF_UP))
+
+
+def utc_day(value: str) -> str:
+    return datetime.fromtimestamp(parse_ts(value), tz=timezone.utc).date().isoformat()
+
+
+def day_bounds(day: date_cls) -> tuple:
+    start = datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+    return start, start + timedelta(days=1)
+
+
+def service_map(services: list) -> dict:
+    """doctors_services rows -> {id: (name, price_cents)}."""
+    return {s["id"]: (s.get("name_en") or s.get("name_lv"), s.get("price_cents") or 0) for s in services}
+
+
+# =============================================================================
+# Data sources
+# =============================================================================
+
+class SupabaseSource:
+    """Streams bookings / booking_events / doctors_services from PostgREST."""
+
+    def __init__(self, client: PostgrestClient = None):
+        self.client = client or PostgrestClient.from_env(timeout=REQUEST_TIMEOUT)
+
+    def stream(self, table: str, select: str, filters: dict, order_column: str):
+        """Yield rows ordered by (order_column, id) with keyset pagination."""
+        return self.client.stream(table, select, filters, order_column, page_size=PAGE_SIZE)
+
+    def bookings(self, start: datetime, end: datetime):
+        return self.stream("bookings", BOOKING_COLUMNS, {
+            "and": f"(created_at.gte.{start.isoformat()},created_at.lt.{end.isoformat()})",
+            "status": f"not.in.({','.join(EXCLUDED_STATUSES)})",
+        }, "created_at")
+
+    def events(self, start: datetime, end: datetime):
+        return self.stream("booking_events", EVENT_COLUMNS, {
+            "and": f"(created_at.gte.{start.isoformat()},created_at.lt.{end.isoformat()})",
+        }, "created_at")
+
+    def services(self) -> list:
+        mirrored = mirrored_rows("doctors_services")
+        if mirrored is not None:
+            return mirrored
+        return self.client.fetch_all("doctors_services", "id,name_en,name_lv,price_cents", cache=True)
+
+    def changed_days(self, since: str):
+        """Creation days of bookings modified after `since`; returns (days, newest updated_at)."""
+        days, newest = set(), since
+        for row in self.stream("bookings", "id,created_at,updated_at",
+                               {"updated_at": f"gt.{since}"}, "updated_at"):
+            if row.get("created_at"):
+                days.add(utc_day(row["created_at"]))
+            newest = row["updated_at"]
+        return days, newest
+
+
+class ListSource:
+    """In-memory rows with the same interface (parity checks and benchmarks)."""
+
+    def __init__(self, bookings: list, events: list, services: list):
+        self.booking_rows, self.event_rows, self.service_rows = bookings, events, services
+        self.fetched = 0
+
+    def _range(self, rows, start, end):
+        lo, hi = start.timestamp(), end.timestamp()
+        for row in rows:
+            if lo <= parse_ts(row["created_at"]) < hi:
+                self.fetched += 1
+                yield row
+
+    def bookings(self, start, end):
+        return (b for b in self._range(self.booking_rows, start, end)
+                if b.get("status") is not None and b["status"] not in EXCLUDED_STATUSES)
+
+    def events(self, start, end):
+        return self._range(self.event_rows, start, end)
+
+    def services(self):
+        return self.service_rows
+
+    def changed_days(self, since):
+        return set(), since
+
+
+# =============================================================================
+# Rollup store
+# =============================================================================
+
+class RollupStore:
+    """Daily rollups per clinic (bookings) and per business (funnel events)."""
+
+    def __init__(self, path: str = ROLLUP_FILE):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS day_bookings (
+                clinic TEXT, day TEXT, total INTEGER, confirmed INTEGER, cancelled INTEGER,
+                completed INTEGER, no_show INTEGER, revenue_cents INTEGER,
+                lead_days_sum REAL, lead_count INTEGER,
+                reviews_requested INTEGER, reviews_completed INTEGER,
+                PRIMARY KEY (clinic, day)
+            );
+            CREATE TABLE IF NOT EXISTS day_patients (
+                clinic TEXT, day TEXT, email TEXT, bookings INTEGER,
+                PRIMARY KEY (clinic, day, email)
+            );
+            CREATE TABLE IF NOT EXISTS day_services (
+                clinic TEXT, day TEXT, service_id TEXT, name TEXT, count INTEGER, revenue_cents INTEGER,
+                PRIMARY KEY (clinic, day, service_id)
+            );
+            CREATE TABLE IF NOT EXISTS day_events (
+                business TEXT, day TEXT, event_type TEXT, count INTEGER,
+                PRIMARY KEY (business, day, event_type)
+            );
+            CREATE TABLE IF NOT EXISTS rolled_days (day TEXT PRIMARY KEY, rolled_at TEXT);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE INDEX IF NOT EXISTS day_bookings_day ON day_bookings (day);
+            CREATE INDEX IF NOT EXISTS day_patients_day ON day_patients (day);
+            CREATE INDEX IF NOT EXISTS day_services_day ON day_services (day);
+            CREATE INDEX IF NOT EXISTS day_events_day ON day_events (day);
+            """
+        )
+
+    def close(self):
+        self.db.close()
+
+    def get_meta(self, key):
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        self.db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
+
+    def drop_days(self, days):
+        for table in ("day_bookings", "day_patients", "day_services", "day_events", "rolled_days"):
+            self.db.executemany(f"DELETE FROM {table} WHERE day = ?", [(d,) for d in days])
+
+    def purge_unrolled(self):
+        """Remove partial-day rows left by an earlier report."""
+        for table in ("day_bookings", "day_patients", "day_services", "day_events"):
+            self.db.execute(f"DELETE FROM {table} WHERE day NOT IN (SELECT day FROM rolled_days)")
+
+    def rolled(self, first: str, last: str) -> set:
+        return {row[0] for row in self.db.execute(
+            "SELECT day FROM rolled_days WHERE day BETWEEN ? AND ?", (first, last))}
+
+    def roll(self, source, services: dict, start: datetime, end: datetime, mark: bool):
+        """Fold one contiguous [start, end) range of bookings and events into day rows."""
+        days, patients, per_service, events = {}, {}, {}, {}
+        for b in source.bookings(start, end):
+            day = utc_day(b["created_at"])
+            key = (b.get("clinic_id") or "", day)
+            d = days.setdefault(key, [0] * 10)
+            d[0] += 1
+            status, actual = b.get("status"), b.get("actual_status")
+            if status == "cancelled":
+                d[2] += 1
+            d[3] += actual == "completed"
+            d[4] += actual == "no_show"
+            if b.get("start_time") and b.get("created_at"):
+                d[6] += (parse_ts(b["start_time"]) - parse_ts(b["created_at"])) / 86400
+                d[7] += 1
+            d[8] += bool(b.get("review_requested_at"))
+            d[9] += bool(b.get("review_completed_at"))
+            email = (b.get("customer_email") or "").lower()
+            if email:
+                patients[key + (email,)] = patients.get(key + (email,), 0) + 1
+            if status == "confirmed":
+                d[1] += 1
+                sid = b.get("service_id")
+                name, price_cents = services.get(sid, (None, None))
+                cents = b.get("amount_cents") or price_cents or 0
+                d[5] += cents
+                s = per_service.setdefault(key + (sid,), [b.get("service_name") or name or sid, 0, 0])
+                s[1] += 1
+                s[2] += cents
+
+        for e in source.events(start, end):
+            key = (e.get("business_id") or "", utc_day(e["created_at"]), e.get("event_type"))
+            events[key] = events.get(key, 0) + 1
+
+        self.db.executemany("INSERT OR REPLACE INTO day_bookings VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                            [k + tuple(v) for k, v in days.items()])
+        self.db.executemany("INSERT OR REPLACE INTO day_patients VALUES (?, ?, ?, ?)",
+                            [k + (v,) for k, v in patients.items()])
+        self.db.executemany("INSERT OR REPLACE INTO day_services VALUES (?, ?, ?, ?, ?, ?)",
+                            [k + tuple(v) for k, v in per_service.items()])
+        self.db.executemany("INSERT OR REPLACE INTO day_events VALUES (?, ?, ?, ?)",
+                            [k + (v,) for k, v in events.items()])
+        if mark:
+            now = datetime.now(timezone.utc).isoformat()
+            day = start.date()
+            while day < end.date():
+                self.db.execute("INSERT OR REPLACE INTO rolled_days VALUES (?, ?)", (day.isoformat(), now))
+                day += timedelta(days=1)
+
+    def aggregate(self, first: str, last: str, clinic: str = ALL, business: str = ALL) -> dict:
+        """Sum day rows in [first, last] into the Aggregate Analytics fields."""
+        where = "day BETWEEN ? AND ?" + ("" if clinic == ALL else " AND clinic = ?")
+        params = [first, last] + ([] if clinic == ALL else [clinic])
+        (total, confirmed, cancelled, completed, no_show, revenue_cents, lead_sum, lead_count,
+         requested, reviewed) = [v or 0 for v in self.db.execute(
+            "SELECT SUM(total), SUM(confirmed), SUM(cancelled), SUM(completed), SUM(no_show), "
+            "SUM(revenue_cents), SUM(lead_days_sum), SUM(lead_count), SUM(reviews_requested), "
+            f"SUM(reviews_completed) FROM day_bookings WHERE {where}", params).fetchone()]
+        unique, returning = [v or 0 for v in self.db.execute(
+            "SELECT COUNT(*), SUM(n > 1) FROM (SELECT SUM(bookings) AS n FROM day_patients "
+            f"WHERE {where} GROUP BY email)", params).fetchone()]
+        services = [{"name": name, "count": count, "revenue": cents / 100}
+                    for name, count, cents in self.db.execute(
+                        "SELECT (SELECT name FROM day_services s2 WHERE s2.service_id = s.service_id "
+                        f"AND {where.replace('day', 's2.day').replace('clinic', 's2.clinic')} "
+                        "ORDER BY s2.day LIMIT 1), SUM(count), SUM(revenue_cents) "
+                        f"FROM day_services s WHERE {where} GROUP BY service_id", params + params)]
+        services.sort(key=lambda s: -s["revenue"])
+
+        ewhere = "day BETWEEN ? AND ?" + ("" if business == ALL else " AND business = ?")
+        eparams = [first, last] + ([] if business == ALL else [business])
+        events = dict(self.db.execute(
+            f"SELECT event_type, SUM(count) FROM day_events WHERE {ewhere} GROUP BY event_type", eparams))
+
+        return report_fields(total, confirmed, cancelled, completed, no_show, revenue_cents / 100,
+                             unique, returning, lead_sum, lead_count, requested, reviewed,
+                             services[:5], events)
+
+
+def report_fields(total, confirmed, cancelled, completed, no_show, revenue, unique, returning,
+                  lead_sum, lead_count, requested, reviewed, top_services, events) -> dict:
+    """Shape the metrics exactly like the Aggregate Analytics Code node output."""
+    opens = events.get("widget_open", 0)
+    finished = events.get("booking_complete", 0)
+    return {
+        "total_bookings": total,
+        "confirmed_bookings": confirmed,
+        "cancelled_bookings": cancelled,
+        "total_revenue": js_to_fixed(revenue, 2),
+        "unique_patients": unique,
+        "returning_patients": returning,
+        "avg_lead_time_days": js_to_fixed(lead_sum / lead_count, 1) if lead_count else 0,
+        "completed_bookings": completed,
+        "no_show_bookings": no_show,
+        "show_rate": js_to_fixed(completed / (completed + no_show) * 100, 0)
+        if completed + no_show > 0 else "N/A",
+        "reviews_requested": requested,
+        "reviews_completed": reviewed,
+        "review_conversion_rate": js_to_fixed(reviewed / requested * 100, 0) if requested > 0 else "N/A",
+        "widget_opens": opens,
+        "funnel_step_1": events.get("step_1_service", 0),
+        "funnel_step_2": events.get("step_2_specialist", 0),
+        "funnel_step_3": events.get("step_3_datetime", 0),
+        "funnel_step_4": events.get("step_4_details", 0),
+        "funnel_step_5": events.get("step_5_payment", 0),
+        "funnel_completed": finished,
+        "conversion_rate": js_to_fixed(finished / opens * 100, 1) if opens > 0 else 0,
+        "top_services": top_services,
+    }
+
+
+# =============================================================================
+# Reports
+# =============================================================================
+
+def period_header(start: datetime, end: datetime, title: str) -> dict:
+    """`Calculate Month Range` fields consumed by Generate Report HTML."""
+    return {
+        "month_start": start.isoformat().replace("+00:00", ".000Z"),
+        "month_end": end.isoformat(timespec="milliseconds").replace("+00:00", "Z"),
+        "month_name": MONTH_NAMES_LV[start.month - 1],
+        "year": start.year,
+        "report_title": title,
+    }
+
+
+def resolve_period(month: str = None, quarter: str = None, year: str = None, now: datetime = None):
+    """Return (start, end, title). Default: current month up to now (workflow behaviour)."""
+    now = now or datetime.now(timezone.utc)
+    if quarter:
+        y, q = quarter.upper().split("-Q")
+        start = datetime(int(y), (int(q) - 1) * 3 + 1, 1, tzinfo=timezone.utc)
+        months, title = 3, f"{y}. gada {q}. ceturkšņa Analītikas Pārskats"
+    elif year:
+        start = datetime(int(year), 1, 1, tzinfo=timezone.utc)
+        months, title = 12, f"{year}. gada Analītikas Pārskats"
+    elif month:
+        y, m = (int(p) for p in month.split("-"))
+        start = datetime(y, m, 1, tzinfo=timezone.utc)
+        months, title = 1, f"{MONTH_NAMES_LV[m - 1]} {y} Analītikas Pārskats"
+    else:
+        start = datetime(now.year, now.month, 1, tzinfo=timezone.utc)
+        return start, now, f"{MONTH_NAMES_LV[now.month - 1]} {now.year} Analītikas Pārskats (līdz šim)"
+    total = start.month - 1 + months
+    end = datetime(start.year + total // 12, total % 12 + 1, 1, tzinfo=timezone.utc)
+    if end > now:
+        end, title = now, title + " (līdz šim)"
+    return start, end, title
+
+
+def invalidate_changed(store: RollupStore, source) -> int:
+    """Drop rolled days containing bookings edited since the last check."""
+    since = store.get_meta("changes_checked_at")
+    if since is None:
+        store.set_meta("changes_checked_at", datetime.now(timezone.utc).isoformat())
+        return 0
+    lookback = datetime.fromtimestamp(parse_ts(since) - CHANGE_OVERLAP_SECONDS, tz=timezone.utc)
+    days, newest = source.changed_days(lookback.isoformat())
+    store.drop_days(days)
+    store.set_meta("changes_checked_at", newest if newest != lookback.isoformat() else since)
+    return len(days)
+
+
+def build_report(store: RollupStore, source, start: datetime, end: datetime, title: str,
+                 clinic: str = ALL, business: str = ALL, now: datetime = None) -> dict:
+    """Fill missing rollup days for [start, end), then aggregate from the store."""
+    now = now or datetime.now(timezone.utc)
+    started = time.perf_counter()
+    store.purge_unrolled()
+    invalidated = invalidate_changed(store, source)
+    services = service_map(source.services())
+
+    today = now.date()
+    first, last_day = start.date(), (end - timedelta(microseconds=1)).date()
+    rolled = store.rolled(first.isoformat(), last_day.isoformat())
+    missing, day = [], first
+    while day <= last_day and day < today:
+        if day.isoformat() not in rolled:
+            missing.append(day)
+        day += timedelta(days=1)
+
+    # Contiguous runs of missing closed days -> one streamed fetch each
+    runs = []
+    for day in missing:
+        if runs and runs[-1][1] == day:
+            runs[-1][1] = day + timedelta(days=1)
+        else:
+            runs.append([day, day + timedelta(days=1)])
+    for run_start, run_end in runs:
+        store.roll(source, services, day_bounds(run_start)[0], day_bounds(run_end)[0], mark=True)
+    if last_day >= today:
+        store.roll(source, services, day_bounds(today)[0], min(end, day_bounds(today)[1]), mark=False)
+    store.db.commit()
+
+    result = period_header(start, end, title)
+    result.update(store.aggregate(first.isoformat(), last_day.isoformat(), clinic, business))
+    print(f"📊 {len(rolled)} day(s) from rollups, {len(missing)} rolled now, {invalidated} invalidated, "
+          f"{time.perf_counter() - started:.2f}s", file=sys.stderr)
+    return result
+
+
+# =============================================================================
+# Parity check (port of the Aggregate Analytics Code node)
+# =============================================================================
+
+def legacy_aggregate(bookings: list, events: list, services: list) -> dict:
+    service_lookup = {s["id"]: {"name": s.get("name_en") or s.get("name_lv"),
+                                "price": (s.get("price_cents") or 0) / 100} for s in services}
+    confirmed = [b for b in bookings if b.get("status") == "confirmed"]
+    completed = sum(1 for b in bookings if b.get("actual_status") == "completed")
+    no_show = sum(1 for b in bookings if b.get("actual_status") == "no_show")
+
+    revenue = 0
+    for b in confirmed:
+        if b.get("amount_cents"):
+            revenue += b["amount_cents"] / 100
+        elif b.get("service_id") in service_lookup:
+            revenue += service_lookup[b["service_id"]]["price"]
+
+    counts = {}
+    for b in bookings:
+        email = (b.get("customer_email") or "").lower()
+        if email:
+            counts[email] = counts.get(email, 0) + 1
+
+    leads = [(parse_ts(b["start_time"]) - parse_ts(b["created_at"])) / 86400
+             for b in bookings if b.get("start_time") and b.get("created_at")]
+
+    per_service = {}
+    for b in confirmed:
+        sid = b.get("service_id")
+        s = per_service.setdefault(sid, {"count": 0, "revenue": 0, "name": b.get("service_name")
+                                         or (service_lookup.get(sid) or {}).get("name") or sid})
+        s["count"] += 1
+        if b.get("amount_cents"):
+            s["revenue"] += b["amount_cents"] / 100
+        elif sid in service_lookup:
+            s["revenue"] += service_lookup[sid]["price"]
+    top = sorted(({"name": s["name"], "count": s["count"], "revenue": s["revenue"]}
+                  for s in per_service.values()), key=lambda s: -s["revenue"])[:5]
+
+    event_counts = {}
+    for e in events:
+        event_counts[e["event_type"]] = event_counts.get(e["event_type"], 0) + 1
+
+    return report_fields(
+        len(bookings), len(confirmed), sum(1 for b in bookings if b.get("status") == "cancelled"),
+        completed, no_show, revenue, len(counts), sum(1 for c in counts.values() if c > 1),
+        sum(leads), len(leads),
+        sum(1 for b in bookings if b.get("review_requested_at")),
+        sum(1 for b in bookings if b.get("review_completed_at")), top, event_counts,
+    )
+
+
+def synthetic_data(bookings: int, now: datetime, days: int = 120, seed: int = 11):
+    rng = random.Random(seed)
+    services = [{"id": f"svc{i}", "name_en": f"Service {i}", "name_lv": f"Pakalpojums {i}",
+                 "price_cents": rng.choice([3000, 4500, 6000, 12000])} for i in range(8)]
+
+    def ts(day_offset):
+        moment = now - timedelta(days=day_offset, seconds=rng.randrange(86400))
+        return moment.isoformat()
+
+    booking_rows = []
+    for i in range(bookings):
+        created = ts(rng.uniform(0, days))
+        booking_rows.append({
+            "id": f"b{i:08d}", "clinic_id": rng.choice(["butkevica", "sample"]),
+            "status": rng.choices(["confirmed", "cancelled", "pending", "expired"], [70, 15, 10, 5])[0],
+            "actual_status": rng.choice([None, None, "completed", "no_show"]),
+            "amount_cents": rng.choice([None, 2000, 3000]),
+            "service_id": rng.choice(services)["id"], "service_name": None,
+            "customer_email": f"p{rng.randrange(bookings // 3 + 1)}@example.com",
+            "created_at": created,
+            "start_time": (parse_ts_dt(created) + timedelta(days=rng.uniform(0, 30))).isoformat(),
+            "review_requested_at": created if rng.random() < 0.3 else None,
+            "review_completed_at": created if rng.random() < 0.1 else None,
+        })
+    event_rows = [{"id": f"e{i:08d}", "business_id": "BUTKEVICA_DENTAL",
+                   "event_type": rng.choice(FUNNEL_EVENTS), "created_at": ts(rng.uniform(0, days))}
+                  for i in range(bookings * 4)]
+    return booking_rows, event_rows, services
+
+
+def parse_ts_dt(value: str) -> datetime:
+    return datetime.fromtimestamp(parse_ts(value), tz=timezone.utc)
+
+
+def parity(bookings: int) -> dict:
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    booking_rows, event_rows, services = synthetic_data(bookings, now)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        store = RollupStore(os.path.join(tmp, "rollups.sqlite"))
+        for label, period in (("month", {}), ("year", {"year": str(now.year)})):
+            start, end, title = resolve_period(now=now, **period)
+            lo, hi = start.timestamp(), end.timestamp()
+            in_range = [b for b in booking_rows if lo <= parse_ts(b["created_at"]) <= hi
+                        and b["status"] not in EXCLUDED_STATUSES]
+            evs = [e for e in event_rows if lo <= parse_ts(e["created_at"]) <= hi]
+            t0 = time.perf_counter()
+            expected = legacy_aggregate(in_range, evs, services)
+            legacy_seconds = time.perf_counter() - t0
+
+            timings = []
+            for _ in range(2):  # cold (rolls days), then warm (rollups only)
+                source = ListSource(booking_rows, event_rows, services)
+                t0 = time.perf_counter()
+                actual = build_report(store, source, start, end, title, now=now)
+                timings.append((round(time.perf_counter() - t0, 4), source.fetched))
+            diff = {k: (actual[k], v) for k, v in expected.items() if actual[k] != v}
+            if "top_services" in diff:
+                a, e = diff["top_services"]
+                if [(s["name"], s["count"], round(s["revenue"], 2)) for s in a] == \
+                        [(s["name"], s["count"], round(s["revenue"], 2)) for s in e]:
+                    del diff["top_services"]
+            results[label] = {"mismatched_fields": diff, "legacy_seconds": round(legacy_seconds, 4),
+                              "cold": {"seconds": timings[0][0], "rows_fetched": timings[0][1]},
+                              "warm": {"seconds": timings[1][0], "rows_fetched": timings[1][1]}}
+        store.close()
+    return results
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Rollup-based analytics for n8n-9 monthly reports")
+    sub = parser.add_subparsers(dest="command", required=True)
+    report_parser = sub.add_parser("report", help="Print Aggregate Analytics JSON for a period")
+    period = report_parser.add_mutually_exclusive_group()
+    period.add_argument("--month", help="YYYY-MM")
+    period.add_argument("--quarter", help="YYYY-Q1..Q4")
+    period.add_argument("--year", help="YYYY")
+    report_parser.add_argument("--clinic", default=ALL, help="bookings.clinic_id (default: all)")
+    report_parser.add_argument("--business", default=ALL, help="booking_events.business_id (default: all)")
+    parity_parser = sub.add_parser("parity", help="Compare with the Aggregate Analytics node on synthetic data")
+    parity_parser.add_argument("--synthetic", type=int, default=20000, help="Number of bookings")
+    args = parser.parse_args()
+
+    if args.command == "parity":
+        results = parity(args.synthetic)
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+        ok = all(not r["mismatched_fields"] for r in results.values())
+        print(f"{'✅ Rollup report matches' if ok else '❌ Rollup report differs from'} "
+              f"Aggregate Analytics", file=sys.stderr)
+        sys.exit(0 if ok else 1)
+
+    load_env()
+    if not os.getenv("SUPABASE_URL") or not os.getenv("SUPABASE_SERVICE_KEY"):
+        print("❌ SUPABASE_URL and SUPABASE_SERVICE_KEY must be set", file=sys.stderr)
+        sys.exit(1)
+
+    start, end, title = resolve_period(args.month, args.quarter, args.year)
+    store = RollupStore()
+    try:
+        result = build_report(store, SupabaseSource(), start, end, title, args.clinic, args.business)
+    finally:
+        store.close()
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+DLQ Archive Compaction
+
+Purpose: Rolls old files from DLQ_DIR/processed/ into compressed, append-only
+JSONL segments so the directory stops growing by one inode per recovered
+booking, while any archived booking can still be fetched in milliseconds.
+
+Layout (DLQ_DIR/archive/):
+    segment-000001.jsonl.gz   gzip members of up to BLOCK_RECORDS lines each
+    index.sqlite              file / stripe session / email / timestamp
+                              -> (segment, member offset, line in member)
+
+A lookup seeks straight to one gzip member and inflates only that block.
+
+Usage:
+    python3 archive_dlq.py compact --older-than 30        # Archive files > 30 days old
+    python3 archive_dlq.py compact --older-than 30 --dry-run
+    python3 archive_dlq.py lookup --session cs_xxxx       # Fetch by Stripe session
+    python3 archive_dlq.py lookup --email john@example.com
+    python3 archive_dlq.py lookup --since 2025-12-01 --until 2025-12-31
+    python3 archive_dlq.py lookup --file failed-20251209-204530-123.json
+"""
+
+import os
+import sys
+import json
+import glob
+import time
+import zlib
+import sqlite3
+import argparse
+
+from recovery_dlq import DLQ_DIR, PROCESSED_DIR, chunked, extract_booking_data
+
+# Configuration
+ARCHIVE_DIR = os.path.join(DLQ_DIR, "archive")
+INDEX_FILE = os.path.join(ARCHIVE_DIR, "index.sqlite")
+BLOCK_RECORDS = 64                        # records per gzip member (random-access unit)
+SEGMENT_MAX_BYTES = 64 * 1024 * 1024      # start a new segment beyond this size
+DEFAULT_OLDER_THAN_DAYS = 30
+
+
+def open_index(path: str = INDEX_FILE) -> sqlite3.Connection:
+    """Open (and create if needed) the archive lookup index."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    db = sqlite3.connect(path)
+    db.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS archived (
+            file TEXT PRIMARY KEY,
+            stripe_session_id TEXT,
+            customer_email TEXT,
+            timestamp TEXT,
+            segment TEXT NOT NULL,
+            member_offset INTEGER NOT NULL,
+            line INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS archived_session ON archived (stripe_session_id);
+        CREATE INDEX IF NOT EXISTS archived_email ON archived (customer_email);
+        CREATE INDEX IF NOT EXISTS archived_timestamp ON archived (timestamp);
+        """
+    )
+    return db
+
+
+def current_segment() -> str:
+    """Path of the segment new blocks are appended to (rotates by size)."""
+    segments = sorted(glob.glob(os.path.join(ARCHIVE_DIR, "segment-*.jsonl.gz")))
+    if segments and os.path.getsize(segments[-1]) < SEGMENT_MAX_BYTES:
+        return segments[-1]
+    number = len(segments) + 1
+    return os.path.join(ARCHIVE_DIR, f"segment-{number:06d}.jsonl.gz")
+
+
+def append_block(segment: str, lines: list) -> int:
+    """Append one gzip member holding `lines`; return the member's byte offset."""
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 31)  # wbits=31 -> gzip framing
+    payload = compressor.compress("".join(lines).encode("utf-8")) + compressor.flush()
+    with open(segment, "ab") as f:
+        offset = f.tell()
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    return offset
+
+
+def read_block(segment: str, offset: int) -> list:
+    """Inflate the single gzip member starting at `offset`."""
+    decompressor = zlib.decompressobj(31)
+    data = b""
+    with open(segment, "rb") as f:
+        f.seek(offset)
+        while not decompressor.eof:
+            chunk = f.read(64 * 1024)
+            if not chunk:
+                break
+            data += decompressor.decompress(chunk)
+    return data.decode("utf-8").split("\n")   # not splitlines(): U+2028, U+0085 etc. can sit inside a record
+
+
+def index_row(filename: str, dlq_data: dict) -> tuple:
+    """Lookup keys for one archived DLQ payload."""
+    booking = extract_booking_data(dlq_data)
+    email = booking.get("customer_email")
+    return (
+        filename,
+        booking.get("stripe_session_id"),
+        email.lower() if email else None,
+        dlq_data.get("timestamp"),
+    )
+
+
+def compact(older_than_days: float = DEFAULT_OLDER_THAN_DAYS, dry_run: bool = False) -> dict:
+    """
+    Move processed files older than N days into archive segments.
+
+    Blocks are written and fsynced before the index commit, and source files
+    are only deleted after the commit, so a crash at any point leaves either
+    the original file or a fully indexed archived copy (re-runs are safe).
+    """
+    cutoff = time.time() - older_than_days * 86400
+    candidates = sorted(
+        path for path in glob.glob(os.path.join(PROCESSED_DIR, "failed-*.json"))
+        if os.path.getmtime(path) < cutoff
+    )
+    stats = {"candidates": len(candidates), "archived": 0, "skipped": 0, "bytes_in": 0}
+    if dry_run or not candidates:
+        return stats
+
+    db = open_index()
+    already = {row[0] for row in db.execute("SELECT file FROM archived")}
+
+    for block in chunked(candidates, BLOCK_RECORDS):
+        lines, rows, done = [], [], []
+        for path in block:
+            filename = os.path.basename(path)
+            if filename in already:
+                done.append(path)  # indexed by an interrupted earlier run
+                continue
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    dlq_data = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"  ⚠️  Skipping unreadable {filename}: {e}")
+                stats["skipped"] += 1
+                continue
+            stats["bytes_in"] += os.path.getsize(path)
+            rows.append(index_row(filename, dlq_data))
+            lines.append(json.dumps({"file": filename, "data": dlq_data},
+                                    ensure_ascii=False, separators=(",", ":")) + "\n")
+            done.append(path)
+
+        if lines:
+            segment = current_segment()
+            offset = append_block(segment, lines)
+            name = os.path.basename(segment)
+            db.executemany(
+                "INSERT OR REPLACE INTO archived VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [row + (name, offset, i) for i, row in enumerate(rows)],
+            )
+            db.commit()
+            stats["archived"] += len(lines)
+
+        for path in done:
+            os.remove(path)
+
+    db.close()
+    return stats
+
+
+def lookup(session: str = None, email: str = None, filename: str = None,
+           since: str = None, until: str = None, limit: int = 50) -> list:
+    """Fetch archived DLQ payloads matching the given keys."""
+    clauses, params = [], []
+    if session:
+        clauses.append("stripe_session_id = ?")
+        params.append(session)
+    if email:
+        clauses.append("customer_email = ?")
+        params.append(email.lower())
+    if filename:
+        clauses.append("file = ?")
+        params.append(filename)
+    if since:
+        clauses.append("timestamp >= ?")
+        params.append(since)
+    if until:
+        clauses.append("timestamp <= ?")
+        params.append(until + "\uffff")  # make a bare date include the whole day
+    if not clauses or not os.path.exists(INDEX_FILE):
+        return []
+
+    db = open_index()
+    rows = db.execute(
+        f"SELECT segment, member_offset, line FROM archived WHERE {' AND '.join(clauses)} "
+        f"ORDER BY timestamp LIMIT ?",
+        params + [limit],
+    ).fetchall()
+    db.close()
+
+    results, blocks = [], {}
+    for segment, offset, line in rows:
+        key = (segment, offset)
+        if key not in blocks:
+            blocks[key] = read_block(os.path.join(ARCHIVE_DIR, segment), offset)
+        results.append(json.loads(blocks[key][line]))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact and search the DLQ processed archive")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    compact_parser = sub.add_parser("compact", help="Archive old processed files")
+    compact_parser.add_argument("--older-than", type=float, default=DEFAULT_OLDER_THAN_DAYS,
+                                help=f"Age in days (default: {DEFAULT_OLDER_THAN_DAYS})")
+    compact_parser.add_argument("--dry-run", action="store_true", help="Count files only")
+
+    lookup_parser = sub.add_parser("lookup", help="Fetch archived bookings")
+    lookup_parser.add_argument("--session", help="Stripe checkout session ID")
+    lookup_parser.add_argument("--email", help="Customer email")
+    lookup_parser.add_argument("--file", help="Original DLQ filename")
+    lookup_parser.add_argument("--since", help="ISO timestamp/date lower bound")
+    lookup_parser.add_argument("--until", help="ISO timestamp/date upper bound")
+    lookup_parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    if args.command == "compact":
+        print(f"🗜️  Compacting {PROCESSED_DIR} (older than {args.older_than} days)")
+        stats = compact(args.older_than, args.dry_run)
+        if args.dry_run:
+            print(f"🔍 DRY RUN - {stats['candidates']} file(s) would be archived")
+            return
+        print(f"✅ Archived {stats['archived']} file(s) "
+              f"({stats['bytes_in'] / 1024:.0f} KB of JSON), skipped {stats['skipped']}")
+        return
+
+    records = lookup(args.session, args.email, args.file, args.since, args.until, args.limit)
+    if not records:
+        print("❌ No archived bookings found")
+        sys.exit(1)
+    print(json.dumps(records, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
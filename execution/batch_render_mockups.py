@@ -1,57 +1,59 @@
-import json
 import os
-import shutil
+import sys
+import json
+import argparse
+
+from mockup_renderer import render_targets, print_stats
 
 # Paths
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) # Workspace root
 TARGETS_FILE = os.path.join(BASE_DIR, 'marketing', 'leads', 'targets.json')
 TEMPLATE_FILE = os.path.join(BASE_DIR, 'marketing', 'templates', 'modern_dental_site.html')
 DEPLOYMENTS_DIR = os.path.join(BASE_DIR, 'marketing', 'deployments')
+BUNDLE_DIR = os.path.join(BASE_DIR, 'marketing', 'bundle')
 
-def generate_mockups():
+def generate_mockups(targets_file=TARGETS_FILE, template_file=TEMPLATE_FILE, output_dir=DEPLOYMENTS_DIR,
+                     workers=None, force=False, dry_run=False):
+    """Render deployments/<slug>/index.html for every target; unchanged pages are skipped."""
     # 1. Load Targets
-    print(f"Reading targets from {TARGETS_FILE}...")
+    print(f"Reading targets from {targets_file}...")
     try:
-        with open(TARGETS_FILE, 'r', encoding='utf-8') as f:
+        with open(targets_file, 'r', encoding='utf-8') as f:
             targets = json.load(f)
     except FileNotFoundError:
-        print(f"Error: {TARGETS_FILE} not found.")
-        return
+        print(f"Error: {targets_file} not found.")
+        return None
 
-    # 2. Load Template
-    print(f"Reading template from {TEMPLATE_FILE}...")
+    # 2. Render (template is parsed once, pages only rewritten when template or data changed)
+    print(f"Rendering template {template_file}...")
     try:
-        with open(TEMPLATE_FILE, 'r', encoding='utf-8') as f:
-            template_content = f.read()
+        stats = render_targets(template_file, targets, output_dir, 'index.html',
+                               workers=workers, force=force, dry_run=dry_run)
     except FileNotFoundError:
-        print(f"Error: {TEMPLATE_FILE} not found.")
-        return
+        print(f"Error: {template_file} not found.")
+        return None
 
-    # 3. Process Each Target
-    if not os.path.exists(DEPLOYMENTS_DIR):
-        os.makedirs(DEPLOYMENTS_DIR)
-
-    generated_count = 0
-    for clinic in targets:
-        print(f"Generating mockup for: {clinic['name']} ({clinic['slug']})")
-        
-        # Create Content
-        page_content = template_content.replace('{{CLINIC_NAME}}', clinic['name'])
-        page_content = page_content.replace('{{PHONE}}', clinic['phone'])
-        
-        # Create Directory
-        clinic_dir = os.path.join(DEPLOYMENTS_DIR, clinic['slug'])
-        if not os.path.exists(clinic_dir):
-            os.makedirs(clinic_dir)
-            
-        # Write File
-        output_path = os.path.join(clinic_dir, 'index.html')
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(page_content)
-            
-        generated_count += 1
-
-    print(f"✅ Successfully generated {generated_count} mockups in {DEPLOYMENTS_DIR}")
+    for slug in stats['rendered_slugs'][:20]:
+        print(f"{'Would generate' if dry_run else 'Generated'} mockup for: {slug}")
+    if len(stats['rendered_slugs']) > 20:
+        print(f"... and {len(stats['rendered_slugs']) - 20} more")
+    print_stats(stats, output_dir)
+    return stats
 
 if __name__ == "__main__":
-    generate_mockups()
+    parser = argparse.ArgumentParser(description="Generate one mockup site per target clinic")
+    parser.add_argument('--targets', default=TARGETS_FILE)
+    parser.add_argument('--template', default=TEMPLATE_FILE)
+    parser.add_argument('--output', default=DEPLOYMENTS_DIR)
+    parser.add_argument('--workers', type=int, help="Render processes (default: CPU count)")
+    parser.add_argument('--force', action='store_true', help="Re-render every page")
+    parser.add_argument('--dry-run', action='store_true', help="Only list pages that would change")
+    parser.add_argument('--bundle', nargs='?', const=BUNDLE_DIR, metavar='DIR',
+                        help="Then write the precompressed upload bundle (default: marketing/bundle)")
+    args = parser.parse_args()
+
+    result = generate_mockups(args.targets, args.template, args.output, args.workers, args.force, args.dry_run)
+    if result is not None and args.bundle and not args.dry_run:
+        from bundle_deployments import bundle, print_stats as print_bundle_stats
+        print_bundle_stats(bundle(args.output, args.bundle, args.template, args.workers), args.bundle)
+    sys.exit(0 if result is not None else 1)
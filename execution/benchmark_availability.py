@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Slot Availability Benchmark
+
+Purpose: Compares slot_availability.compute_availability against a line-by-line
+port of the `Availability Logic` Code node in n8n-4-check-availability
+(slots x bookings x events scan, ISO strings re-parsed on every comparison),
+on synthetic clinics of increasing size. Checks that both produce the same
+slots before timing them.
+
+The legacy node answers one day for one service per request, so for a
+multi-day / multi-service query it is timed as one call per (day, service).
+
+Usage:
+    python3 benchmark_availability.py                       # default scenarios
+    python3 benchmark_availability.py --days 30 --services 8 --bookings 5000
+    python3 benchmark_availability.py --output bench_availability.json
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+from datetime import date as date_cls, datetime, timedelta, timezone
+
+from slot_availability import compute_availability, parse_ts
+
+LEGACY_START_HOUR = 9
+LEGACY_END_HOUR = 17
+START_DATE = date_cls(2026, 1, 5)
+
+# (days, services, specialists, bookings, calendar events)
+SCENARIOS = [
+    (1, 1, 3, 40, 5),
+    (7, 4, 6, 400, 30),
+    (30, 8, 12, 5000, 200),
+    (60, 12, 20, 20000, 800),
+]
+
+
+def legacy_availability(requested_date: str, bookings: list, events: list,
+                        now: float, duration_minutes: int = 60) -> list:
+    """Port of the JS Code node (including its per-comparison date parsing)."""
+    blocked = []
+    for booking in bookings:
+        if booking.get("status") in ("confirmed", "completed"):
+            blocked.append(booking)
+        elif booking.get("status") == "pending" and booking.get("slot_lock_expires_at"):
+            if parse_ts(booking["slot_lock_expires_at"]) > now:
+                blocked.append(booking)
+
+    def is_busy(slot_iso, busy_start, busy_end):
+        if not busy_start or not busy_end:
+            return False
+        slot_start = parse_ts(slot_iso)
+        slot_end = slot_start + duration_minutes * 60
+        return slot_start < parse_ts(busy_end) and slot_end > parse_ts(busy_start)
+
+    final = []
+    for h in range(LEGACY_START_HOUR, LEGACY_END_HOUR):
+        time_str = f"{h:02d}:00"
+        slot_iso = f"{requested_date}T{time_str}:00"
+        taken = False
+        for booking in blocked:
+            if is_busy(slot_iso, booking.get("start_time"), booking.get("end_time")):
+                taken = True
+                break
+        if not taken:
+            for event in events:
+                start = (event.get("start") or {}).get("dateTime") or (event.get("start") or {}).get("date")
+                end = (event.get("end") or {}).get("dateTime") or (event.get("end") or {}).get("date")
+                if is_busy(slot_iso, start, end):
+                    taken = True
+                    break
+        final.append({"time": time_str, "available": not taken})
+    return final
+
+
+def iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat()
+
+
+def generate(days: int, services: int, specialists: int, bookings: int, events: int,
+             seed: int = 42) -> dict:
+    """Synthetic clinic: bookings and calendar events spread over the range."""
+    rng = random.Random(seed)
+    base = datetime(START_DATE.year, START_DATE.month, START_DATE.day, tzinfo=timezone.utc).timestamp()
+    service_rows = [{"id": f"s{i}", "duration_minutes": rng.choice([30, 45, 60, 90])}
+                    for i in range(services)]
+    specialist_rows = [{
+        "id": f"sp{i}", "is_active": True,
+        "specialties": rng.sample([s["id"] for s in service_rows], k=max(1, services // 2)),
+    } for i in range(specialists)]
+    now = base + 7 * 3600
+
+    booking_rows = []
+    for _ in range(bookings):
+        start = base + rng.randrange(days) * 86400 + rng.randrange(8 * 3600, 18 * 3600, 900)
+        status = rng.choices(["confirmed", "completed", "pending", "cancelled"], [70, 10, 10, 10])[0]
+        booking_rows.append({
+            "start_time": iso(start),
+            "end_time": iso(start + rng.choice([30, 45, 60, 90]) * 60),
+            "status": status,
+            "slot_lock_expires_at": iso(now + rng.choice([-600, 600])) if status == "pending" else None,
+            "specialist_id": rng.choice([None] + [s["id"] for s in specialist_rows]),
+        })
+
+    event_rows = []
+    for _ in range(events):
+        start = base + rng.randrange(days) * 86400 + rng.randrange(8 * 3600, 18 * 3600, 1800)
+        event_rows.append({"start": {"dateTime": iso(start)},
+                           "end": {"dateTime": iso(start + rng.choice([30, 60, 120]) * 60)}})
+
+    return {"services": service_rows, "specialists": specialist_rows,
+            "bookings": booking_rows, "events": event_rows, "now": now}
+
+
+def legacy_hours() -> list:
+    """Clinic hours matching the legacy node (09-17 every day)."""
+    return [{"day_of_week": d, "is_open": True, "open_time": f"{LEGACY_START_HOUR:02d}:00",
+             "close_time": f"{LEGACY_END_HOUR:02d}:00"} for d in range(7)]
+
+
+def check_parity(data: dict, days: int) -> int:
+    """Single pool + legacy hours must reproduce the legacy slots exactly."""
+    date_to = (START_DATE + timedelta(days=days - 1)).isoformat()
+    engine = compute_availability(START_DATE.isoformat(), date_to, data["bookings"], data["events"],
+                                  clinic_hours=legacy_hours(), now=data["now"])
+    mismatches = 0
+    for day, services in engine.items():
+        ours = [{"time": s["time"], "available": s["available"]} for s in services["any"]]
+        if ours != legacy_availability(day, data["bookings"], data["events"], data["now"]):
+            mismatches += 1
+    return mismatches
+
+
+def run_scenario(days: int, services: int, specialists: int, bookings: int, events: int) -> dict:
+    data = generate(days, services, specialists, bookings, events)
+    dates = [(START_DATE + timedelta(days=i)).isoformat() for i in range(days)]
+
+    mismatches = check_parity(data, days)
+
+    started = time.perf_counter()
+    for day in dates:
+        for service in data["services"]:
+            legacy_availability(day, data["bookings"], data["events"], data["now"],
+                                service["duration_minutes"])
+    legacy_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    compute_availability(dates[0], dates[-1], data["bookings"], data["events"],
+                         data["specialists"], data["services"], legacy_hours(), now=data["now"])
+    engine_seconds = time.perf_counter() - started
+
+    return {
+        "days": days, "services": services, "specialists": specialists,
+        "bookings": bookings, "events": events,
+        "legacy_seconds": round(legacy_seconds, 4),
+        "engine_seconds": round(engine_seconds, 4),
+        "speedup": round(legacy_seconds / engine_seconds, 1) if engine_seconds else None,
+        "parity_mismatched_days": mismatches,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the slot availability engine")
+    parser.add_argument("--days", type=int, help="Custom scenario: days in range")
+    parser.add_argument("--services", type=int, default=4)
+    parser.add_argument("--specialists", type=int, default=6)
+    parser.add_argument("--bookings", type=int, default=1000)
+    parser.add_argument("--events", type=int, default=50)
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args()
+
+    scenarios = SCENARIOS
+    if args.days:
+        scenarios = [(args.days, args.services, args.specialists, args.bookings, args.events)]
+
+    print(f"{'Days':>5} {'Svcs':>5} {'Specs':>5} {'Bookings':>9} {'Events':>7} "
+          f"{'Legacy s':>10} {'Engine s':>10} {'Speedup':>8}  Parity")
+    results, ok = [], True
+    for scenario in scenarios:
+        r = run_scenario(*scenario)
+        results.append(r)
+        parity = "✅" if r["parity_mismatched_days"] == 0 else f"❌ {r['parity_mismatched_days']} day(s)"
+        ok = ok and r["parity_mismatched_days"] == 0
+        print(f"{r['days']:>5} {r['services']:>5} {r['specialists']:>5} {r['bookings']:>9} "
+              f"{r['events']:>7} {r['legacy_seconds']:>10.4f} {r['engine_seconds']:>10.4f} "
+              f"{r['speedup']:>7}x  {parity}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"📄 Results written to {args.output}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Demo Server Load Test
+
+Purpose: Compares clients/sample/demo-assets/serve_demo.py (threaded,
+keep-alive, cached) with its --legacy mode (the old single-threaded
+SimpleHTTPRequestHandler server). Each server runs in its own subprocess on
+a free port. A pool of client threads requests the demo pages for a fixed
+duration, and requests/sec plus p50/p99 latency are reported.
+
+Scenarios:
+    normal   - C concurrent clients; a share of requests revalidate with
+               If-None-Match (what a browser reload during a demo does)
+    stalled  - the same, plus one connection that sends half a request and
+               stalls (a slow mobile client); the legacy server stops
+               answering everyone until its socket times out
+
+Usage:
+    python3 benchmark_demo_server.py
+    python3 benchmark_demo_server.py --clients 32 --duration 10 --output demo_bench.json
+    python3 benchmark_demo_server.py --scenarios normal --servers new
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+import subprocess
+import http.client
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # Workspace root
+SERVER_SCRIPT = os.path.join(BASE_DIR, "clients", "sample", "demo-assets", "serve_demo.py")
+ASSETS_DIR = os.path.dirname(SERVER_SCRIPT)
+REQUEST_TIMEOUT = 5
+REVALIDATE_SHARE = 0.3
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(legacy: bool, directory: str) -> tuple:
+    port = free_port()
+    cmd = [sys.executable, SERVER_SCRIPT, "--port", str(port), "--directory", directory]
+    if legacy:
+        cmd.append("--legacy")
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return proc, port
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError("server did not start")
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def client_loop(port: int, paths: list, stop_at: float, seed: int, out: dict, lock: threading.Lock):
+    """One keep-alive client; reconnects whenever the server closes the connection."""
+    latencies, errors, not_modified, received = [], 0, 0, 0
+    etags, conn, i = {}, None, seed
+    while time.perf_counter() < stop_at:
+        path = paths[i % len(paths)]
+        i += 1
+        headers = {"Accept-Encoding": "gzip"}
+        if path in etags and (i * 7919) % 100 < REVALIDATE_SHARE * 100:
+            headers["If-None-Match"] = etags[path]
+        started = time.perf_counter()
+        try:
+            if conn is None:
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=REQUEST_TIMEOUT)
+            conn.request("GET", path, headers=headers)
+            resp = conn.getresponse()
+            body = resp.read()
+            if resp.status not in (200, 304):
+                raise http.client.HTTPException(f"HTTP {resp.status}")
+            if resp.getheader("ETag"):
+                etags[path] = resp.getheader("ETag")
+            not_modified += resp.status == 304
+            received += len(body)
+            if resp.will_close:
+                conn.close()
+                conn = None
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            if conn:
+                conn.close()
+            conn = None
+            continue
+        latencies.append(time.perf_counter() - started)
+    if conn:
+        conn.close()
+    with lock:
+        out["latencies"].extend(latencies)
+        out["errors"] += errors
+        out["not_modified"] += not_modified
+        out["bytes"] += received
+
+
+def stall_client(port: int, stop: threading.Event):
+    """Send half a request line and sit on the connection."""
+    try:
+        sock = socket.create_connection(("127.0.0.1", port), timeout=REQUEST_TIMEOUT)
+        sock.sendall(b"GET /stripe-checkout.html HTTP/1.1\r\nHost: localhost\r\n")
+        stop.wait()
+        sock.close()
+    except OSError:
+        pass
+
+
+def run(legacy: bool, scenario: str, clients: int, duration: float, directory: str) -> dict:
+    paths = ["/" + name for name in sorted(os.listdir(directory)) if name.endswith(".html")]
+    proc, port = start_server(legacy, directory)
+    stop = threading.Event()
+    try:
+        if scenario == "stalled":
+            threading.Thread(target=stall_client, args=(port, stop), daemon=True).start()
+            time.sleep(0.2)
+        out, lock = {"latencies": [], "errors": 0, "not_modified": 0, "bytes": 0}, threading.Lock()
+        stop_at = time.perf_counter() + duration
+        threads = [threading.Thread(target=client_loop, args=(port, paths, stop_at, n, out, lock))
+                   for n in range(clients)]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        stop.set()
+        proc.terminate()
+        proc.wait()
+
+    latencies = out["latencies"]
+    return {
+        "server": "legacy" if legacy else "new",
+        "scenario": scenario,
+        "clients": clients,
+        "requests": len(latencies),
+        "errors": out["errors"],
+        "not_modified": out["not_modified"],
+        "requests_per_sec": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "mb_received": round(out["bytes"] / 1e6, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the demo assets server")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=5, help="Seconds per run")
+    parser.add_argument("--scenarios", default="normal,stalled")
+    parser.add_argument("--servers", default="legacy,new")
+    parser.add_argument("--directory", default=ASSETS_DIR)
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args()
+
+    print(f"{'Server':<8} {'Scenario':<9} {'Req/s':>9} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'304s':>7} {'Errors':>7} {'MB':>7}")
+    results = []
+    for scenario in args.scenarios.split(","):
+        for server in args.servers.split(","):
+            r = run(server == "legacy", scenario, args.clients, args.duration, args.directory)
+            results.append(r)
+            print(f"{r['server']:<8} {r['scenario']:<9} {r['requests_per_sec']:>9} {r['p50_ms']:>8} "
+                  f"{r['p99_ms']:>8} {r['not_modified']:>7} {r['errors']:>7} {r['mb_received']:>7}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"📄 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
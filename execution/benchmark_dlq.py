@@ -0,0 +1,497 @@
+#!/usr/bin/env python3
+"""
+DLQ Recovery Benchmark
+
+Purpose: Measures recovery_dlq.py throughput without touching production
+Supabase. Three parts:
+
+    generate  - writes N realistic failed-*.json files (both the booking_data
+                shape and the original_input Stripe-metadata shape)
+    serve     - local PostgREST stand-in for the bookings select/insert
+                endpoints (eq./in./gt./lt./is. filters, and=/or= groups,
+                order and limit, so the conflict check's keyset-paged range
+                query behaves as it does against Supabase), with
+                configurable latency and error rate
+    run       - generates, serves and recovers at several sizes, each in a
+                fresh subprocess, and writes files/sec, per-stage time and
+                peak memory to a JSON results file for diffing
+
+Every generated booking gets its own one-hour slot, so a healthy run reports
+0 slot conflicts; recovered / conflicts / failed are reported separately.
+
+Usage:
+    python3 benchmark_dlq.py run                                   # 100, 10k, 100k files
+    python3 benchmark_dlq.py run --sizes 100,1000 --modes sequential,bulk,workers
+    python3 benchmark_dlq.py run --latency-ms 20 --error-rate 0.01 --output bench.json
+    python3 benchmark_dlq.py generate --count 500 --dir /tmp/dlq
+    python3 benchmark_dlq.py serve --port 54321 --latency-ms 10
+
+The client is the shared postgrest_client.PostgrestClient (what
+recovery_dlq uses in production), with retries disabled so injected errors
+show up as failures.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import string
+import operator
+import resource
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import contextlib
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qsl
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SIZES = [100, 10_000, 100_000]
+DEFAULT_MODES = ["sequential", "bulk", "workers"]
+DEFAULT_OUTPUT = "bench_dlq_results.json"
+
+FIRST_NAMES = ["Jānis", "Anna", "Elena", "Pēteris", "Laura", "Mārtiņš", "Ilze", "Andris", "Kristīne"]
+LAST_NAMES = ["Bērziņš", "Ozola", "Kalniņš", "Petrova", "Liepiņš", "Krūmiņa", "Zariņš"]
+SERVICES = [("s1", "Dental Checkup", 3000), ("s2", "Teeth Cleaning", 4500),
+            ("s3", "Filling", 6000), ("s4", "Whitening", 12000), ("s7", "Root Canal", 15000)]
+SLOTS_PER_DAY = 8                 # one-hour slots 09:00-17:00, one per generated booking
+ERRORS = ["ETIMEDOUT: Connection timed out", "getaddrinfo ENOTFOUND", "503 Service Unavailable"]
+
+
+# =============================================================================
+# Synthetic DLQ generator
+# =============================================================================
+
+def _token(rng: random.Random, n: int = 24) -> str:
+    return "".join(rng.choices(string.ascii_letters + string.digits, k=n))
+
+
+def synthetic_dlq_payload(rng: random.Random, i: int, stripe_shape: bool, bad: bool) -> dict:
+    """One DLQ payload, shaped like the n8n error handler writes them."""
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    email = "" if bad else f"{first.lower()}.{i}@example.com"
+    phone = f"+371 2{rng.randint(0, 9999999):07d}"
+    service_id, service_name, amount = rng.choice(SERVICES)
+    start = datetime(2025, 12, 1, 9, tzinfo=timezone.utc) + timedelta(
+        days=i // SLOTS_PER_DAY, hours=i % SLOTS_PER_DAY)
+    session_id = f"cs_test_{_token(rng)}"
+    payload = {
+        "timestamp": (start - timedelta(days=2)).isoformat().replace("+00:00", "Z"),
+        "error": {"message": rng.choice(ERRORS), "node": "Save to Supabase", "stack": "..."},
+        "recovery_attempts": 0,
+    }
+    if stripe_shape:
+        payload["booking_data"] = {}
+        payload["original_input"] = {
+            "type": "checkout.session.completed",
+            "data": {"object": {
+                "id": session_id,
+                "customer_details": {"name": f"{first} {last}", "email": email, "phone": phone},
+                "metadata": {
+                    "customer_name": f"{first} {last}",
+                    "customer_email": email,
+                    "service_id": service_id,
+                    "serviceName": service_name,
+                    "booking_date": start.strftime("%Y-%m-%d"),
+                    "booking_time": start.strftime("%H:%M"),
+                },
+            }},
+        }
+    else:
+        payload["booking_data"] = {
+            "customer_name": f"{first} {last}",
+            "customer_email": email,
+            "customer_phone": phone,
+            "service_id": service_id,
+            "service_name": service_name,
+            "start_time": start.isoformat().replace("+00:00", "Z"),
+            "end_time": (start + timedelta(hours=1)).isoformat().replace("+00:00", "Z"),
+            "amount_paid": amount / 100,
+            "amount_cents": amount,
+            "currency": "eur",
+            "status": "confirmed",
+            "stripe_session_id": session_id,
+            "payment_intent_id": f"pi_{_token(rng)}",
+            "client_reference": f"BK-{_token(rng, 6).upper()}",
+        }
+        payload["original_input"] = {"type": "checkout.session.completed"}
+    return payload
+
+
+def generate(directory: str, count: int, stripe_ratio: float = 0.3, bad_ratio: float = 0.01,
+             seed: int = 42) -> list:
+    """Write `count` failed-*.json files; return the stripe_session_ids of booking_data files."""
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    session_ids = []
+    for i in range(count):
+        payload = synthetic_dlq_payload(rng, i, rng.random() < stripe_ratio, rng.random() < bad_ratio)
+        session_id = payload["booking_data"].get("stripe_session_id")
+        if session_id:
+            session_ids.append(session_id)
+        path = os.path.join(directory, f"failed-20251209-{i:09d}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, indent=2, ensure_ascii=False)
+    return session_ids
+
+
+# =============================================================================
+# Local PostgREST stand-in
+# =============================================================================
+
+class BookingsStore:
+    """In-memory bookings table keyed by id, indexed by the Stripe ID columns."""
+
+    INDEXED = ("stripe_session_id", "payment_intent_id")
+
+    def __init__(self):
+        self.rows = {}
+        self.indexes = {column: {} for column in self.INDEXED}
+        self.next_id = 1
+        self.lock = threading.Lock()
+
+    def insert(self, rows: list) -> list:
+        with self.lock:
+            out = []
+            for row in rows:
+                row = dict(row, id=self.next_id)
+                self.next_id += 1
+                self.rows[row["id"]] = row
+                for column, index in self.indexes.items():
+                    if row.get(column) is not None:
+                        index.setdefault(str(row[column]), []).append(row)
+                out.append(row)
+            return out
+
+    def select(self, filters: list, columns: list, order: list = (), limit: int = None) -> list:
+        with self.lock:
+            candidates = self.rows.values()
+            for condition in filters:
+                column, op = condition[0], condition[1]
+                if column in self.indexes and op in ("eq", "in"):
+                    keys = [condition[2]] if op == "eq" else condition[2]
+                    candidates = [r for k in keys for r in self.indexes[column].get(str(k), [])]
+                    break
+            rows = [r for r in candidates if all(matches(r, c) for c in filters)]
+        for column, descending in reversed(order):
+            rows.sort(key=lambda r: sort_key(r.get(column)), reverse=descending)
+        if limit is not None:
+            rows = rows[:limit]
+        if columns and columns != ["*"]:
+            rows = [{c: r.get(c) for c in columns} for r in rows]
+        return rows
+
+
+# PostgREST filter grammar, the subset recovery_dlq and dlq_conflicts send:
+#   col=eq.v | in.(a,b) | gt./gte./lt./lte.v | is.null
+#   and=(col.op.v,...) / or=(col.op.v,and(...),...)
+COMPARISONS = {"eq": operator.eq, "neq": operator.ne, "gt": operator.gt,
+               "gte": operator.ge, "lt": operator.lt, "lte": operator.le}
+
+
+def coerce(value):
+    """Literal -> int / float / aware datetime / str, so gt./lt. compare like Postgres."""
+    if not isinstance(value, str):
+        return value
+    for parse in (int, float):
+        try:
+            return parse(value)
+        except ValueError:
+            pass
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return value
+
+
+def sort_key(value) -> tuple:
+    value = coerce(value)
+    return (value is None, value.timestamp() if isinstance(value, datetime) else value)
+
+
+def split_top_level(text: str) -> list:
+    """Split on commas outside parentheses."""
+    parts, depth, current = [], 0, ""
+    for ch in text:
+        if ch == "," and depth == 0:
+            parts.append(current)
+            current = ""
+            continue
+        depth += (ch == "(") - (ch == ")")
+        current += ch
+    return parts + [current] if current else parts
+
+
+def parse_filter(key: str, value: str) -> tuple:
+    """One query parameter -> (column, op, value) or ("and"/"or", [conditions])."""
+    if key in ("and", "or"):
+        return (key, [parse_term(term) for term in split_top_level(value[1:-1])])
+    op, _, arg = value.partition(".")
+    if op == "in":
+        items = arg[1:-1]
+        return (key, "in", {coerce(v.strip('"')) for v in items.split(",")} if items else set())
+    if op == "is":
+        return (key, "is", {"null": None, "true": True, "false": False}[arg])
+    return (key, op, coerce(arg.strip('"')))
+
+
+def parse_term(term: str) -> tuple:
+    """A term inside and=(...) / or=(...): `col.op.value` or a nested and(...) / or(...)."""
+    if term.startswith(("and(", "or(")):
+        name, _, rest = term.partition("(")
+        return parse_filter(name, "(" + rest)
+    column, _, value = term.partition(".")
+    return parse_filter(column, value)
+
+
+def matches(row: dict, condition: tuple) -> bool:
+    if condition[0] in ("and", "or") and len(condition) == 2:
+        results = (matches(row, c) for c in condition[1])
+        return all(results) if condition[0] == "and" else any(results)
+    column, op, value = condition
+    actual = coerce(row.get(column))
+    if op == "is":
+        return actual is value
+    if op == "in":
+        return actual in value
+    try:
+        return actual is not None and COMPARISONS[op](actual, value)
+    except TypeError:
+        return False          # e.g. a timestamp compared with a number
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """GET/POST /rest/v1/bookings with PostgREST-style filters, order and limit."""
+
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True  # headers and body go out as separate writes
+    store = None
+    latency = 0.0
+    error_rate = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status: int, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _precheck(self) -> bool:
+        if self.latency:
+            time.sleep(self.latency)
+        if self.error_rate and random.random() < self.error_rate:
+            self._reply(503, {"message": "stand-in injected failure"})
+            return False
+        if not urlsplit(self.path).path.endswith("/bookings"):
+            self._reply(404, {"message": "unknown table"})
+            return False
+        return True
+
+    def do_GET(self):
+        if not self._precheck():
+            return
+        columns, filters, order, limit = ["*"], [], [], None
+        for key, value in parse_qsl(urlsplit(self.path).query):
+            if key == "select":
+                columns = value.split(",")
+            elif key == "order":
+                for term in value.split(","):
+                    column, _, direction = term.partition(".")
+                    order.append((column, direction.startswith("desc")))
+            elif key == "limit":
+                limit = int(value)
+            else:
+                try:
+                    filters.append(parse_filter(key, value))
+                except (KeyError, ValueError) as e:
+                    self._reply(400, {"message": f"stand-in cannot parse {key}={value}: {e}"})
+                    return
+        self._reply(200, self.store.select(filters, columns, order, limit))
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not self._precheck():
+            return
+        rows = json.loads(body)
+        if isinstance(rows, dict):
+            rows = [rows]
+        if len({frozenset(r) for r in rows}) > 1 and "columns" not in dict(parse_qsl(urlsplit(self.path).query)):
+            self._reply(400, {"code": "PGRST102", "message": "All object keys must match"})
+            return
+        if any(not r.get("customer_email") for r in rows):
+            self._reply(400, {"message": "null value in column \"customer_email\""})
+            return
+        self._reply(201, self.store.insert(rows))
+
+
+def start_standin(port: int = 0, latency_ms: float = 0, error_rate: float = 0,
+                  seed_session_ids: list = ()) -> ThreadingHTTPServer:
+    """Start the stand-in on a background thread; returns the server (use .server_port)."""
+    store = BookingsStore()
+    store.insert([{"stripe_session_id": sid, "customer_email": "seed@example.com"}
+                  for sid in seed_session_ids])
+    handler = type("Handler", (StandInHandler,), {
+        "store": store, "latency": latency_ms / 1000, "error_rate": error_rate,
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# =============================================================================
+# Runner
+# =============================================================================
+
+def run_one(dlq_dir: str, port: int, mode: str, workers: int, batch_size: int) -> dict:
+    """Recover everything in dlq_dir once (called inside a fresh subprocess)."""
+    os.environ["DLQ_DIR"] = dlq_dir
+    sys.path.insert(0, SCRIPT_DIR)
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        import recovery_dlq
+
+    from postgrest_client import PostgrestClient
+    client = PostgrestClient(f"http://127.0.0.1:{port}", "bench.stand.in", max_retries=0)
+
+    files = recovery_dlq.get_pending_files()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        if mode == "bulk":
+            report = recovery_dlq.process_bulk(client, files, batch_size=batch_size)
+            statuses = [status for status, _ in report.values()]
+        else:
+            # one conflict index for the run, as recovery_dlq.run builds it
+            conflicts = recovery_dlq.build_conflict_index(client, files)
+            if mode == "workers":
+                results = recovery_dlq.process_concurrent(client, files, workers=workers, conflicts=conflicts)
+                statuses = [status for status, _ in results]
+            else:
+                statuses = [recovery_dlq.process_file(client, f, conflicts=conflicts) for f in files]
+    elapsed = time.perf_counter() - started
+
+    stages = recovery_dlq.metrics.summary()["stages"]
+    conflicts_count = statuses.count("conflict")
+    failed = statuses.count("failed")
+    return {
+        "files": len(files),
+        "recovered": len(statuses) - conflicts_count - failed,
+        "conflicts": conflicts_count,
+        "failed": failed,
+        "seconds": round(elapsed, 4),
+        "files_per_sec": round(len(files) / elapsed, 1) if elapsed else None,
+        "stage_seconds": {stage: round(stats["sum_seconds"], 4) for stage, stats in stages.items()},
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=SCRIPT_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(args) -> dict:
+    """Run every size x mode scenario and collect results."""
+    results = {
+        "generated_at": datetime.now().isoformat(),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "params": {
+            "latency_ms": args.latency_ms, "error_rate": args.error_rate,
+            "existing_ratio": args.existing_ratio, "workers": args.workers,
+            "batch_size": args.batch_size,
+        },
+        "scenarios": [],
+    }
+    for size in args.sizes:
+        for mode in args.modes:
+            with tempfile.TemporaryDirectory(prefix="dlq-bench-") as dlq_dir:
+                session_ids = generate(dlq_dir, size, seed=args.seed)
+                existing = session_ids[: int(len(session_ids) * args.existing_ratio)]
+                server = start_standin(0, args.latency_ms, args.error_rate, existing)
+                try:
+                    output = subprocess.check_output(
+                        [sys.executable, os.path.abspath(__file__), "_run-one",
+                         "--dir", dlq_dir, "--port", str(server.server_port), "--mode", mode,
+                         "--workers", str(args.workers), "--batch-size", str(args.batch_size)],
+                        text=True,
+                    )
+                finally:
+                    server.shutdown()
+                scenario = dict(json.loads(output.strip().splitlines()[-1]), size=size, mode=mode)
+                results["scenarios"].append(scenario)
+                print(f"  {mode:>10} @ {size:>7}: {scenario['files_per_sec']} files/sec, "
+                      f"{scenario['recovered']} recovered / {scenario['conflicts']} conflicts / "
+                      f"{scenario['failed']} failed, "
+                      f"peak {scenario['peak_rss_mb']} MB, stages {scenario['stage_seconds']}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DLQ recovery against a local PostgREST stand-in")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="Run the benchmark suite")
+    run_parser.add_argument("--sizes", type=lambda s: [int(x) for x in s.split(",")], default=DEFAULT_SIZES)
+    run_parser.add_argument("--modes", type=lambda s: s.split(","), default=DEFAULT_MODES)
+    run_parser.add_argument("--latency-ms", type=float, default=2.0, help="Stand-in latency per request")
+    run_parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered 503")
+    run_parser.add_argument("--existing-ratio", type=float, default=0.1,
+                            help="Fraction of sessions already present in bookings")
+    run_parser.add_argument("--workers", type=int, default=8)
+    run_parser.add_argument("--batch-size", type=int, default=100)
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument("--output", default=DEFAULT_OUTPUT, help="JSON results file")
+
+    gen_parser = sub.add_parser("generate", help="Write synthetic DLQ files")
+    gen_parser.add_argument("--count", type=int, required=True)
+    gen_parser.add_argument("--dir", required=True)
+    gen_parser.add_argument("--seed", type=int, default=42)
+
+    serve_parser = sub.add_parser("serve", help="Run the PostgREST stand-in in the foreground")
+    serve_parser.add_argument("--port", type=int, default=54321)
+    serve_parser.add_argument("--latency-ms", type=float, default=0.0)
+    serve_parser.add_argument("--error-rate", type=float, default=0.0)
+
+    one_parser = sub.add_parser("_run-one")  # internal: one scenario in a clean process
+    one_parser.add_argument("--dir", required=True)
+    one_parser.add_argument("--port", type=int, required=True)
+    one_parser.add_argument("--mode", choices=DEFAULT_MODES, required=True)
+    one_parser.add_argument("--workers", type=int, default=8)
+    one_parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        generate(args.dir, args.count, seed=args.seed)
+        print(f"✅ Wrote {args.count} synthetic DLQ files to {args.dir}")
+    elif args.command == "serve":
+        server = start_standin(args.port, args.latency_ms, args.error_rate)
+        print(f"✅ PostgREST stand-in at http://127.0.0.1:{server.server_port}/rest/v1/bookings")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
+    elif args.command == "_run-one":
+        print(json.dumps(run_one(args.dir, args.port, args.mode, args.workers, args.batch_size)))
+    else:
+        print("=" * 60)
+        print("⏱️  DLQ Recovery Benchmark")
+        print("=" * 60)
+        results = run_suite(args)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✅ Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
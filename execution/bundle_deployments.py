@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+Deployment Bundler
+
+Purpose: Post-render stage for marketing/deployments. Turns the per-clinic
+pages written by batch_render_mockups.py into an upload-ready bundle that
+serves fewer, smaller bytes and lets Netlify / Cloudflare Pages skip objects
+they already have.
+
+What it does:
+    - finds the <style> / inline <script> blocks in the template that contain
+      no {{FIELD}} placeholders (identical on every clinic page) and moves them
+      into content-hashed files (<slug>/assets/<hash>.css|.js), referenced
+      from every page
+    - writes one <bundle>/_headers with a /<slug>/assets/* rule per site that
+      marks its assets immutable (Netlify / Cloudflare Pages only read
+      _headers at the publish root, so per-site copies would be ignored)
+    - writes .gz (level 9) and .br (quality 11) siblings for HTML/CSS/JS/SVG
+    - stores every distinct output once in <state>/objects/<sha256> and
+      hardlinks it into place, so thousands of clinic folders share one copy
+      of each asset (and its compressed variants) on disk
+    - writes <state>/manifest.json with the sha256 and size of every file;
+      unchanged pages are detected from their source hash and skipped, and
+      files that disappeared from the deployments are pruned
+    - <state> defaults to <bundle>.state/, next to the bundle rather than in
+      it, so the object store is not uploaded and the manifest (which lists
+      every prospect's slug) is never published
+
+Usage:
+    python3 bundle_deployments.py                                  # marketing/deployments -> marketing/bundle
+    python3 bundle_deployments.py --src out/ --dest bundle/ --template t.html
+    python3 bundle_deployments.py --state /var/cache/bundle-state  # keep the store elsewhere
+    python3 batch_render_mockups.py --bundle                       # render + bundle
+
+Optional: pip install brotli (without it only .gz siblings are written)
+"""
+
+import os
+import re
+import sys
+import json
+import gzip
+import time
+import shutil
+import hashlib
+import argparse
+from urllib.parse import quote
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+# Paths
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # Workspace root
+SRC_DIR = os.path.join(BASE_DIR, "marketing", "deployments")
+BUNDLE_DIR = os.path.join(BASE_DIR, "marketing", "bundle")
+TEMPLATE_FILE = os.path.join(BASE_DIR, "marketing", "templates", "modern_dental_site.html")
+
+# Configuration
+MANIFEST_NAME = "manifest.json"
+BUNDLE_FORMAT = 2               # bump when page rewriting changes; older manifests rebundle all
+OBJECTS_DIR = "objects"
+COMPRESSIBLE = {".html", ".css", ".js", ".svg", ".json", ".txt", ".xml"}
+MIN_COMPRESS_BYTES = 256
+SKIP_NAMES = {".render-manifest.json"}
+POOL_THRESHOLD = 200            # pages; below this compressing inline is faster
+CHUNK_SIZE = 32
+SHARED_BLOCK_RE = re.compile(
+    r"<style(?:\s+type=\"text/css\")?>(?P<css>.*?)</style>"
+    r"|<script(?:\s+type=\"text/javascript\")?>(?P<js>.*?)</script>",
+    re.S | re.I,
+)
+HEADERS_RULE = """/{slug}/assets/*
+  Cache-Control: public, max-age=31536000, immutable
+"""
+
+
+# =============================================================================
+# Shared asset extraction
+# =============================================================================
+
+def shared_blocks(template_text: str) -> list:
+    """[(block_text, ext, body)] for template style/script blocks with no placeholders."""
+    blocks = []
+    for match in SHARED_BLOCK_RE.finditer(template_text):
+        body = match.group("css") if match.group("css") is not None else match.group("js")
+        if "{{" in body or not body.strip():
+            continue
+        ext = ".css" if match.group("css") is not None else ".js"
+        blocks.append((match.group(0), ext, body.strip() + "\n"))
+    return blocks
+
+
+def asset_plan(template_text: str) -> list:
+    """[(block_text, asset_name, replacement_tag, body_bytes)] in template order.
+
+    Tags are root-relative (`/{slug}/assets/...`, slug filled in per site) so
+    they resolve whether a page is served at /<slug>/, /<slug> or deeper.
+    """
+    plan = []
+    for block, ext, body in shared_blocks(template_text):
+        data = body.encode("utf-8")
+        name = f"{hashlib.sha256(data).hexdigest()[:16]}{ext}"
+        tag = (f'<link rel="stylesheet" href="/{{slug}}/assets/{name}">' if ext == ".css"
+               else f'<script src="/{{slug}}/assets/{name}"></script>')
+        plan.append((block, name, tag, data))
+    return plan
+
+
+def externalize(page: str, plan: list, slug: str) -> tuple:
+    """Swap shared inline blocks for asset references; returns (page, asset names used)."""
+    used = []
+    for block, name, tag, _ in plan:
+        if block in page:
+            page = page.replace(block, tag.format(slug=quote(slug)), 1)
+            used.append(name)
+    return page, used
+
+
+# =============================================================================
+# Content-addressed object store
+# =============================================================================
+
+def sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def put_object(objects: str, data: bytes, digest: str, suffix: str = "") -> str:
+    """Store `data` once as objects/<digest><suffix> (atomic); returns its path."""
+    path = os.path.join(objects, digest + suffix)
+    if not os.path.exists(path):
+        tmp = f"{path}.tmp{os.getpid()}"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    return path
+
+
+def compressed_variants(objects: str, data: bytes, digest: str) -> dict:
+    """Store .gz / .br for a stored object (compressed once per distinct content)."""
+    variants = {}
+    gz_path = os.path.join(objects, digest + ".gz")
+    if not os.path.exists(gz_path):
+        put_object(objects, gzip.compress(data, compresslevel=9, mtime=0), digest, ".gz")
+    variants[".gz"] = gz_path
+    if BROTLI_AVAILABLE:
+        br_path = os.path.join(objects, digest + ".br")
+        if not os.path.exists(br_path):
+            put_object(objects, brotli.compress(data, quality=11), digest, ".br")
+        variants[".br"] = br_path
+    return variants
+
+
+def link_into_place(obj_path: str, dest: str):
+    """Hardlink the object to `dest` (copy if the filesystem refuses links)."""
+    try:
+        st = os.stat(dest)
+        if st.st_ino == os.stat(obj_path).st_ino:
+            return
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    tmp = f"{dest}.tmp{os.getpid()}"
+    try:
+        os.link(obj_path, tmp)
+    except OSError:
+        shutil.copyfile(obj_path, tmp)
+    os.replace(tmp, dest)
+
+
+def emit(objects: str, dest_root: str, rel_path: str, data: bytes) -> dict:
+    """Write one output file (+ compressed siblings) through the object store."""
+    digest = sha256_bytes(data)
+    link_into_place(put_object(objects, data, digest), os.path.join(dest_root, rel_path))
+    entry = {"sha256": digest, "size": len(data)}
+    if os.path.splitext(rel_path)[1] in COMPRESSIBLE and len(data) >= MIN_COMPRESS_BYTES:
+        for suffix, obj_path in compressed_variants(objects, data, digest).items():
+            link_into_place(obj_path, os.path.join(dest_root, rel_path + suffix))
+            entry[suffix.lstrip(".") + "_size"] = os.path.getsize(obj_path)
+    return entry
+
+
+# =============================================================================
+# Bundling
+# =============================================================================
+
+def _bundle_site(job: tuple) -> dict:
+    """Bundle one clinic folder; returns {rel_path: manifest entry}."""
+    src_root, dest_root, objects, slug, plan = job
+    entries = {}
+    site = os.path.join(src_root, slug)
+    for dirpath, _, filenames in os.walk(site):
+        for filename in sorted(filenames):
+            if filename in SKIP_NAMES or filename.startswith(".tmp"):
+                continue
+            src = os.path.join(dirpath, filename)
+            rel_path = os.path.relpath(src, src_root).replace(os.sep, "/")
+            with open(src, "rb") as f:
+                data = f.read()
+            source_hash = sha256_bytes(data)
+            if filename.endswith(".html") and plan:
+                page, used = externalize(data.decode("utf-8"), plan, slug)
+                data = page.encode("utf-8")
+                for block, name, tag, body in plan:
+                    if name in used:
+                        entries[f"{slug}/assets/{name}"] = emit(objects, dest_root,
+                                                                f"{slug}/assets/{name}", body)
+            entry = emit(objects, dest_root, rel_path, data)
+            entry["source_sha256"] = source_hash
+            entries[rel_path] = entry
+    return entries
+
+
+def headers_file(files: dict) -> str:
+    """Root _headers with one immutable rule per site that has shared assets.
+
+    Cloudflare Pages allows a single splat per rule, so `/*/assets/*` would
+    not match; the rules are spelled out per slug instead.
+    """
+    slugs = sorted({p.split("/", 1)[0] for p in files if p.split("/")[1:2] == ["assets"]})
+    return "".join(HEADERS_RULE.format(slug=slug) for slug in slugs)
+
+
+def site_is_current(src_root: str, slug: str, previous: dict) -> bool:
+    """True if every source file of the site still hashes to what the manifest recorded."""
+    seen = 0
+    for dirpath, _, filenames in os.walk(os.path.join(src_root, slug)):
+        for filename in filenames:
+            if filename in SKIP_NAMES or filename.startswith(".tmp"):
+                continue
+            rel_path = os.path.relpath(os.path.join(dirpath, filename), src_root).replace(os.sep, "/")
+            entry = previous.get(rel_path)
+            if not entry or "source_sha256" not in entry:
+                return False
+            with open(os.path.join(dirpath, filename), "rb") as f:
+                if sha256_bytes(f.read()) != entry["source_sha256"]:
+                    return False
+            seen += 1
+    return seen > 0
+
+
+def prune(dest_root: str, objects: str, files: dict):
+    """Remove bundle files and objects no longer referenced by the manifest."""
+    keep = set()
+    for rel_path, entry in files.items():
+        keep.add(rel_path)
+        for suffix in (".gz", ".br"):
+            if suffix.lstrip(".") + "_size" in entry:
+                keep.add(rel_path + suffix)
+    removed = 0
+    for dirpath, dirnames, filenames in os.walk(dest_root):
+        for filename in filenames:
+            rel_path = os.path.relpath(os.path.join(dirpath, filename), dest_root).replace(os.sep, "/")
+            if rel_path not in keep:              # includes .objects/ + manifest.json of older bundles
+                os.unlink(os.path.join(dirpath, filename))
+                removed += 1
+    for dirpath, dirnames, filenames in os.walk(dest_root, topdown=False):
+        if dirpath != dest_root and not os.listdir(dirpath):
+            os.rmdir(dirpath)
+    live = {e["sha256"] for e in files.values()}
+    for name in os.listdir(objects) if os.path.isdir(objects) else []:
+        if name.split(".", 1)[0] not in live:
+            os.unlink(os.path.join(objects, name))
+    return removed
+
+
+def default_state_dir(dest_root: str) -> str:
+    """<bundle>.state next to the bundle, outside the published tree."""
+    return os.path.normpath(dest_root) + ".state"
+
+
+def bundle(src_root: str = SRC_DIR, dest_root: str = BUNDLE_DIR, template_path: str = TEMPLATE_FILE,
+           workers: int = None, force: bool = False, state_root: str = None) -> dict:
+    """Bundle every clinic folder under `src_root` into `dest_root`."""
+    started = time.perf_counter()
+    state_root = state_root or default_state_dir(dest_root)
+    objects = os.path.join(state_root, OBJECTS_DIR)
+    os.makedirs(objects, exist_ok=True)
+    os.makedirs(dest_root, exist_ok=True)
+    plan = []
+    if template_path and os.path.exists(template_path):
+        with open(template_path, "r", encoding="utf-8") as f:
+            plan = asset_plan(f.read())
+
+    manifest_path = os.path.join(state_root, MANIFEST_NAME)
+    previous = {}
+    if not force and os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            old = json.load(f)
+        if old.get("format") == BUNDLE_FORMAT and \
+                old.get("assets") == [name for _, name, _, _ in plan] and \
+                old.get("brotli") == BROTLI_AVAILABLE:
+            previous = old.get("files", {})
+
+    slugs = sorted(d for d in os.listdir(src_root)
+                   if os.path.isdir(os.path.join(src_root, d)) and not d.startswith("."))
+    by_site = {}
+    for rel_path, entry in previous.items():
+        if rel_path.endswith("/_headers") and "source_sha256" not in entry:
+            continue          # per-site _headers from older bundles; replaced by the root one
+        by_site.setdefault(rel_path.split("/", 1)[0], {})[rel_path] = entry
+    files, dirty = {}, []
+    for slug in slugs:
+        if site_is_current(src_root, slug, by_site.get(slug, {})):
+            files.update(by_site[slug])
+        else:
+            dirty.append((src_root, dest_root, objects, slug, plan))
+
+    if len(dirty) < POOL_THRESHOLD or workers == 1:
+        results = map(_bundle_site, dirty)
+        for entries in results:
+            files.update(entries)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for entries in pool.map(_bundle_site, dirty, chunksize=CHUNK_SIZE):
+                files.update(entries)
+    files.pop("_headers", None)
+    headers = headers_file(files)
+    if headers:
+        files["_headers"] = emit(objects, dest_root, "_headers", headers.encode("utf-8"))
+
+    pruned = prune(dest_root, objects, files)
+    totals = {"files": len(files), "bytes": sum(e["size"] for e in files.values()),
+              "gz_bytes": sum(e.get("gz_size", e["size"]) for e in files.values()),
+              "br_bytes": sum(e.get("br_size", e["size"]) for e in files.values())}
+    totals["disk_bytes"] = sum(os.path.getsize(os.path.join(objects, n)) for n in os.listdir(objects))
+    manifest = {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "format": BUNDLE_FORMAT,
+        "assets": [name for _, name, _, _ in plan],
+        "brotli": BROTLI_AVAILABLE,
+        "totals": totals,
+        "files": dict(sorted(files.items())),
+    }
+    tmp = manifest_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp, manifest_path)
+
+    return {"sites": len(slugs), "bundled": len(dirty), "unchanged": len(slugs) - len(dirty),
+            "pruned": pruned, "shared_assets": len(plan), **totals,
+            "seconds": round(time.perf_counter() - started, 3)}
+
+
+def print_stats(stats: dict, dest_root: str):
+    mb = lambda n: f"{n / 1e6:.1f} MB"
+    print(f"✅ Bundled {stats['bundled']} site(s), {stats['unchanged']} unchanged, "
+          f"{stats['pruned']} stale file(s) pruned in {stats['seconds']}s -> {dest_root}")
+    print(f"📊 {stats['files']} files, {mb(stats['bytes'])} raw, {mb(stats['gz_bytes'])} gzip, "
+          f"{mb(stats['br_bytes'])} brotli; {mb(stats['disk_bytes'])} on disk after hardlinking "
+          f"({stats['shared_assets']} shared asset(s))")
+    if not BROTLI_AVAILABLE:
+        print("⚠️  brotli not installed - only .gz siblings written (pip install brotli)")
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompressed, deduplicated deployment bundle")
+    parser.add_argument("--src", default=SRC_DIR, help="Rendered deployments (one folder per clinic)")
+    parser.add_argument("--dest", default=BUNDLE_DIR, help="Bundle output directory")
+    parser.add_argument("--state", help="Object store + manifest (default: <dest>.state, outside the bundle)")
+    parser.add_argument("--template", default=TEMPLATE_FILE, help="Template the pages were rendered from")
+    parser.add_argument("--workers", type=int, help="Compression processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="Ignore the manifest, rebundle everything")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.src):
+        print(f"❌ {args.src} not found - render the mockups first")
+        sys.exit(1)
+    stats = bundle(args.src, args.dest, args.template, args.workers, args.force, args.state)
+    print_stats(stats, args.dest)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,566 @@
+#!/usr/bin/env python3
+"""
+Clinic Configuration Mirror
+
+Purpose: Keeps the slow-changing configuration tables (clinics, services,
+specialists, doctors_services and the working-hours tables from
+05_working_hours.sql) in a local SQLite file, so availability checks, reports
+and diagnostics read them in microseconds instead of doing a PostgREST round
+trip per request (`Fetch Clinic` in n8n-4, `Fetch Services` in n8n-9, the
+specialists queries in diagnose_specialist_assignment.py).
+
+How it works:
+    - the first sync copies every table in full
+    - later syncs only read rows with updated_at >= high-water mark (minus a
+      small overlap); tables without updated_at are re-read in full
+    - deletions are picked up by a cheap id-only reconcile every 15 minutes
+    - rows live in SQLite (shared with other processes) and in an in-memory
+      view per table, rebuilt only when the table changed
+    - mirrored_rows() keeps one mirror per process; each call costs one
+      `PRAGMA data_version` check, and a table is re-read only after a sync
+      in another process changed its rows (sync_state.hwm / changed_at)
+    - invalidation hooks: on_change(callback) is called with (table, ids)
+      after every sync that changed something, and POST /invalidate makes
+      the daemon re-sync immediately (call it after editing config)
+    - staleness (seconds since the last successful sync of each table) is
+      served on /health and written as Prometheus metrics
+
+Requires updated_at triggers on the config tables
+(platform/widget/sql/17_config_updated_at.sql); without them every sync falls
+back to full reads.
+
+Usage:
+    python3 config_mirror.py serve                 # Sync every 60s + HTTP API on 127.0.0.1:8788
+    python3 config_mirror.py sync [--full]         # One sync and exit
+    python3 config_mirror.py get specialists --where clinic_id=butkevica is_active=true
+    python3 config_mirror.py status --max-age 300  # Staleness report (exit 1 if stale)
+
+    from config_mirror import ConfigMirror, mirrored_rows
+    mirror = ConfigMirror()                        # read-only use, no network
+    specialists = mirror.rows("specialists", clinic_id="butkevica", is_active=True)
+    services = mirrored_rows("doctors_services")  # None if no fresh mirror on this host
+
+HTTP API (serve):
+    GET  /tables/<table>?clinic_id=butkevica&is_active=true   -> JSON array
+    GET  /tables/<table>/<id>                                 -> JSON object
+    GET  /health                                              -> staleness (503 when stale)
+    GET  /metrics                                             -> Prometheus text
+    POST /invalidate[?table=<table>&full=1]                   -> re-sync now
+
+Environment Variables:
+    SUPABASE_URL - Supabase project URL
+    SUPABASE_SERVICE_KEY - Service role key
+    CONFIG_MIRROR_PATH - SQLite file (default: /home/n8n/config/config_mirror.sqlite)
+    CONFIG_MIRROR_HOST - Bind address for `serve` (default: 127.0.0.1; use the
+                         docker bridge IP, e.g. 172.17.0.1, for n8n in Docker)
+    CONFIG_MIRROR_PORT - HTTP port for `serve` (default: 8788; 8787 is slot_availability.py serve)
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import sqlite3
+import argparse
+import threading
+import http.server
+from datetime import datetime, timezone
+from urllib.parse import urlsplit, parse_qsl, unquote
+
+from env_config import load_env
+from slot_availability import parse_ts
+from postgrest_client import PostgrestClient, PostgrestError
+
+# Configuration
+MIRROR_PATH = os.getenv("CONFIG_MIRROR_PATH", "/home/n8n/config/config_mirror.sqlite")
+HTTP_HOST = os.getenv("CONFIG_MIRROR_HOST", "127.0.0.1")
+HTTP_PORT = int(os.getenv("CONFIG_MIRROR_PORT", "8788"))
+MIRRORED_TABLES = ("clinics", "services", "specialists", "doctors_services",
+                   "clinic_working_hours", "specialist_working_hours")
+SYNC_INTERVAL_SECONDS = 60
+SYNC_OVERLAP_SECONDS = 120        # re-read the last 2 min of changes every sync
+RECONCILE_SECONDS = 900           # id-only pass to notice deleted rows
+MAX_STALENESS_SECONDS = 300       # /health turns 503 past this
+REQUEST_TIMEOUT = 30
+UNDEFINED_COLUMN = "42703"        # Postgres error code: table has no updated_at
+
+
+def iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat()
+
+
+def matches(value, wanted) -> bool:
+    """Equality filter; string filters (CLI / query string) compare against the JSON form."""
+    if isinstance(wanted, str) and not isinstance(value, str):
+        return json.dumps(value) == wanted
+    return value == wanted
+
+
+# =============================================================================
+# Local store
+# =============================================================================
+
+class ConfigMirror:
+    """SQLite copy of the config tables plus in-memory views for lock-free reads."""
+
+    def __init__(self, path: str = MIRROR_PATH, tables: tuple = MIRRORED_TABLES):
+        self.path = path
+        self.tables = tables
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript(
+            """
+            PRAGMA journal_mode = WAL;
+            CREATE TABLE IF NOT EXISTS config_rows (
+                tbl TEXT NOT NULL,
+                id TEXT NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (tbl, id)
+            );
+            CREATE TABLE IF NOT EXISTS sync_state (
+                tbl TEXT PRIMARY KEY,
+                mode TEXT,              -- 'delta' (updated_at) or 'snapshot'
+                hwm TEXT,               -- newest updated_at seen
+                last_success REAL,
+                last_reconcile REAL,
+                last_error TEXT
+            );
+            """
+        )
+        if "changed_at" not in {row[1] for row in self.db.execute("PRAGMA table_info(sync_state)")}:
+            self.db.execute("ALTER TABLE sync_state ADD COLUMN changed_at REAL")   # mirrors from before
+        self.db_lock = threading.Lock()
+        self.hooks = []
+        self.views = {}                 # table -> {"by_id": {...}, "by_clinic": {...}}
+        self.state = {}                 # table -> sync_state row as dict
+        self.stats = {"syncs": 0, "rows_fetched": 0, "rows_changed": 0, "errors": 0}
+        self.data_version = None        # PRAGMA data_version at the last refresh()
+        self.reload()
+
+    def close(self):
+        self.db.close()
+
+    def reload(self, tables=None):
+        """Rebuild the in-memory views (and sync state) from SQLite."""
+        with self.db_lock:
+            for table in tables or self.tables:
+                rows = [json.loads(data) for (data,) in self.db.execute(
+                    "SELECT data FROM config_rows WHERE tbl = ? ORDER BY id", (table,))]
+                by_clinic = {}
+                for row in rows:
+                    by_clinic.setdefault(row.get("clinic_id"), []).append(row)
+                self.views[table] = {"by_id": {str(row["id"]): row for row in rows},
+                                     "by_clinic": by_clinic}
+            self._read_state()
+
+    def _read_state(self):
+        for tbl, mode, hwm, last_success, last_reconcile, last_error, changed_at in self.db.execute(
+                "SELECT tbl, mode, hwm, last_success, last_reconcile, last_error, changed_at FROM sync_state"):
+            self.state[tbl] = {"mode": mode, "hwm": hwm, "last_success": last_success,
+                               "last_reconcile": last_reconcile, "last_error": last_error,
+                               "changed_at": changed_at}
+
+    def refresh(self) -> list:
+        """Pick up syncs committed by another process; reload only tables whose rows changed."""
+        with self.db_lock:
+            version = self.db.execute("PRAGMA data_version").fetchone()[0]
+            if version == self.data_version:
+                return []
+            self.data_version = version
+            seen = {t: (s.get("hwm"), s.get("changed_at")) for t, s in self.state.items()}
+            self._read_state()
+        changed = [t for t in self.tables
+                   if (self.state.get(t) or {}).get("changed_at") is not None
+                   and (self.state[t]["hwm"], self.state[t]["changed_at"]) != seen.get(t)]
+        if changed:
+            self.reload(changed)
+        return changed
+
+    # -------------------------------------------------------------------------
+    # Read API
+    # -------------------------------------------------------------------------
+
+    def rows(self, table: str, **filters) -> list:
+        """Rows of `table` matching every equality filter (clinic_id uses an index)."""
+        view = self.views.get(table)
+        if view is None:
+            raise KeyError(f"{table} is not mirrored")
+        if "clinic_id" in filters:
+            rows = view["by_clinic"].get(filters.pop("clinic_id"), [])
+        else:
+            rows = view["by_id"].values()
+        if not filters:
+            return list(rows)
+        return [row for row in rows if all(matches(row.get(k), v) for k, v in filters.items())]
+
+    def get(self, table: str, row_id):
+        view = self.views.get(table)
+        if view is None:
+            raise KeyError(f"{table} is not mirrored")
+        return view["by_id"].get(str(row_id))
+
+    def staleness(self, now: float = None) -> dict:
+        """Seconds since each table last synced successfully (None = never)."""
+        now = time.time() if now is None else now
+        out = {}
+        for table in self.tables:
+            last = (self.state.get(table) or {}).get("last_success")
+            out[table] = round(now - last, 3) if last else None
+        return out
+
+    def on_change(self, callback):
+        """Register callback(table, ids) to run after a sync changed rows of `table`."""
+        self.hooks.append(callback)
+
+    # -------------------------------------------------------------------------
+    # Sync
+    # -------------------------------------------------------------------------
+
+    def _save_state(self, table: str, **values):
+        state = dict(self.state.get(table) or {"mode": None, "hwm": None, "last_success": None,
+                                               "last_reconcile": None, "last_error": None,
+                                               "changed_at": None})
+        state.update(values)
+        self.db.execute("INSERT OR REPLACE INTO sync_state (tbl, mode, hwm, last_success, last_reconcile, "
+                        "last_error, changed_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (table, state["mode"], state["hwm"], state["last_success"],
+                         state["last_reconcile"], state["last_error"], state.get("changed_at")))
+        self.state[table] = state
+
+    def _upsert(self, table: str, rows: list) -> set:
+        """Store rows; return the ids whose content actually changed."""
+        changed = set()
+        for row in rows:
+            row_id = str(row["id"])
+            data = json.dumps(row, sort_keys=True, ensure_ascii=False)
+            old = self.db.execute("SELECT data FROM config_rows WHERE tbl = ? AND id = ?",
+                                  (table, row_id)).fetchone()
+            if old and old[0] == data:
+                continue
+            self.db.execute("INSERT OR REPLACE INTO config_rows VALUES (?, ?, ?)", (table, row_id, data))
+            changed.add(row_id)
+        return changed
+
+    def _delete_missing(self, table: str, live_ids: set) -> set:
+        stored = {row_id for (row_id,) in self.db.execute(
+            "SELECT id FROM config_rows WHERE tbl = ?", (table,))}
+        gone = stored - live_ids
+        self.db.executemany("DELETE FROM config_rows WHERE tbl = ? AND id = ?",
+                            [(table, row_id) for row_id in gone])
+        return gone
+
+    def sync_table(self, client: PostgrestClient, table: str, full: bool = False,
+                   now: float = None) -> set:
+        """Bring one table up to date; return the changed (or deleted) ids."""
+        now = time.time() if now is None else now
+        state = self.state.get(table) or {}
+        delta = not full and state.get("mode") == "delta" and state.get("hwm")
+        with self.db_lock:
+            if delta:
+                since = iso(parse_ts(state["hwm"]) - SYNC_OVERLAP_SECONDS)
+                try:
+                    rows = list(client.stream(table, "*", {"updated_at": f"gte.{since}"},
+                                              order_column="updated_at"))
+                except PostgrestError as e:
+                    if e.code != UNDEFINED_COLUMN:
+                        raise
+                    self._save_state(table, mode="snapshot")
+                    delta, rows = False, None
+            if not delta:
+                rows = list(client.stream(table, "*"))
+            self.stats["rows_fetched"] += len(rows)
+            changed = self._upsert(table, rows)
+
+            values = {"last_success": now, "last_error": None}
+            if not delta:
+                changed |= self._delete_missing(table, {str(row["id"]) for row in rows})
+                values.update(last_reconcile=now,
+                              mode="delta" if not rows or "updated_at" in rows[0] else "snapshot")
+            elif now - (state.get("last_reconcile") or 0) >= RECONCILE_SECONDS:
+                live = {str(row["id"]) for row in client.stream(table, "id")}
+                changed |= self._delete_missing(table, live)
+                values["last_reconcile"] = now
+            stamps = [row["updated_at"] for row in rows if row.get("updated_at")]
+            if stamps:
+                newest = max(stamps, key=parse_ts)
+                if not state.get("hwm") or parse_ts(newest) > parse_ts(state["hwm"]):
+                    values["hwm"] = newest
+            if changed:
+                values["changed_at"] = now    # readers in other processes reload on this
+            self._save_state(table, **values)
+            self.db.commit()
+        return changed
+
+    def sync(self, client: PostgrestClient, tables=None, full: bool = False) -> dict:
+        """Sync `tables` (default all); a failing table keeps its last good copy."""
+        started = time.perf_counter()
+        changes, errors = {}, {}
+        for table in tables or self.tables:
+            try:
+                changed = self.sync_table(client, table, full)
+            except (PostgrestError, ConnectionError, TimeoutError, ValueError) as e:
+                errors[table] = str(e)
+                self.stats["errors"] += 1
+                with self.db_lock:
+                    self._save_state(table, last_error=str(e))
+                    self.db.commit()
+                continue
+            if changed:
+                changes[table] = changed
+        self.stats["syncs"] += 1
+        self.stats["rows_changed"] += sum(len(ids) for ids in changes.values())
+        if changes:
+            self.reload(changes)
+            for table, ids in changes.items():
+                for hook in self.hooks:
+                    hook(table, ids)
+        return {"changed": {t: len(ids) for t, ids in changes.items()}, "errors": errors,
+                "seconds": round(time.perf_counter() - started, 3)}
+
+    # -------------------------------------------------------------------------
+    # Metrics
+    # -------------------------------------------------------------------------
+
+    def prometheus(self, now: float = None) -> str:
+        """Render in node_exporter textfile-collector format."""
+        lines = ["# HELP config_mirror_staleness_seconds Seconds since the table last synced successfully.",
+                 "# TYPE config_mirror_staleness_seconds gauge"]
+        for table, age in self.staleness(now).items():
+            lines.append(f'config_mirror_staleness_seconds{{table="{table}"}} '
+                         f'{age if age is not None else "+Inf"}')
+        lines += ["# TYPE config_mirror_rows gauge"]
+        for table in self.tables:
+            lines.append(f'config_mirror_rows{{table="{table}"}} {len(self.views[table]["by_id"])}')
+        for name, value in self.stats.items():
+            lines += [f"# TYPE config_mirror_{name}_total counter", f"config_mirror_{name}_total {value}"]
+        return "\n".join(lines) + "\n"
+
+    def write_metrics(self, prom_path: str):
+        """Replaced atomically for the collector."""
+        tmp_path = f"{prom_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.prometheus())
+        os.replace(tmp_path, prom_path)
+
+
+_shared_mirrors = {}             # path -> ConfigMirror reused by mirrored_rows() in this process
+_shared_lock = threading.Lock()
+
+
+def shared_mirror(path: str = MIRROR_PATH):
+    """This process's read-only mirror of `path`, refreshed if another process synced (None if absent)."""
+    with _shared_lock:
+        mirror = _shared_mirrors.get(path)
+        if mirror is None:
+            if not os.path.exists(path):
+                return None
+            try:
+                mirror = _shared_mirrors[path] = ConfigMirror(path)
+            except sqlite3.Error:
+                return None
+    try:
+        mirror.refresh()
+    except sqlite3.Error:
+        return None
+    return mirror
+
+
+def mirrored_rows(table: str, max_age: float = MAX_STALENESS_SECONDS, path: str = MIRROR_PATH,
+                  **filters):
+    """Rows from the local mirror if it exists and is fresh, else None (caller asks PostgREST)."""
+    mirror = shared_mirror(path)
+    if mirror is None or table not in mirror.tables:
+        return None
+    age = mirror.staleness().get(table)
+    if age is None or age > max_age:
+        return None
+    return mirror.rows(table, **filters)
+
+
+# =============================================================================
+# HTTP API
+# =============================================================================
+
+class MirrorHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "ConfigMirror/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, status: int, payload, content_type: str = "application/json"):
+        body = payload if isinstance(payload, bytes) else \
+            json.dumps(payload, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        mirror = self.server.mirror
+        parts = urlsplit(self.path)
+        path = [unquote(p) for p in parts.path.strip("/").split("/") if p]
+        query = dict(parse_qsl(parts.query))
+        if path == ["health"]:
+            staleness = mirror.staleness()
+            ok = all(age is not None and age <= self.server.max_staleness for age in staleness.values())
+            return self.reply(200 if ok else 503, {"ok": ok, "staleness_seconds": staleness,
+                                                   "max_staleness_seconds": self.server.max_staleness})
+        if path == ["metrics"]:
+            return self.reply(200, mirror.prometheus().encode(), "text/plain; version=0.0.4")
+        if len(path) in (2, 3) and path[0] == "tables" and path[1] in mirror.tables:
+            if len(path) == 2:
+                return self.reply(200, mirror.rows(path[1], **query))
+            row = mirror.get(path[1], path[2])
+            return self.reply(200, row) if row else self.reply(404, {"error": "not found"})
+        self.reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        parts = urlsplit(self.path)
+        query = dict(parse_qsl(parts.query))
+        if parts.path.rstrip("/") != "/invalidate":
+            return self.reply(404, {"error": "not found"})
+        table = query.get("table")
+        if table and table not in self.server.mirror.tables:
+            return self.reply(400, {"error": f"unknown table {table}"})
+        self.server.invalidate(table, query.get("full") in ("1", "true"))
+        self.reply(202, {"queued": table or "all"})
+
+
+class MirrorServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, mirror: ConfigMirror, max_staleness: float = MAX_STALENESS_SECONDS):
+        super().__init__(address, MirrorHandler)
+        self.mirror = mirror
+        self.max_staleness = max_staleness
+        self.dirty = {}                 # table (None = all) -> full resync requested
+        self.dirty_lock = threading.Lock()
+        self.wake = threading.Event()
+
+    def invalidate(self, table: str = None, full: bool = False):
+        with self.dirty_lock:
+            self.dirty[table] = self.dirty.get(table, False) or full
+        self.wake.set()
+
+    def take_dirty(self) -> dict:
+        with self.dirty_lock:
+            dirty, self.dirty = self.dirty, {}
+        self.wake.clear()
+        return dirty
+
+
+def serve(mirror: ConfigMirror, client: PostgrestClient, port: int = HTTP_PORT,
+          interval: float = SYNC_INTERVAL_SECONDS, metrics_prom: str = None, host: str = HTTP_HOST):
+    """Sync on a schedule (or when invalidated) while serving the read API."""
+    server = MirrorServer((host, port), mirror)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    stop = threading.Event()
+
+    def request_stop(signum, frame):
+        print(f"\n🛑 Received signal {signum}, exiting...")
+        stop.set()
+        server.wake.set()
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+    mirror.on_change(lambda table, ids: print(f"🔄 {table}: {len(ids)} row(s) changed"))
+    print(f"👀 Serving {len(mirror.tables)} config table(s) on http://{host}:{port}, "
+          f"syncing every {interval:.0f}s")
+
+    dirty = {None: False}
+    while not stop.is_set():
+        if None in dirty:
+            result = mirror.sync(client, full=dirty[None])
+        else:
+            result = {"errors": {}}
+            for full in (False, True):
+                tables = [t for t, f in dirty.items() if f == full]
+                if tables:
+                    result["errors"].update(mirror.sync(client, tables, full)["errors"])
+        for table, error in result["errors"].items():
+            print(f"  ⚠️  {table}: sync failed, serving last copy ({error})")
+        if metrics_prom:
+            mirror.write_metrics(metrics_prom)
+        server.wake.wait(interval)
+        dirty = server.take_dirty() or {None: False}
+    server.shutdown()
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def make_client() -> PostgrestClient:
+    return PostgrestClient.from_env(timeout=REQUEST_TIMEOUT)
+
+
+def parse_where(pairs: list) -> dict:
+    where = {}
+    for pair in pairs or []:
+        key, sep, value = pair.partition("=")
+        if not sep:
+            raise SystemExit(f"❌ --where expects column=value, got {pair!r}")
+        where[key] = value
+    return where
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mirror of the clinic configuration tables")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve_parser = sub.add_parser("serve", help="Sync on a schedule and serve the HTTP read API")
+    serve_parser.add_argument("--host", default=HTTP_HOST)
+    serve_parser.add_argument("--port", type=int, default=HTTP_PORT)
+    serve_parser.add_argument("--interval", type=float, default=SYNC_INTERVAL_SECONDS,
+                              help="Seconds between delta syncs")
+    serve_parser.add_argument("--metrics-prom", help="Write Prometheus textfile metrics here")
+    sync_parser = sub.add_parser("sync", help="Sync once and exit")
+    sync_parser.add_argument("--full", action="store_true", help="Re-read every table in full")
+    sync_parser.add_argument("--table", action="append", choices=MIRRORED_TABLES)
+    get_parser = sub.add_parser("get", help="Print mirrored rows as JSON (no network)")
+    get_parser.add_argument("table", choices=MIRRORED_TABLES)
+    get_parser.add_argument("--where", nargs="*", metavar="COLUMN=VALUE")
+    status_parser = sub.add_parser("status", help="Show per-table staleness")
+    status_parser.add_argument("--max-age", type=float, default=MAX_STALENESS_SECONDS,
+                               help="Exit 1 if any table is older than this")
+    args = parser.parse_args()
+
+    load_env()
+
+    mirror = ConfigMirror()
+    try:
+        if args.command == "get":
+            print(json.dumps(mirror.rows(args.table, **parse_where(args.where)), indent=2,
+                             ensure_ascii=False))
+        elif args.command == "status":
+            staleness = mirror.staleness()
+            report = {table: {"rows": len(mirror.views[table]["by_id"]), "staleness_seconds": age,
+                              **(mirror.state.get(table) or {})} for table, age in staleness.items()}
+            print(json.dumps(report, indent=2))
+            stale = [t for t, age in staleness.items() if age is None or age > args.max_age]
+            if stale:
+                print(f"⚠️  Stale: {', '.join(stale)}", file=sys.stderr)
+                sys.exit(1)
+        else:
+            try:
+                client = make_client()
+            except ValueError as e:
+                print(f"❌ {e}", file=sys.stderr)
+                sys.exit(1)
+            if args.command == "serve":
+                serve(mirror, client, args.port, args.interval, args.metrics_prom, args.host)
+            else:
+                result = mirror.sync(client, args.table, args.full)
+                for table, error in result["errors"].items():
+                    print(f"❌ {table}: {error}", file=sys.stderr)
+                print(f"{'✅' if not result['errors'] else '⚠️ '} Synced in {result['seconds']}s, "
+                      f"changed: {result['changed'] or 'nothing'}", file=sys.stderr)
+                sys.exit(1 if result["errors"] else 0)
+    finally:
+        mirror.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,132 +5,221 @@ Diagnose and Fix Specialist Assignment Issue
 This script checks why specialists are not being assigned to bookings
 and provides actionable fixes.
 
-Usage: python execution/diagnose_specialist_assignment.py
+For every clinic it fetches specialists, services and unassigned confirmed
+bookings once (keyset-paginated via the shared postgrest_client, clinics in
+parallel; specialists and services come from the config mirror instead when
+it is fresh) and builds the full service x specialist coverage matrix locally,
+using the same rule as the n8n query:
+
+    specialists?clinic_id=eq.<clinic>&is_active=eq.true&specialties=cs.{<service>}
+
+Usage:
+    python execution/diagnose_specialist_assignment.py                  # All clinics
+    python execution/diagnose_specialist_assignment.py --clinic butkevica
+    python execution/diagnose_specialist_assignment.py --clinic butkevica --service butkevica_s2
+    python execution/diagnose_specialist_assignment.py --json > coverage.json
 """
 
 import os
+import sys
 import json
-from dotenv import load_dotenv
+import argparse
+
+from env_config import load_env
+
+DEFAULT_SUPABASE_URL = 'https://mugcvpwixdysmhgshobi.supabase.co'
+MAX_PARALLEL_CLINICS = 8
+REQUEST_TIMEOUT = 30
+
+
+def make_client():
+    """One shared PostgREST client (keep-alive connection per clinic worker)."""
+    from postgrest_client import PostgrestClient
+    return PostgrestClient(os.getenv('SUPABASE_URL', DEFAULT_SUPABASE_URL),
+                           os.getenv('SUPABASE_SERVICE_KEY'), timeout=REQUEST_TIMEOUT)
+
+
+def is_qualified(specialist, service_id):
+    """In-memory equivalent of is_active=eq.true&specialties=cs.{service_id}."""
+    return specialist.get('is_active') is True and service_id in (specialist.get('specialties') or [])
+
+
+def service_label(service):
+    name = service.get('name')
+    if isinstance(name, dict):
+        name = name.get('en') or name.get('lv') or next(iter(name.values()), None)
+    return name or service['id']
+
+
+def analyze_clinic(client, clinic):
+    """
+    Fetch one clinic's data and compute its coverage. Specialists and services
+    come from the config mirror when it is fresh (else one paginated query
+    each); unassigned bookings are always read from Supabase.
+    """
+    from config_mirror import mirrored_rows
+    clinic_id = clinic['id']
+    specialists = mirrored_rows('specialists', clinic_id=clinic_id)
+    if specialists is None:
+        specialists = client.fetch_all('specialists', 'id,name,is_active,specialties',
+                                       {'clinic_id': f'eq.{clinic_id}'})
+    services = mirrored_rows('services', clinic_id=clinic_id)
+    if services is None:
+        services = client.fetch_all('services', 'id,name', {'clinic_id': f'eq.{clinic_id}'})
+    unassigned = client.fetch_all('bookings', 'id,service_id,customer_name,start_time',
+                                  {'clinic_id': f'eq.{clinic_id}', 'specialist_id': 'is.null',
+                                   'status': 'eq.confirmed'})
+
+    unassigned_by_service = {}
+    for booking in unassigned:
+        sid = booking.get('service_id') or 'unknown'
+        unassigned_by_service[sid] = unassigned_by_service.get(sid, 0) + 1
+
+    coverage = {}
+    for service in services:
+        qualified = [s['name'] for s in specialists if is_qualified(s, service['id'])]
+        coverage[service['id']] = {
+            'name': service_label(service),
+            'qualified': qualified,
+            'unassigned_bookings': unassigned_by_service.get(service['id'], 0),
+        }
+
+    service_ids = {s['id'] for s in services}
+    return {
+        'clinic_id': clinic_id,
+        'clinic_name': clinic.get('name', clinic_id),
+        'specialists': len(specialists),
+        'inactive_specialists': [s['name'] for s in specialists if s.get('is_active') is not True],
+        'services': len(services),
+        'uncovered_services': [sid for sid, c in coverage.items() if not c['qualified']],
+        'unknown_specialties': sorted({
+            spec for s in specialists for spec in (s.get('specialties') or [])
+            if spec not in service_ids
+        }),
+        'unassigned_bookings': len(unassigned),
+        'coverage': coverage,
+    }
+
+
+def analyze(clinic_ids=None):
+    """Analyze the given clinics (default: all) concurrently."""
+    client = make_client()
+    if clinic_ids:
+        clinics = [{'id': cid, 'name': cid} for cid in clinic_ids]
+    else:
+        clinics = client.fetch_all('clinics', 'id,name')
+
+    from concurrent.futures import ThreadPoolExecutor
+    results = []
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_CLINICS) as pool:
+        futures = {pool.submit(analyze_clinic, client, c): c for c in clinics}
+        for future, clinic in futures.items():
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append({'clinic_id': clinic['id'], 'error': str(e)})
+    return sorted(results, key=lambda r: r['clinic_id'])
 
-# Load environment variables
-load_dotenv()
 
-SUPABASE_URL = os.getenv('SUPABASE_URL', 'https://mugcvpwixdysmhgshobi.supabase.co')
-SUPABASE_SERVICE_KEY = os.getenv('SUPABASE_SERVICE_KEY')
+def print_summary(results):
+    print("=" * 78)
+    print("SPECIALIST COVERAGE - ALL CLINICS")
+    print("=" * 78)
+    print(f"{'Clinic':<22} {'Specs':>5} {'Inact':>5} {'Svcs':>5} {'Uncov':>5} {'Unassigned':>10}")
+    print("-" * 78)
+    for r in results:
+        if 'error' in r:
+            print(f"{r['clinic_id']:<22} ❌ {r['error'][:50]}")
+            continue
+        status = "✅" if not r['uncovered_services'] and not r['inactive_specialists'] else "⚠️ "
+        print(f"{r['clinic_id'][:22]:<22} {r['specialists']:>5} {len(r['inactive_specialists']):>5} "
+              f"{r['services']:>5} {len(r['uncovered_services']):>5} {r['unassigned_bookings']:>10}  {status}")
 
-def diagnose():
+    problems = [r for r in results if 'error' not in r
+                and (r['uncovered_services'] or r['inactive_specialists'] or r['unknown_specialties'])]
+    for r in problems:
+        print(f"\n[{r['clinic_id']}]")
+        for sid in r['uncovered_services']:
+            c = r['coverage'][sid]
+            print(f"   ❌ {sid} ({c['name']}): no qualified active specialist"
+                  f" - {c['unassigned_bookings']} unassigned booking(s)")
+        for name in r['inactive_specialists']:
+            print(f"   - {name}: is_active is NULL or false")
+        if r['unknown_specialties']:
+            print(f"   - specialties not matching any service: {', '.join(r['unknown_specialties'])}")
+
+    if problems:
+        print("\n" + "=" * 78)
+        print("RECOMMENDED FIX:")
+        print("=" * 78)
+        print("""
+1. Inactive specialists - run in Supabase SQL Editor:
+
+   UPDATE public.specialists SET is_active = true WHERE is_active IS NULL;
+
+2. Uncovered services - add the service ID to a specialist's specialties:
+
+   UPDATE public.specialists
+   SET specialties = array_append(specialties, '<service_id>')
+   WHERE id = '<specialist_id>';
+
+3. Specialties that match no service usually mean a renamed service ID;
+   re-run the clinic seed SQL (e.g. platform/widget/sql/02_seed_sample_clinic.sql)
+""")
+
+
+def print_service_detail(result, service_id):
+    """Detailed view for one service (the original single-service check)."""
+    c = result['coverage'].get(service_id)
+    print(f"\n[{result['clinic_id']}] service {service_id}")
+    if c is None:
+        print(f"   ❌ Service {service_id} not found in clinic {result['clinic_id']}")
+        return
+    print(f"   n8n query would return {len(c['qualified'])} specialist(s)")
+    for name in c['qualified']:
+        print(f"   ✅ {name} is qualified")
+    if not c['qualified']:
+        print("   ⚠️  NO SPECIALISTS RETURNED - bookings for this service stay unassigned")
+    print(f"   Unassigned confirmed bookings: {c['unassigned_bookings']}")
+
+
+def diagnose(clinic_ids=None, service_id=None, as_json=False):
     """Run diagnostic checks"""
-    
-    if not SUPABASE_SERVICE_KEY:
+
+    if not os.getenv('SUPABASE_SERVICE_KEY'):
         print("❌ ERROR: SUPABASE_SERVICE_KEY not found in .env")
         print("   Add your service role key to .env file")
         return False
-    
+
     try:
-        import requests
-    except ImportError:
-        print("❌ ERROR: requests library not installed")
-        print("   Run: pip install requests")
-        return False
-    
-    headers = {
-        'apikey': SUPABASE_SERVICE_KEY,
-        'Authorization': f'Bearer {SUPABASE_SERVICE_KEY}',
-        'Content-Type': 'application/json'
-    }
-    
-    print("=" * 60)
-    print("SPECIALIST ASSIGNMENT DIAGNOSTIC")
-    print("=" * 60)
-    
-    # Check 1: Fetch specialists
-    print("\n[1] Checking specialists table...")
-    resp = requests.get(
-        f"{SUPABASE_URL}/rest/v1/specialists?clinic_id=eq.butkevica",
-        headers=headers
-    )
-    
-    if resp.status_code != 200:
-        print(f"   ❌ Failed to fetch specialists: {resp.text}")
+        results = analyze(clinic_ids)
+    except Exception as e:
+        print(f"❌ Failed to fetch clinics: {e}")
         return False
-    
-    specialists = resp.json()
-    print(f"   Found {len(specialists)} specialists")
-    
-    for s in specialists:
-        is_active = s.get('is_active')
-        specialties = s.get('specialties', [])
-        status = "✅" if is_active else "❌"
-        print(f"   {status} {s['name']}")
-        print(f"      is_active: {is_active}")
-        print(f"      specialties: {specialties}")
-    
-    # Check 2: Test the query n8n uses for service butkevica_s2
-    print("\n[2] Testing n8n query for service butkevica_s2...")
-    filter_url = f"{SUPABASE_URL}/rest/v1/specialists?clinic_id=eq.butkevica&is_active=eq.true&specialties=cs.{{butkevica_s2}}"
-    resp = requests.get(filter_url, headers=headers)
-    
-    if resp.status_code != 200:
-        print(f"   ❌ Query failed: {resp.text}")
-        return False
-    
-    qualified = resp.json()
-    print(f"   Query returned {len(qualified)} specialists")
-    
-    if len(qualified) == 0:
-        print("   ⚠️  NO SPECIALISTS RETURNED - This is the bug!")
-        print("\n   DIAGNOSIS:")
-        
-        # Check if is_active column exists
-        has_inactive = any(s.get('is_active') in [None, False] for s in specialists)
-        if has_inactive:
-            print("   - Some specialists have is_active = NULL or false")
-            print("   → FIX: Run the SQL migration to set is_active = true")
-        
-        # Check specialties
-        for s in specialists:
-            specs = s.get('specialties', [])
-            if 'butkevica_s2' not in specs:
-                print(f"   - {s['name']} doesn't have 'butkevica_s2' in specialties")
+
+    if as_json:
+        json.dump(results, sys.stdout, indent=2, ensure_ascii=False)
+        print()
     else:
-        for s in qualified:
-            print(f"   ✅ {s['name']} is qualified")
-    
-    # Check 3: Look at recent bookings without specialist_id
-    print("\n[3] Checking recent bookings without specialist assignment...")
-    resp = requests.get(
-        f"{SUPABASE_URL}/rest/v1/bookings?specialist_id=is.null&status=eq.confirmed&limit=5&order=created_at.desc",
-        headers=headers
-    )
-    
-    if resp.status_code == 200:
-        unassigned = resp.json()
-        print(f"   Found {len(unassigned)} recent unassigned bookings")
-        for b in unassigned[:3]:
-            print(f"   - {b.get('customer_name', 'Unknown')} | {b.get('service_id', 'No service')} | {b.get('start_time', '')[:10]}")
-    
-    print("\n" + "=" * 60)
-    print("RECOMMENDED FIX:")
-    print("=" * 60)
-    print("""
-1. Run this SQL in Supabase SQL Editor:
-   
-   ALTER TABLE public.specialists 
-   ADD COLUMN IF NOT EXISTS is_active BOOLEAN DEFAULT true;
-   
-   UPDATE public.specialists SET is_active = true WHERE is_active IS NULL;
+        print_summary(results)
+        if service_id:
+            for r in results:
+                if 'error' not in r:
+                    print_service_detail(r, service_id)
 
-2. Verify specialists have correct specialties:
-   - Dr. Jānis Liepiņš should have: butkevica_s1, s2, s4, s6, s8
-   - Dr. Elena Petrova should have: butkevica_s3, s4, s5
-   - Dr. Anna Bērziņa should have: butkevica_s7, s9, s10, s8
+    return all('error' not in r for r in results)
 
-3. If specialties are wrong, re-run the seed SQL:
-   platform/widget/sql/02_seed_sample_clinic.sql
-""")
-    
-    return True
+
+def main():
+    parser = argparse.ArgumentParser(description="Specialist coverage analyzer for all clinics")
+    parser.add_argument('--clinic', action='append', help="Clinic ID (repeatable; default: all clinics)")
+    parser.add_argument('--service', help="Show the n8n qualification result for one service ID")
+    parser.add_argument('--json', action='store_true', help="Print the full coverage matrix as JSON")
+    args = parser.parse_args()
+    load_env()
+    ok = diagnose(args.clinic, args.service, args.json)
+    sys.exit(0 if ok else 1)
 
 
 if __name__ == "__main__":
-    diagnose()
+    main()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+DLQ Replay Conflict Check
+
+Purpose: Stops recovery_dlq.py from creating double bookings. During a long
+outage the slot of a failed booking may have been sold to another patient,
+and stripe_session_id (the only idempotency key) cannot see that.
+
+How it works:
+    - before inserting, the date range covered by the pending DLQ bookings is
+      pulled from `bookings` once (one keyset-paginated query)
+    - blocking rows (confirmed / completed / pending with a live slot lock,
+      same rule as slot_availability.py) go into interval indexes ordered by
+      start time: one per clinic and one per (clinic, specialist)
+    - each DLQ booking is an O(log n) lookup:
+        with a specialist_id  -> any overlap on that specialist is a conflict
+        without one           -> a conflict once overlapping clinic bookings
+                                 reach the number of active specialists that
+                                 can perform the service (reserve_slot's rule)
+    - rows that are the DLQ booking itself (same stripe_session_id) or the
+      patient's own pending lock at the same start are not conflicts
+    - accepted bookings are added to the index, so two DLQ files for the
+      same slot conflict with each other too; release() gives the slot back
+      when the insert then fails, so the retry does not clash with itself
+    - a long-lived index (recovery_dlq.py --watch) is reused while it covers
+      the new files and is younger than `max_age`; otherwise refresh()
+      reloads it, widened to keep the range it already spans
+
+Conflicting files are moved to DLQ_DIR/conflicts/ by recovery_dlq.py, with a
+`.conflict.json` sidecar describing the clash, for manual handling.
+
+Usage:
+    from dlq_conflicts import ConflictIndex, booking_scope
+
+    conflicts = ConflictIndex(client)
+    conflicts.load([(booking, booking_scope(dlq_data)) for ...])
+    reason = conflicts.claim(booking, scope)      # None = free (and now reserved)
+    conflicts.release(booking)                    # insert failed: drop the reservation
+
+    conflicts.refresh(candidates, max_age=60)     # watch mode: reload only when needed
+"""
+
+import threading
+import time
+from datetime import datetime, timezone
+
+from slot_availability import OverlapCounter, is_blocking, parse_ts
+from postgrest_client import PostgrestError
+from config_mirror import mirrored_rows
+
+# Configuration
+DEFAULT_CLINIC_ID = "butkevica"      # same fallback as the n8n Extract Booking Data node
+CONFLICT_COLUMNS = ("id,clinic_id,specialist_id,service_id,start_time,end_time,status,"
+                    "slot_lock_expires_at,customer_email,stripe_session_id")
+CANDIDATE_STATUSES = "(confirmed,completed,pending)"
+
+
+def iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat()
+
+
+def booking_scope(dlq_data: dict) -> dict:
+    """Clinic / specialist a DLQ payload belongs to (not part of the inserted row)."""
+    booking = dlq_data.get("booking_data") or {}
+    metadata = ((dlq_data.get("original_input") or {}).get("data") or {}).get("object", {}).get("metadata") or {}
+    return {
+        "clinic_id": booking.get("clinic_id") or metadata.get("clinic_id") or DEFAULT_CLINIC_ID,
+        "specialist_id": booking.get("specialist_id") or metadata.get("specialist_id"),
+    }
+
+
+def interval(booking: dict) -> tuple:
+    """(start, end) epoch seconds, or None if the booking has no usable times."""
+    try:
+        start, end = parse_ts(booking.get("start_time")), parse_ts(booking.get("end_time"))
+    except ValueError:
+        return None
+    if start is None or end is None or end <= start:
+        return None
+    return start, end
+
+
+def reservation_key(booking: dict):
+    return booking.get("stripe_session_id") or (booking.get("customer_email"), booking.get("start_time"))
+
+
+class ConflictIndex:
+    """Blocking bookings of the replayed date range, indexed by clinic and specialist."""
+
+    def __init__(self, client, now: float = None):
+        self.client = client
+        self.now = time.time() if now is None else now
+        self.by_clinic = {}           # clinic_id -> OverlapCounter
+        self.by_specialist = {}       # (clinic_id, specialist_id) -> OverlapCounter
+        self.capacity = {}            # (clinic_id, service_id) -> active qualified specialists
+        self.lock = threading.Lock()  # shared by recovery worker threads
+        self.window = None            # (first, last, clinics) of the last load
+        self.reserved = {}            # reservation key -> (clinic, specialist, span) since the last load
+        self.loaded_at = None         # time.monotonic() of the last load
+        self.stats = {"rows_loaded": 0, "checked": 0, "conflicts": 0, "unchecked": 0}
+
+    def load(self, candidates: list) -> int:
+        """Pull every booking overlapping the candidates' range; candidates = [(booking, scope)]."""
+        spans = [(interval(b), s) for b, s in candidates]
+        spans = [(span, s) for span, s in spans if span]
+        if not spans:
+            return 0
+        first = min(span[0] for span, _ in spans)
+        last = max(span[1] for span, _ in spans)
+        clinics = sorted({s["clinic_id"] for _, s in spans})
+        own_sessions = {b["stripe_session_id"] for b, _ in candidates if b.get("stripe_session_id")}
+        own_slots = set()
+        for booking, _ in candidates:
+            span = interval(booking)
+            if span:
+                own_slots.add((booking.get("customer_email"), span[0]))
+
+        filters = {
+            "status": f"in.{CANDIDATE_STATUSES}",
+            "and": f"(start_time.lt.{iso(last)},end_time.gt.{iso(first)})",
+        }
+        if DEFAULT_CLINIC_ID in clinics:   # rows inserted without clinic_id belong to the default clinic
+            filters["or"] = f"(clinic_id.in.({','.join(clinics)}),clinic_id.is.null)"
+        else:
+            filters["clinic_id"] = f"in.({','.join(clinics)})"
+
+        clinic_rows, specialist_rows = {}, {}
+        for row in self.client.stream("bookings", CONFLICT_COLUMNS, filters):
+            self.stats["rows_loaded"] += 1
+            span = interval(row)
+            if span is None or not is_blocking(row, self.now):
+                continue
+            if row.get("stripe_session_id") in own_sessions:
+                continue          # the DLQ booking itself (handled by the idempotency check)
+            if row["status"] == "pending" and (row.get("customer_email"), span[0]) in own_slots:
+                continue          # the patient's own slot lock from checkout
+            clinic = row.get("clinic_id") or DEFAULT_CLINIC_ID
+            clinic_rows.setdefault(clinic, []).append(span)
+            if row.get("specialist_id"):
+                specialist_rows.setdefault((clinic, row["specialist_id"]), []).append(span)
+        self.by_clinic = {k: OverlapCounter(v) for k, v in clinic_rows.items()}
+        self.by_specialist = {k: OverlapCounter(v) for k, v in specialist_rows.items()}
+        self.window = (first, last, frozenset(clinics))
+        self.loaded_at = time.monotonic()
+        self.reserved = {}            # reloaded rows already include committed reservations
+
+        specialists = mirrored_rows("specialists", is_active=True)
+        if specialists is not None:
+            specialists = [sp for sp in specialists if sp.get("clinic_id") in clinics]
+        else:
+            try:
+                specialists = self.client.select("specialists", "id,clinic_id,is_active,specialties",
+                                                 {"clinic_id": f"in.({','.join(clinics)})", "is_active": "eq.true"},
+                                                 cache=True) or []
+            except PostgrestError:
+                specialists = []  # single-chair setup without a specialists table: capacity 1
+        services = {(s["clinic_id"], b.get("service_id")) for b, s in candidates}
+        for clinic, service_id in services:
+            active = [sp for sp in specialists if sp.get("clinic_id") == clinic]
+            if service_id:
+                active = [sp for sp in active if service_id in (sp.get("specialties") or [])]
+            self.capacity[(clinic, service_id)] = max(1, len(active))
+        return self.stats["rows_loaded"]
+
+    def covers(self, candidates: list, max_age: float = None) -> bool:
+        """True if the last load() spans every candidate (and is at most `max_age` seconds old)."""
+        if self.window is None:
+            return False
+        if max_age is not None and time.monotonic() - self.loaded_at > max_age:
+            return False
+        first, last, clinics = self.window
+        for booking, scope in candidates:
+            span = interval(booking)
+            if span and (span[0] < first or span[1] > last or scope["clinic_id"] not in clinics):
+                return False
+        return True
+
+    def refresh(self, candidates: list, max_age: float = None) -> int:
+        """
+        load() again unless covers(candidates, max_age); returns the rows
+        loaded, or None when the index was reused. While the index is still
+        fresh the old window is kept, so alternating dates do not thrash it.
+        """
+        if self.covers(candidates, max_age):
+            return None
+        if self.covers([], max_age):
+            first, last, clinics = self.window
+            candidates = list(candidates) + [
+                ({"start_time": iso(first), "end_time": iso(last)}, {"clinic_id": clinic})
+                for clinic in clinics
+            ]
+        with self.lock:
+            self.now = time.time()
+            before = self.stats["rows_loaded"]
+            self.load(candidates)
+            return self.stats["rows_loaded"] - before
+
+    def claim(self, booking: dict, scope: dict) -> str:
+        """Conflict reason for `booking`, or None after reserving its slot in the index."""
+        span = interval(booking)
+        with self.lock:
+            if span is None:
+                self.stats["unchecked"] += 1
+                return None
+            self.stats["checked"] += 1
+            clinic, specialist = scope["clinic_id"], scope.get("specialist_id")
+            clinic_index = self.by_clinic.setdefault(clinic, OverlapCounter([]))
+            if specialist:
+                specialist_index = self.by_specialist.setdefault((clinic, specialist), OverlapCounter([]))
+                if specialist_index.count(*span):
+                    self.stats["conflicts"] += 1
+                    return f"specialist {specialist} already booked at {booking['start_time']}"
+                specialist_index.add(*span)
+            else:
+                capacity = self.capacity.get((clinic, booking.get("service_id")), 1)
+                taken = clinic_index.count(*span)
+                if taken >= capacity:
+                    self.stats["conflicts"] += 1
+                    return (f"{taken} booking(s) already overlap {booking['start_time']} "
+                            f"at {clinic} (capacity {capacity})")
+            clinic_index.add(*span)
+            self.reserved[reservation_key(booking)] = (clinic, specialist, span)
+            return None
+
+    def release(self, booking: dict):
+        """Give back the slot claim() reserved for `booking` (no-op if none, e.g. after a reload)."""
+        with self.lock:
+            reservation = self.reserved.pop(reservation_key(booking), None)
+            if reservation is None:
+                return
+            clinic, specialist, span = reservation
+            if specialist:
+                self.by_specialist[(clinic, specialist)].remove(*span)
+            self.by_clinic[clinic].remove(*span)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Shared .env Loader
+
+Purpose: One `.env` parser for every script in execution/, instead of each
+script importing python-dotenv at start-up (or hand-rolling its own parser,
+as recovery_dlq.py did). stdlib only and cheap to import, so cron jobs and
+`--help` do not pay for it.
+
+Rules (the subset of the dotenv format our .env files use):
+    - variables already set in the environment always win
+    - only the repo root .env is read, so the result does not depend on the
+      directory a script is launched from; set ENV_FILE=/path/to/.env to
+      read that file first (e.g. a per-host file outside the checkout)
+    - `KEY=value`, optional `export ` prefix, `#` comments, blank lines
+    - values may be quoted with '...' or "..."; unquoted values lose a
+      trailing ` # comment`
+
+Usage:
+    from env_config import load_env
+
+    def main():
+        args = parser.parse_args()
+        load_env()
+
+Environment Variables:
+    ENV_FILE    Extra .env file read before the repo root one (optional)
+"""
+
+import os
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_ENV_FILE = os.path.join(REPO_ROOT, ".env")
+
+
+def env_files() -> list:
+    """$ENV_FILE (if set), then the repo root .env."""
+    extra = os.environ.get("ENV_FILE")
+    return [extra, REPO_ENV_FILE] if extra else [REPO_ENV_FILE]
+
+
+def parse_env_file(path: str) -> dict:
+    """KEY -> value for every assignment in `path`."""
+    values = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("export "):
+                line = line[len("export "):]
+            key, sep, value = line.partition("=")
+            if not sep:
+                continue
+            value = value.strip()
+            if len(value) >= 2 and value[0] == value[-1] and value[0] in "'\"":
+                value = value[1:-1]
+            else:
+                value = value.split(" #", 1)[0].rstrip()
+            values[key.strip()] = value
+    return values
+
+
+def load_env(paths: list = None) -> list:
+    """Load .env files into os.environ without overriding; return the files read."""
+    loaded = []
+    for path in dict.fromkeys(paths or env_files()):
+        if not os.path.isfile(path):
+            continue
+        for key, value in parse_env_file(path).items():
+            os.environ.setdefault(key, value)
+        loaded.append(path)
+    return loaded
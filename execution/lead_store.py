@@ -0,0 +1,492 @@
+#!/usr/bin/env python3
+"""
+Lead Store
+
+Purpose: One deduplicated lead list for the mockup pipeline. Leads currently
+live in marketing/leads/targets.json, the markdown tables in
+marketing/lead_research.md, the lead sections in
+execution/generated_leads_batch_*.md and the hardcoded list in
+marketing/templates/render_mockup.py, often with the same clinic spelled
+differently (`+371 67 552 431` vs `+371 67552431`).
+
+How it works:
+    - inputs are streamed row by row (JSONL, CSV, JSON arrays, markdown
+      tables and "## N. Clinic" + "**To:** `email`" sections), so memory stays
+      bounded no matter how many scraped leads a file holds
+    - phones are normalized to +371XXXXXXXX, websites to a bare domain, names
+      to a slug
+    - every lead is identified by hashed keys (phone, domain, email, slug) kept
+      in an on-disk SQLite index; a new row that hits any key merges into the
+      existing lead (filling gaps, never overwriting), so dedup is O(1) per row
+    - imports are incremental: unchanged files are skipped, and JSONL files
+      that only grew are read from where the last import stopped
+    - iter_targets() streams the active leads straight into
+      mockup_renderer.render_targets(); each lead keeps its first slug, so
+      merges never create a second deployment
+
+Usage:
+    python3 lead_store.py import marketing/leads/targets.json marketing/lead_research.md
+    python3 lead_store.py import scraped/*.jsonl scraped/*.csv
+    python3 lead_store.py render                      # index -> marketing/deployments
+    python3 lead_store.py export --out marketing/leads/targets.json
+    python3 lead_store.py stats
+
+Environment Variables:
+    LEADS_DIR - Directory for lead_index.sqlite (default: marketing/leads)
+"""
+
+import os
+import re
+import csv
+import json
+import time
+import hashlib
+import sqlite3
+import argparse
+import unicodedata
+
+# Configuration
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # Workspace root
+LEADS_DIR = os.getenv("LEADS_DIR", os.path.join(BASE_DIR, "marketing", "leads"))
+INDEX_FILE = os.path.join(LEADS_DIR, "lead_index.sqlite")
+DEFAULT_COUNTRY_CODE = "371"
+NATIONAL_DIGITS = 8
+COMMIT_EVERY = 5000
+READ_CHUNK = 1 << 16
+RESUME_CHECK_BYTES = 4096
+LEAD_FIELDS = ("name", "slug", "phone", "email", "current_website", "doctor_name", "status")
+
+# Input column names -> lead fields
+COLUMN_ALIASES = {
+    "name": "name", "clinic": "name", "clinic_name": "name", "clinic name": "name",
+    "website": "current_website", "current_website": "current_website", "domain": "current_website",
+    "url": "current_website", "site": "current_website",
+    "email": "email", "e-mail": "email", "to": "email",
+    "phone": "phone", "tel": "phone", "telephone": "phone", "phones": "phone",
+    "doctor": "doctor_name", "doctor_name": "doctor_name", "owner": "doctor_name",
+    "owner/director": "doctor_name", "director": "doctor_name",
+    "status": "status", "slug": "slug",
+}
+
+# Mailbox providers: their domain says nothing about the clinic
+FREEMAIL_DOMAINS = {
+    "gmail.com", "inbox.lv", "balticom.lv", "apollo.lv", "one.lv", "yahoo.com",
+    "hotmail.com", "outlook.com", "mail.ru", "yandex.ru", "icloud.com",
+}
+
+
+# =============================================================================
+# Normalization
+# =============================================================================
+
+def clean_text(value) -> str:
+    """Strip markdown emphasis / code ticks and placeholder dashes."""
+    if value is None:
+        return ""
+    text = str(value).strip()
+    text = re.sub(r"[*`]+", "", text).strip()
+    return "" if text in ("-", "—", "TBD", "N/A") else text
+
+
+def normalize_phones(value) -> list:
+    """All phone numbers in a cell, as E.164 strings (`+371 220-220-77, ...` -> ['+37122022077'])."""
+    phones = []
+    for part in re.split(r"[,;/]|\s{2,}", clean_text(value)):
+        digits = re.sub(r"\D", "", re.sub(r"\(.*?\)", "", part))
+        if digits.startswith("00"):
+            digits = digits[2:]
+        if len(digits) == NATIONAL_DIGITS:
+            digits = DEFAULT_COUNTRY_CODE + digits
+        if len(digits) >= NATIONAL_DIGITS + 1 and f"+{digits}" not in phones:
+            phones.append(f"+{digits}")
+    return phones
+
+
+def display_phone(e164: str) -> str:
+    """+37167552431 -> +371 67552431 (the targets.json format)."""
+    if e164.startswith("+" + DEFAULT_COUNTRY_CODE):
+        return f"+{DEFAULT_COUNTRY_CODE} {e164[1 + len(DEFAULT_COUNTRY_CODE):]}"
+    return e164
+
+
+def normalize_domain(value) -> str:
+    """`https://www.EraDental.lv/lv/` -> `eradental.lv`."""
+    text = clean_text(value).lower()
+    text = re.sub(r"^[a-z]+://", "", text).split("/", 1)[0].split(":", 1)[0].strip(".")
+    if text.startswith("www."):
+        text = text[4:]
+    return text if "." in text and " " not in text else ""
+
+
+def normalize_email(value) -> str:
+    match = re.search(r"[\w.+-]+@[\w-]+(\.[\w-]+)+", clean_text(value))
+    return match.group(0).lower() if match else ""
+
+
+def slugify(name: str) -> str:
+    """`Klīnika ELIZABETE` -> `klinika-elizabete`."""
+    text = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode()
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
+
+
+def normalize_lead(row: dict) -> dict:
+    """Raw input row (any supported column names) -> lead dict with identity keys."""
+    lead = {}
+    for column, value in row.items():
+        field = COLUMN_ALIASES.get(str(column).strip().lower())
+        if field and field not in lead and clean_text(value):
+            lead[field] = value
+    struck = any("~~" in str(v) for v in row.values() if v)
+    for field in list(lead):
+        lead[field] = clean_text(str(lead[field]).replace("~~", ""))
+
+    lead["name"] = re.sub(r"\s*\((NEW|UPDATED[^)]*)\)\s*$", "", lead.get("name", "")).strip()
+    phones = normalize_phones(lead.get("phone"))
+    lead["phone"] = display_phone(phones[0]) if phones else ""
+    lead["email"] = normalize_email(lead.get("email"))
+    lead["current_website"] = normalize_domain(lead.get("current_website"))
+    lead["slug"] = slugify(lead.get("slug") or lead["name"])
+    lead["active"] = 0 if struck else 1
+
+    domain = lead["current_website"]
+    if not domain and lead["email"] and lead["email"].split("@")[1] not in FREEMAIL_DOMAINS:
+        domain = lead["email"].split("@")[1]
+    lead["_keys"] = ([("phone", p) for p in phones] + [("domain", domain), ("email", lead["email"]),
+                     ("slug", lead["slug"])])
+    lead["_keys"] = [(kind, value) for kind, value in lead["_keys"] if value]
+    return lead
+
+
+def key_hash(kind: str, value: str) -> int:
+    """64-bit hashed identity key (the index's primary key)."""
+    digest = hashlib.blake2b(f"{kind}:{value}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+# =============================================================================
+# Streaming readers
+# =============================================================================
+
+def iter_jsonl(f, offset: int = 0):
+    """Yield (row, end_offset) for complete lines of a binary JSONL stream."""
+    f.seek(offset)
+    for raw in f:
+        if not raw.endswith(b"\n"):
+            return                      # partial last line: picked up next import
+        offset += len(raw)
+        raw = raw.strip()
+        if raw:
+            yield json.loads(raw), offset
+
+
+def iter_json_array(f):
+    """Yield the objects of a top-level JSON array without loading the whole file."""
+    decoder = json.JSONDecoder()
+    buffer, pos, started = "", 0, False
+    while True:
+        chunk = f.read(READ_CHUNK)
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if not started and pos < len(buffer):
+                if buffer[pos] != "[":
+                    raise ValueError("expected a JSON array")
+                started, pos = True, pos + 1
+                continue
+            if pos < len(buffer) and buffer[pos] == "]":
+                return
+            try:
+                obj, end = decoder.raw_decode(buffer, pos)
+            except ValueError:
+                break                   # object continues in the next chunk
+            yield obj
+            pos = end
+        if not chunk:
+            if buffer[pos:].strip():
+                raise ValueError("truncated JSON array")
+            return
+
+
+def split_md_row(line: str) -> list:
+    return [cell.strip() for cell in line.strip().strip("|").split("|")]
+
+
+def is_separator(cells: list) -> bool:
+    return all(re.fullmatch(r":?-{2,}:?", c) for c in cells if c)
+
+
+def iter_markdown(f):
+    """
+    Rows of every markdown table, plus `## N. Clinic` sections with a `**To:**` email.
+
+    A table's header is the row above its |---| separator. Blank lines inside a
+    table (common in lead_research.md) keep the header; any other text ends it.
+    """
+    header, pending, section = None, None, None
+    for line in f:
+        stripped = line.strip()
+        if stripped.startswith("|"):
+            cells = split_md_row(stripped)
+            if is_separator(cells):
+                header, pending = pending, None
+                continue
+            if pending is not None and header is not None:
+                yield dict(zip(header, pending))
+            pending = cells
+            continue
+        if not stripped:
+            continue
+        if pending is not None and header is not None:
+            yield dict(zip(header, pending))
+        header, pending = None, None
+        heading = re.match(r"^#{2,4}\s+\d+\.\s+(.+)$", stripped)
+        if heading:
+            if section and section.get("to"):
+                yield section
+            section = {"name": heading.group(1)}
+        elif stripped.startswith("#"):
+            if section and section.get("to"):
+                yield section
+            section = None
+        elif section is not None:
+            to = re.match(r"^[*-]\s+\*\*To:\*\*\s*(.+)$", stripped)
+            if to and "to" not in section:
+                section["to"] = to.group(1)
+            elif "phone" not in section:
+                phone = re.search(r"\+\d{3}[\d \-]{7,}\d", stripped)
+                if phone:
+                    section["phone"] = phone.group(0)
+    if pending is not None and header is not None:
+        yield dict(zip(header, pending))
+    if section and section.get("to"):
+        yield section
+
+
+def file_kind(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    return {".jsonl": "jsonl", ".ndjson": "jsonl", ".json": "json", ".csv": "csv",
+            ".md": "markdown", ".markdown": "markdown"}.get(ext, "")
+
+
+# =============================================================================
+# On-disk index
+# =============================================================================
+
+class LeadIndex:
+    """SQLite lead table + hashed identity keys + per-file import state."""
+
+    def __init__(self, path: str = INDEX_FILE):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS leads (
+                id INTEGER PRIMARY KEY,
+                slug TEXT NOT NULL UNIQUE,
+                name TEXT, phone TEXT, email TEXT, current_website TEXT,
+                doctor_name TEXT, status TEXT,
+                active INTEGER NOT NULL DEFAULT 1,
+                source TEXT, updated_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS lead_keys (
+                key INTEGER PRIMARY KEY,
+                lead_id INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS imports (
+                path TEXT PRIMARY KEY,
+                size INTEGER, mtime_ns INTEGER, offset INTEGER, tail_hash TEXT
+            );
+        """)
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+    def add(self, lead: dict, source: str) -> str:
+        """Insert or merge one normalized lead; returns 'new', 'merged' or 'skipped'."""
+        if not lead["slug"] or not lead["name"] or not lead["name"][0].isalnum():
+            return "skipped"
+        hashes = [key_hash(kind, value) for kind, value in lead["_keys"]]
+        placeholders = ",".join("?" * len(hashes))
+        row = self.db.execute(
+            f"SELECT l.* FROM lead_keys k JOIN leads l ON l.id = k.lead_id "
+            f"WHERE k.key IN ({placeholders}) ORDER BY l.id LIMIT 1", hashes).fetchone()
+        now = time.time()
+
+        if row is None:
+            slug, n = lead["slug"], 2
+            while self.db.execute("SELECT 1 FROM leads WHERE slug = ?", (slug,)).fetchone():
+                slug, n = f"{lead['slug']}-{n}", n + 1
+            cur = self.db.execute(
+                "INSERT INTO leads (slug, name, phone, email, current_website, doctor_name, status, "
+                "active, source, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (slug, lead["name"], lead["phone"], lead["email"], lead["current_website"],
+                 lead.get("doctor_name", ""), lead.get("status", ""), lead["active"], source, now))
+            lead_id, result = cur.lastrowid, "new"
+        else:
+            lead_id, result = row["id"], "merged"
+            updates = {f: lead.get(f) for f in ("name", "phone", "email", "current_website",
+                                                "doctor_name", "status")
+                       if lead.get(f) and not row[f]}
+            if lead["active"] and not row["active"]:
+                updates["active"] = 1
+            if updates:
+                updates["updated_at"] = now
+                assignments = ", ".join(f"{f} = ?" for f in updates)
+                self.db.execute(f"UPDATE leads SET {assignments} WHERE id = ?",
+                                (*updates.values(), lead_id))
+        self.db.executemany("INSERT OR IGNORE INTO lead_keys (key, lead_id) VALUES (?, ?)",
+                            [(h, lead_id) for h in hashes])
+        return result
+
+    def import_file(self, path: str, force: bool = False) -> dict:
+        """Stream one input file into the index (incremental unless `force`)."""
+        kind = file_kind(path)
+        if not kind:
+            raise ValueError(f"unsupported input type: {path}")
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        state = self.db.execute("SELECT * FROM imports WHERE path = ?", (path,)).fetchone()
+        stats = {"file": path, "rows": 0, "new": 0, "merged": 0, "skipped": 0, "resumed_at": 0}
+        if state and not force and state["size"] == st.st_size and state["mtime_ns"] == st.st_mtime_ns:
+            stats["unchanged"] = True
+            return stats
+
+        offset = 0
+        if kind == "jsonl":
+            with open(path, "rb") as f:
+                if state and not force and st.st_size >= state["offset"] and \
+                        self._tail_hash(f, state["offset"]) == state["tail_hash"]:
+                    offset = state["offset"]
+                stats["resumed_at"] = offset
+                for row, offset in iter_jsonl(f, offset):
+                    self._add_row(row, path, stats)
+                tail = self._tail_hash(f, offset)
+        else:
+            opener = {"newline": ""} if kind == "csv" else {}
+            with open(path, "r", encoding="utf-8-sig", **opener) as f:
+                rows = {"json": iter_json_array, "csv": csv.DictReader, "markdown": iter_markdown}[kind](f)
+                for row in rows:
+                    self._add_row(row, path, stats)
+            tail = None
+
+        self.db.execute(
+            "INSERT OR REPLACE INTO imports (path, size, mtime_ns, offset, tail_hash) VALUES (?, ?, ?, ?, ?)",
+            (path, st.st_size, st.st_mtime_ns, offset, tail))
+        self.db.commit()
+        return stats
+
+    def _add_row(self, row: dict, source: str, stats: dict):
+        stats["rows"] += 1
+        if not isinstance(row, dict):
+            stats["skipped"] += 1
+            return
+        stats[self.add(normalize_lead(row), os.path.basename(source))] += 1
+        if stats["rows"] % COMMIT_EVERY == 0:
+            self.db.commit()
+
+    @staticmethod
+    def _tail_hash(f, offset: int) -> str:
+        f.seek(max(0, offset - RESUME_CHECK_BYTES))
+        return hashlib.sha256(f.read(min(offset, RESUME_CHECK_BYTES))).hexdigest()
+
+    def iter_targets(self, include_inactive: bool = False, batch: int = 1000):
+        """Stream leads as mockup targets (render_targets input), in insertion order."""
+        last_id = 0
+        while True:
+            rows = self.db.execute(
+                "SELECT * FROM leads WHERE id > ? AND (active = 1 OR ?) ORDER BY id LIMIT ?",
+                (last_id, int(include_inactive), batch)).fetchall()
+            for row in rows:
+                yield {f: row[f] or "" for f in LEAD_FIELDS}
+            if len(rows) < batch:
+                return
+            last_id = rows[-1]["id"]
+
+    def stats(self) -> dict:
+        one = lambda sql: self.db.execute(sql).fetchone()[0]
+        return {
+            "leads": one("SELECT COUNT(*) FROM leads"),
+            "active": one("SELECT COUNT(*) FROM leads WHERE active = 1"),
+            "keys": one("SELECT COUNT(*) FROM lead_keys"),
+            "files": one("SELECT COUNT(*) FROM imports"),
+        }
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming, deduplicating lead store")
+    parser.add_argument("--index", default=INDEX_FILE, help="SQLite index path")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    imp = sub.add_parser("import", help="Stream lead files into the index")
+    imp.add_argument("files", nargs="+", help=".jsonl / .json / .csv / .md")
+    imp.add_argument("--force", action="store_true", help="Re-read files even if unchanged")
+
+    render = sub.add_parser("render", help="Render mockups for every active lead")
+    render.add_argument("--template", default=os.path.join(BASE_DIR, "marketing", "templates",
+                                                           "modern_dental_site.html"))
+    render.add_argument("--output", default=os.path.join(BASE_DIR, "marketing", "deployments"))
+    render.add_argument("--workers", type=int)
+    render.add_argument("--dry-run", action="store_true")
+    render.add_argument("--include-inactive", action="store_true")
+
+    exp = sub.add_parser("export", help="Write active leads as a JSON array (targets.json) or JSONL")
+    exp.add_argument("--out", required=True)
+    exp.add_argument("--include-inactive", action="store_true")
+
+    sub.add_parser("stats", help="Index statistics")
+    args = parser.parse_args()
+
+    index = LeadIndex(args.index)
+    try:
+        if args.command == "import":
+            for path in args.files:
+                try:
+                    s = index.import_file(path, args.force)
+                except (OSError, ValueError) as e:
+                    print(f"❌ {path}: {e}")
+                    continue
+                if s.get("unchanged"):
+                    print(f"⏭️  {path}: unchanged")
+                else:
+                    resumed = f" (resumed at byte {s['resumed_at']})" if s["resumed_at"] else ""
+                    print(f"✅ {path}: {s['rows']} row(s) -> {s['new']} new, {s['merged']} merged, "
+                          f"{s['skipped']} skipped{resumed}")
+            print(f"📊 {json.dumps(index.stats())}")
+
+        elif args.command == "render":
+            from mockup_renderer import render_targets, print_stats
+            stats = render_targets(args.template, index.iter_targets(args.include_inactive), args.output,
+                                   workers=args.workers, dry_run=args.dry_run)
+            print_stats(stats, args.output)
+
+        elif args.command == "export":
+            tmp = args.out + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                if args.out.endswith(".jsonl"):
+                    for target in index.iter_targets(args.include_inactive):
+                        f.write(json.dumps(target, ensure_ascii=False) + "\n")
+                else:
+                    f.write("[")
+                    for i, target in enumerate(index.iter_targets(args.include_inactive)):
+                        f.write((",\n    " if i else "\n    ") + json.dumps(target, ensure_ascii=False))
+                    f.write("\n]\n")
+            os.replace(tmp, args.out)
+            print(f"✅ Exported to {args.out}")
+
+        else:
+            print(json.dumps(index.stats(), indent=2))
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
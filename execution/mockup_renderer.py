@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Mockup Render Engine
+
+Purpose: The one renderer behind execution/batch_render_mockups.py and
+marketing/templates/render_mockup.py. Turns a template such as
+marketing/templates/modern_dental_site.html plus a list of target clinics
+into one page per clinic.
+
+How it works:
+    - the template is read and parsed once into literal / placeholder
+      segments; rendering a clinic is a single join, not one full-page copy
+      per placeholder
+    - any {{FIELD}} is filled from the target record: every key is available
+      upper-cased ("doctor_name" -> {{DOCTOR_NAME}}), and "name" is also
+      {{CLINIC_NAME}}. Unknown placeholders are left in the page unchanged,
+      as they were with str.replace
+    - each page's hash covers the template bytes and the target's data. The
+      hashes live in a manifest next to the output, so a re-run only
+      renders and writes pages whose template or data changed (or whose
+      file went missing)
+    - dirty pages are rendered across a process pool (inline for small
+      batches) and written atomically (temp file + os.replace)
+
+Usage:
+    from mockup_renderer import render_targets
+
+    stats = render_targets("marketing/templates/modern_dental_site.html", targets,
+                           "marketing/deployments", filename="index.html")
+
+    python3 mockup_renderer.py --template t.html --targets targets.json --output out/
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import argparse
+import tempfile
+from collections import deque
+
+# Configuration
+MANIFEST_NAME = ".render-manifest.json"
+PLACEHOLDER_RE = re.compile(r"\{\{\s*([A-Za-z0-9_]+)\s*\}\}")
+FIELD_ALIASES = {"name": "CLINIC_NAME"}
+SLUG_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*$")
+INLINE_THRESHOLD = 200          # below this many dirty pages a pool costs more than it saves
+CHUNK_SIZE = 64                 # pages per pool task
+MAX_IN_FLIGHT = 32              # pool tasks queued at once (bounds memory on huge lead lists)
+
+
+# =============================================================================
+# Compiled template
+# =============================================================================
+
+class CompiledTemplate:
+    """Template split once into literal and placeholder segments."""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        self.segments = []        # literals at even positions, field names at odd positions
+        last = 0
+        for match in PLACEHOLDER_RE.finditer(text):
+            self.segments.append(text[last:match.start()])
+            self.segments.append(match.group(1))
+            last = match.end()
+        self.segments.append(text[last:])
+        self.raw = {m.group(1): m.group(0) for m in PLACEHOLDER_RE.finditer(text)}
+        self.fields = set(self.raw)
+
+    @classmethod
+    def load(cls, path: str) -> "CompiledTemplate":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(f.read())
+
+    def render(self, values: dict) -> str:
+        parts = self.segments[:]
+        for i in range(1, len(parts), 2):
+            name = parts[i]
+            parts[i] = values[name] if name in values else self.raw[name]
+        return "".join(parts)
+
+
+def template_fields(target: dict) -> dict:
+    """Target record -> {FIELD: text} for every {{FIELD}} it can fill."""
+    values = {}
+    for key, value in target.items():
+        text = "" if value is None else value if isinstance(value, str) else str(value)
+        values[key.upper()] = text
+        if key in FIELD_ALIASES:
+            values[FIELD_ALIASES[key]] = text
+    return values
+
+
+def render_hash(template: CompiledTemplate, values: dict) -> str:
+    """Hash of template bytes + the values the template actually uses."""
+    used = {name: values.get(name) for name in sorted(template.fields)}
+    payload = template.digest + json.dumps(used, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# =============================================================================
+# Output
+# =============================================================================
+
+def atomic_write(path: str, data: bytes):
+    """Write via a temp file in the same directory, then rename over `path`."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def load_manifest(output_dir: str) -> dict:
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_manifest(output_dir: str, manifest: dict):
+    data = json.dumps(manifest, indent=1, sort_keys=True).encode("utf-8")
+    atomic_write(os.path.join(output_dir, MANIFEST_NAME), data)
+
+
+def is_current(output_dir: str, rel_path: str, digest: str, manifest: dict) -> bool:
+    entry = manifest.get(rel_path)
+    if not entry or entry.get("hash") != digest:
+        return False
+    try:
+        return os.path.getsize(os.path.join(output_dir, rel_path)) == entry.get("size")
+    except OSError:
+        return False
+
+
+# =============================================================================
+# Rendering (inline or in pool workers)
+# =============================================================================
+
+_worker_template = None
+
+
+def _init_worker(template_text: str):
+    global _worker_template
+    _worker_template = CompiledTemplate(template_text)
+
+
+def _render_chunk(jobs: list, output_dir: str, template: CompiledTemplate = None) -> list:
+    """Render and write [(rel_path, values, digest)]; returns [(rel_path, digest, size)]."""
+    template = template or _worker_template
+    written = []
+    for rel_path, values, digest in jobs:
+        data = template.render(values).encode("utf-8")
+        atomic_write(os.path.join(output_dir, rel_path), data)
+        written.append((rel_path, digest, len(data)))
+    return written
+
+
+def render_targets(template_path: str, targets, output_dir: str, filename: str = "index.html",
+                   workers: int = None, force: bool = False, dry_run: bool = False) -> dict:
+    """
+    Render one `<output_dir>/<slug>/<filename>` per target.
+
+    `targets` can be any iterable of dicts with a "slug" (e.g. a generator
+    streaming a lead list). Returns counts plus the slugs that were rendered.
+    """
+    started = time.perf_counter()
+    template = CompiledTemplate.load(template_path)
+    manifest = {} if force else load_manifest(output_dir)
+    stats = {"targets": 0, "rendered": 0, "unchanged": 0, "invalid": 0,
+             "rendered_slugs": [], "invalid_slugs": []}
+
+    dirty, seen, pool, in_flight = [], set(), None, deque()
+
+    def record(written):
+        for rel_path, digest, size in written:
+            manifest[rel_path] = {"hash": digest, "size": size}
+            stats["rendered"] += 1
+
+    def flush(final=False):
+        # Dirty pages are buffered until there are enough to justify a pool,
+        # then handed over chunk by chunk with a bounded number in flight.
+        nonlocal pool, dirty
+        if dry_run:
+            stats["rendered"] += len(dirty)
+            dirty = []
+            return
+        if pool is None and workers != 1 and not final and len(dirty) >= INLINE_THRESHOLD:
+            from concurrent.futures import ProcessPoolExecutor
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                       initargs=(template.text,))
+        while dirty and (final or len(dirty) >= CHUNK_SIZE):
+            chunk, dirty = dirty[:CHUNK_SIZE], dirty[CHUNK_SIZE:]
+            if pool is None:
+                record(_render_chunk(chunk, output_dir, template))
+                continue
+            in_flight.append(pool.submit(_render_chunk, chunk, output_dir))
+            while len(in_flight) > MAX_IN_FLIGHT:
+                record(in_flight.popleft().result())
+        while final and in_flight:
+            record(in_flight.popleft().result())
+
+    try:
+        for target in targets:
+            stats["targets"] += 1
+            slug = str(target.get("slug") or "")
+            if not SLUG_RE.match(slug) or slug in seen:
+                stats["invalid"] += 1
+                stats["invalid_slugs"].append(slug)
+                continue
+            seen.add(slug)
+            values = template_fields(target)
+            digest = render_hash(template, values)
+            rel_path = f"{slug}/{filename}"
+            if is_current(output_dir, rel_path, digest, manifest):
+                stats["unchanged"] += 1
+                continue
+            stats["rendered_slugs"].append(slug)
+            dirty.append((rel_path, values, digest))
+            if pool is not None or len(dirty) >= INLINE_THRESHOLD:
+                flush()
+        flush(final=True)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if stats["rendered"] and not dry_run:
+            save_manifest(output_dir, manifest)
+
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    return stats
+
+
+def print_stats(stats: dict, output_dir: str):
+    print(f"✅ {stats['rendered']} rendered, {stats['unchanged']} unchanged "
+          f"({stats['targets']} targets) in {stats['seconds']}s -> {output_dir}")
+    if stats["invalid"]:
+        print(f"⚠️  Skipped {stats['invalid']} target(s) with a missing, unsafe or duplicate slug: "
+              f"{', '.join(repr(s) for s in stats['invalid_slugs'][:10])}")
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Render one mockup page per target clinic")
+    parser.add_argument("--template", required=True, help="Template with {{FIELD}} placeholders")
+    parser.add_argument("--targets", required=True, help="JSON array of target records")
+    parser.add_argument("--output", required=True, help="Output directory (one folder per slug)")
+    parser.add_argument("--filename", default="index.html")
+    parser.add_argument("--workers", type=int, help="Render processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="Ignore the manifest, re-render everything")
+    parser.add_argument("--dry-run", action="store_true", help="Only report which pages would change")
+    args = parser.parse_args()
+
+    with open(args.targets, "r", encoding="utf-8") as f:
+        targets = json.load(f)
+    stats = render_targets(args.template, targets, args.output, args.filename,
+                           args.workers, args.force, args.dry_run)
+    print_stats(stats, args.output)
+    sys.exit(1 if stats["invalid"] else 0)
+
+
+if __name__ == "__main__":
+    main()
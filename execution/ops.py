@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Ops CLI
+
+Purpose: One entry point for the ops scripts that cron, systemd and the
+watchdog call, instead of one interpreter start-up plus a full set of eager
+imports per script. Subcommands run the existing scripts unchanged (same
+flags, same output), so `recovery_dlq.py --dry-run` and
+`ops.py dlq --dry-run` are interchangeable.
+
+How it works:
+    - nothing is imported until a subcommand is chosen; `ops.py --help` only
+      pays for interpreter start-up
+    - the script is then run with runpy, so heavy backends stay behind each
+      script's own lazy imports (PostgREST/ssl only when Supabase is called,
+      process pools only when rendering, inotify only in --watch)
+    - .env is loaded once by the shared env_config loader
+    - `startup-check` measures `python -X importtime` for --help and dry runs
+      and fails when import time goes over the budget, so a new eager import
+      shows up before it reaches the every-minute cron jobs
+
+Usage:
+    python3 ops.py --help
+    python3 ops.py dlq --dry-run
+    python3 ops.py diagnose --clinic butkevica
+    python3 ops.py mockups --dry-run
+    python3 ops.py workflows --mapping clinic.json --dry-run
+    python3 ops.py startup-check                      # exit 1 if over budget
+    python3 ops.py startup-check --budget-ms 30 --all
+
+Environment Variables:
+    Loaded from .env (see env_config.py) before the subcommand runs.
+"""
+
+import os
+import sys
+import time
+
+from env_config import REPO_ROOT, load_env
+
+# Configuration
+COMMANDS = {
+    # name: (script relative to the repo root, summary)
+    "dlq": ("execution/recovery_dlq.py", "Recover failed bookings from the n8n dead letter queue"),
+    "dlq-archive": ("execution/archive_dlq.py", "Archive / look up processed DLQ files"),
+    "diagnose": ("execution/diagnose_specialist_assignment.py", "Specialist coverage diagnostics"),
+    "mockups": ("execution/batch_render_mockups.py", "Render one mockup site per target clinic"),
+    "bundle": ("execution/bundle_deployments.py", "Precompressed upload bundle of rendered mockups"),
+    "workflows": ("platform/widget/scripts/update_clinic_info.py",
+                  "Bulk-update clinic details in n8n workflow JSON"),
+    "catalog": ("execution/workflow_catalog.py", "Workflow catalog and query-cost linter"),
+    "availability": ("execution/slot_availability.py", "Slot availability engine / API"),
+    "sweeper": ("execution/slot_lock_sweeper.py", "Expire lapsed slot locks and pending duplicates"),
+    "recall": ("execution/recall_engine.py", "Incremental 6-month recall engine"),
+    "reminders": ("execution/reminder_dispatcher.py", "Appointment reminder / recall dispatcher"),
+    "analytics": ("execution/analytics_rollup.py", "Rollup-based monthly analytics"),
+    "config": ("execution/config_mirror.py", "Local mirror of the clinic config tables"),
+    "leads": ("execution/lead_store.py", "Lead store (import, dedupe, export)"),
+}
+STARTUP_BUDGET_MS = 25            # imports on top of a bare interpreter
+STARTUP_RUNS = 5                  # best of N, importtime is noisy
+STARTUP_CHECKS = (                # hot paths: cron, watchdog and --help
+    ("--help",),
+    ("dlq", "--help"),
+    ("dlq", "--dry-run"),
+    ("diagnose", "--help"),
+    ("mockups", "--help"),
+    ("workflows", "--help"),
+)
+
+
+def usage() -> str:
+    lines = ["usage: ops.py <command> [args...]", "", "commands:"]
+    for name, (_, summary) in COMMANDS.items():
+        lines.append(f"  {name:<14}{summary}")
+    lines += [f"  {'startup-check':<14}Check --help / dry-run import time against the budget", "",
+              "Run `ops.py <command> --help` for the command's own options."]
+    return "\n".join(lines)
+
+
+def run_command(name: str, argv: list) -> int:
+    """Run a registered script as __main__ with `argv`; return its exit code."""
+    import runpy
+    script = os.path.join(REPO_ROOT, COMMANDS[name][0])
+    script_dir = os.path.dirname(script)
+    if script_dir not in sys.path:
+        sys.path.insert(0, script_dir)
+    sys.argv = [f"ops.py {name}"] + argv
+    load_env()
+    try:
+        runpy.run_path(script, run_name="__main__")
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            return e.code or 0
+        print(e.code, file=sys.stderr)
+        return 1
+    return 0
+
+
+# =============================================================================
+# Start-up budget
+# =============================================================================
+
+def parse_importtime(stderr: str, skip: set = frozenset()) -> dict:
+    """Top-level module -> cumulative import ms from `-X importtime` output."""
+    out = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if name.startswith("  ") or name.strip() in skip or not cumulative.strip().isdigit():
+            continue          # nested import, interpreter start-up, or the header line
+        out[name.strip()] = int(cumulative) / 1000
+    return out
+
+
+def measure(argv: list, env: dict, runs: int, skip: set) -> tuple:
+    """Best-of-`runs` (import ms, wall ms, heaviest modules) for `ops.py argv`."""
+    import subprocess
+    best = None
+    for _ in range(runs):
+        started = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-X", "importtime", os.path.abspath(__file__)] + list(argv),
+                              env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        wall = (time.perf_counter() - started) * 1000
+        modules = parse_importtime(proc.stderr, skip)
+        total = sum(modules.values())
+        if best is None or total < best[0]:
+            heaviest = sorted(modules.items(), key=lambda kv: -kv[1])[:3]
+            best = (total, wall, heaviest)
+    return best
+
+
+def startup_check(budget_ms: float = STARTUP_BUDGET_MS, runs: int = STARTUP_RUNS,
+                  check_all: bool = False) -> bool:
+    """
+    Print the import cost of each check; False if a hot-path check is over
+    `budget_ms`. With `check_all`, every other command's --help is reported
+    too (long-running daemons load their backends anyway, so not enforced).
+    """
+    import subprocess
+    import tempfile
+    baseline = subprocess.run([sys.executable, "-X", "importtime", "-c", "pass"],
+                              stderr=subprocess.PIPE, text=True).stderr
+    skip = set(parse_importtime(baseline))
+    checks = list(STARTUP_CHECKS)
+    if check_all:
+        checks += [(name, "--help") for name in COMMANDS if (name, "--help") not in checks]
+
+    ok = True
+    print(f"{'Command':<28} {'Imports ms':>10} {'Wall ms':>8}  Heaviest imports")
+    with tempfile.TemporaryDirectory() as dlq_dir:
+        env = dict(os.environ, DLQ_DIR=dlq_dir)     # dry runs see an empty queue
+        for argv in checks:
+            total, wall, heaviest = measure(argv, env, runs, skip)
+            enforced = argv in STARTUP_CHECKS
+            over = enforced and total > budget_ms
+            ok = ok and not over
+            status = "❌" if over else "✅" if enforced else "ℹ️ "
+            top = ", ".join(f"{name} {ms:.1f}" for name, ms in heaviest)
+            print(f"{' '.join(argv):<28} {total:>10.1f} {wall:>8.0f}  {status} {top}")
+    print(f"📊 Budget {budget_ms:.0f} ms of imports on top of a bare interpreter (best of {runs})")
+    return ok
+
+
+def main():
+    argv = sys.argv[1:]
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage())
+        return 0
+    if argv[0] == "startup-check":
+        import argparse
+        parser = argparse.ArgumentParser(prog="ops.py startup-check",
+                                         description="Enforce the CLI start-up import budget")
+        parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS)
+        parser.add_argument("--runs", type=int, default=STARTUP_RUNS)
+        parser.add_argument("--all", action="store_true", help="Also report every other command's --help (not enforced)")
+        args = parser.parse_args(argv[1:])
+        return 0 if startup_check(args.budget_ms, max(1, args.runs), args.all) else 1
+    if argv[0] not in COMMANDS:
+        print(f"❌ Unknown command: {argv[0]}\n\n{usage()}", file=sys.stderr)
+        return 2
+    return run_command(argv[0], argv[1:])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+Shared PostgREST Client
+
+Purpose: One Supabase/PostgREST client for every script in execution/ instead
+of each script hand-rolling request URLs (or pulling in supabase-py).
+
+Features:
+    - stdlib only: one persistent keep-alive connection per thread, so a
+      client can be shared by worker threads
+    - gzip responses, explicit timeouts; network failures surface as the
+      builtin ConnectionError / TimeoutError
+    - retries with jittered exponential backoff on connection errors,
+      timeouts, 429 and 502/503/504 (writes only retry when safe)
+    - stream(): constant-memory keyset pagination (order=id, id=gt.<last>),
+      optionally on another column with id as the tiebreaker
+    - insert() / upsert() in chunks; rows with different key sets are sent
+      with ?columns=<union> and Prefer: missing=default, so PostgREST does
+      not reject the batch (PGRST102) and absent keys get the column default
+    - optional in-process TTL cache for slow-changing tables
+      (clinics, specialists, services, doctors_services, working hours)
+    - table() query builder compatible with the subset of supabase-py used
+      by recovery_dlq.py (select / eq / in_ / insert / execute().data)
+
+Usage:
+    from postgrest_client import PostgrestClient
+
+    client = PostgrestClient.from_env()
+    for row in client.stream("bookings", "id,status", {"clinic_id": "eq.butkevica"}):
+        ...
+    clinics = client.select("clinics", "id,name", cache=True)
+    client.upsert("bookings", rows, on_conflict="stripe_session_id")
+
+Environment Variables:
+    SUPABASE_URL (or VITE_SUPABASE_URL) - Supabase project URL
+    SUPABASE_SERVICE_KEY (or SUPABASE_SERVICE_ROLE_KEY) - Service role key
+"""
+
+import os
+import ssl
+import gzip
+import json
+import time
+import random
+import threading
+import http.client
+from urllib.parse import urlsplit, quote
+
+# Configuration
+DEFAULT_TIMEOUT = 30
+DEFAULT_PAGE_SIZE = 1000          # PostgREST default max-rows
+DEFAULT_WRITE_CHUNK = 500
+MAX_RETRIES = 4
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 15
+DEFAULT_CACHE_TTL = 300
+RETRY_STATUSES = {429, 502, 503, 504}
+QUERY_SAFE = '.,()*:"'               # PostgREST filter syntax left unescaped
+CACHEABLE_TABLES = {
+    "clinics", "specialists", "services", "doctors_services",
+    "clinic_working_hours", "specialist_working_hours",
+}
+
+
+class PostgrestError(Exception):
+    """Non-2xx PostgREST response."""
+
+    def __init__(self, status: int, message: str, code: str = None, details=None):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+        self.message = message
+        self.code = code
+        self.details = details
+
+
+def write_columns(rows: list, prefer: str) -> tuple:
+    """
+    (params, prefer) for a bulk write. PostgREST rejects a batch whose rows
+    have different keys (PGRST102) unless ?columns= names the union; with
+    missing=default the absent keys then get the column default, not NULL.
+    """
+    keys = {}
+    for row in rows:
+        keys.update(dict.fromkeys(row))
+    if all(len(row) == len(keys) for row in rows):
+        return None, prefer
+    return {"columns": ",".join(keys)}, f"{prefer},missing=default"
+
+
+class _NotSent(ConnectionError):
+    """Connection failed before the request reached the server (always safe to retry)."""
+
+
+class PostgrestClient:
+    """Pooled, retrying, paginating PostgREST client."""
+
+    def __init__(self, url: str, key: str, timeout: float = DEFAULT_TIMEOUT,
+                 max_retries: int = MAX_RETRIES, cache_ttl: float = DEFAULT_CACHE_TTL):
+        parts = urlsplit(url)
+        self.https = parts.scheme == "https"
+        self.host = parts.hostname
+        self.port = parts.port or (443 if self.https else 80)
+        self.prefix = parts.path.rstrip("/") + "/rest/v1"
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.cache_ttl = cache_ttl
+        self.headers = {
+            "apikey": key,
+            "Authorization": f"Bearer {key}",
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+            "Accept-Encoding": "gzip",
+        }
+        self._ssl = ssl.create_default_context() if self.https else None
+        self._local = threading.local()
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+        self._stats_lock = threading.Lock()   # worker threads share one client
+        self.stats = {"requests": 0, "retries": 0, "cache_hits": 0}
+
+    @classmethod
+    def from_env(cls, **kwargs) -> "PostgrestClient":
+        url = os.getenv("SUPABASE_URL") or os.getenv("VITE_SUPABASE_URL")
+        key = os.getenv("SUPABASE_SERVICE_KEY") or os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+        if not url or not key:
+            raise ValueError("Missing Supabase credentials. Set SUPABASE_URL and SUPABASE_SERVICE_KEY")
+        return cls(url, key, **kwargs)
+
+    def _count(self, stat: str):
+        with self._stats_lock:
+            self.stats[stat] += 1
+
+    # -------------------------------------------------------------------------
+    # Transport
+    # -------------------------------------------------------------------------
+
+    def request(self, method: str, table: str, params=None, body=None, prefer: str = None,
+                idempotent: bool = None):
+        """
+        One PostgREST call with retries; returns the decoded JSON body.
+
+        Reads (and upserts) retry on any transient failure. Plain inserts only
+        retry when the request provably was not applied (connect failure,
+        429/503), so a lost response can never create a duplicate row.
+        """
+        if idempotent is None:
+            idempotent = method in ("GET", "HEAD")
+        path = f"{self.prefix}/{table}"
+        if params:
+            path += "?" + "&".join(f"{k}={quote(str(v), safe=QUERY_SAFE)}" for k, v in params.items())
+        headers = dict(self.headers, Prefer=prefer) if prefer else self.headers
+        data = json.dumps(body).encode() if body is not None else None
+
+        for attempt in range(self.max_retries + 1):
+            self._count("requests")
+            retry_after = None
+            try:
+                status, resp_headers, payload = self._send(method, path, data, headers)
+            except (ConnectionError, TimeoutError, http.client.HTTPException) as e:
+                applied = not isinstance(e, _NotSent)
+                if attempt == self.max_retries or (applied and not idempotent):
+                    raise e.__cause__ if isinstance(e, _NotSent) else e
+            else:
+                if status < 400:
+                    return json.loads(payload) if payload else None
+                if status not in RETRY_STATUSES or attempt == self.max_retries or (
+                        not idempotent and status not in (429, 503)):
+                    raise self._error(status, payload)
+                retry_after = resp_headers.get("retry-after")
+            self._count("retries")
+            delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt)
+            time.sleep(float(retry_after) if retry_after and retry_after.isdigit()
+                       else random.uniform(delay / 2, delay))
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if self.https:
+                conn = http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout,
+                                                   context=self._ssl)
+            else:
+                conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def _send(self, method: str, path: str, data: bytes, headers: dict):
+        """One round trip on this thread's keep-alive connection."""
+        conn = self._connection()
+        reused = conn.sock is not None
+        try:
+            if not reused:
+                try:
+                    conn.connect()
+                except OSError as e:
+                    raise _NotSent("connect failed") from e
+            conn.request(method, path, body=data, headers=headers)
+            resp = conn.getresponse()
+            payload = resp.read()
+        except (http.client.RemoteDisconnected, BrokenPipeError) as e:
+            conn.close()
+            if reused:  # server closed an idle keep-alive connection before reading
+                raise _NotSent("stale connection") from e
+            raise
+        except BaseException:
+            conn.close()
+            raise
+        if resp.getheader("Content-Encoding") == "gzip":
+            payload = gzip.decompress(payload)
+        if resp.will_close:
+            conn.close()
+        return resp.status, {k.lower(): v for k, v in resp.getheaders()}, payload
+
+    @staticmethod
+    def _error(status: int, payload: bytes) -> PostgrestError:
+        try:
+            body = json.loads(payload)
+        except ValueError:
+            body = {"message": payload.decode("utf-8", "replace")}
+        if not isinstance(body, dict):
+            body = {"message": str(body)}
+        return PostgrestError(status, body.get("message") or http.client.responses.get(status, ""),
+                              body.get("code"), body.get("details"))
+
+    # -------------------------------------------------------------------------
+    # Reads
+    # -------------------------------------------------------------------------
+
+    def select(self, table: str, select: str = "*", filters: dict = None, order: str = None,
+               limit: int = None, cache: bool = False) -> list:
+        """Single-request read; `cache=True` serves repeats from the TTL cache."""
+        params = {"select": select}
+        params.update(filters or {})
+        if order:
+            params["order"] = order
+        if limit:
+            params["limit"] = limit
+        if not cache:
+            return self.request("GET", table, params)
+
+        key = (table, tuple(sorted(params.items())))
+        now = time.monotonic()
+        with self._cache_lock:
+            hit = self._cache.get(key)
+            if hit and hit[0] > now:
+                self._count("cache_hits")
+                return hit[1]
+        rows = self.request("GET", table, params)
+        with self._cache_lock:
+            self._cache[key] = (now + self.cache_ttl, rows)
+        return rows
+
+    def stream(self, table: str, select: str = "*", filters: dict = None, order_column: str = "id",
+               page_size: int = DEFAULT_PAGE_SIZE):
+        """
+        Yield every matching row, one page in memory at a time.
+
+        Keyset pagination on id (order=id.asc&id=gt.<last>), or on
+        (order_column, id) when paging by e.g. created_at / updated_at.
+        """
+        cursor = None
+        order = "id.asc" if order_column == "id" else f"{order_column}.asc,id.asc"
+        while True:
+            params = {"select": select, "order": order, "limit": page_size}
+            params.update(filters or {})
+            if cursor is not None:
+                if order_column == "id":
+                    params["id"] = f"gt.{cursor[1]}"
+                else:
+                    params["or"] = (f'({order_column}.gt."{cursor[0]}",'
+                                    f'and({order_column}.eq."{cursor[0]}",id.gt.{cursor[1]}))')
+            page = self.request("GET", table, params)
+            yield from page
+            if len(page) < page_size:
+                return
+            cursor = (page[-1].get(order_column), page[-1]["id"])
+
+    def fetch_all(self, table: str, select: str = "*", filters: dict = None, cache: bool = False,
+                  **kwargs) -> list:
+        """stream() collected into a list; cached tables can be served from the TTL cache."""
+        if not cache:
+            return list(self.stream(table, select, filters, **kwargs))
+        key = (table, "all", select, tuple(sorted((filters or {}).items())))
+        now = time.monotonic()
+        with self._cache_lock:
+            hit = self._cache.get(key)
+            if hit and hit[0] > now:
+                self._count("cache_hits")
+                return hit[1]
+        rows = list(self.stream(table, select, filters, **kwargs))
+        with self._cache_lock:
+            self._cache[key] = (now + self.cache_ttl, rows)
+        return rows
+
+    # -------------------------------------------------------------------------
+    # Writes
+    # -------------------------------------------------------------------------
+
+    def invalidate(self, table: str = None):
+        """Drop cached responses for `table` (or everything)."""
+        with self._cache_lock:
+            for key in [k for k in self._cache if table is None or k[0] == table]:
+                del self._cache[key]
+
+    def insert(self, table: str, rows, returning: bool = True, chunk_size: int = DEFAULT_WRITE_CHUNK) -> list:
+        """Insert rows in chunks (each chunk is one all-or-nothing request)."""
+        rows = [rows] if isinstance(rows, dict) else list(rows)
+        prefer = "return=representation" if returning else "return=minimal"
+        out = []
+        for i in range(0, len(rows), chunk_size):
+            chunk = rows[i:i + chunk_size]
+            params, chunk_prefer = write_columns(chunk, prefer)
+            out.extend(self.request("POST", table, params, chunk, chunk_prefer) or [])
+        self.invalidate(table)
+        return out
+
+    def upsert(self, table: str, rows, on_conflict: str = None, ignore_duplicates: bool = False,
+               returning: bool = True, chunk_size: int = DEFAULT_WRITE_CHUNK) -> list:
+        """Insert-or-update on `on_conflict` columns; safe to retry."""
+        rows = [rows] if isinstance(rows, dict) else list(rows)
+        resolution = "ignore-duplicates" if ignore_duplicates else "merge-duplicates"
+        prefer = f"resolution={resolution},return={'representation' if returning else 'minimal'}"
+        out = []
+        for i in range(0, len(rows), chunk_size):
+            chunk = rows[i:i + chunk_size]
+            params, chunk_prefer = write_columns(chunk, prefer)
+            if on_conflict:
+                params = dict(params or {}, on_conflict=on_conflict)
+            out.extend(self.request("POST", table, params, chunk, chunk_prefer, idempotent=True) or [])
+        self.invalidate(table)
+        return out
+
+    def update(self, table: str, filters: dict, values: dict, returning: bool = False) -> list:
+        """PATCH rows matching `filters` (a filtered PATCH is idempotent)."""
+        prefer = "return=representation" if returning else "return=minimal"
+        out = self.request("PATCH", table, filters, values, prefer, idempotent=True)
+        self.invalidate(table)
+        return out or []
+
+    # -------------------------------------------------------------------------
+    # supabase-py compatible builder
+    # -------------------------------------------------------------------------
+
+    def table(self, name: str) -> "Query":
+        return Query(self, name)
+
+
+class APIResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class Query:
+    """Minimal supabase-py style builder: client.table(t).select(c).eq(k, v).execute()."""
+
+    def __init__(self, client: PostgrestClient, table: str):
+        self.client, self.table_name = client, table
+        self.method, self.params, self.body = "GET", {}, None
+
+    def select(self, columns: str = "*"):
+        self.params["select"] = columns
+        return self
+
+    def eq(self, column: str, value):
+        self.params[column] = f"eq.{value}"
+        return self
+
+    def neq(self, column: str, value):
+        self.params[column] = f"neq.{value}"
+        return self
+
+    def in_(self, column: str, values: list):
+        self.params[column] = "in.(" + ",".join(f'"{v}"' for v in values) + ")"
+        return self
+
+    def order(self, column: str, desc: bool = False):
+        self.params["order"] = f"{column}.{'desc' if desc else 'asc'}"
+        return self
+
+    def limit(self, count: int):
+        self.params["limit"] = count
+        return self
+
+    def insert(self, rows):
+        self.method, self.body = "POST", rows
+        return self
+
+    def execute(self) -> APIResponse:
+        if self.method == "POST":
+            rows = self.body if isinstance(self.body, list) else [self.body]
+            columns, prefer = write_columns(rows, "return=representation")
+            data = self.client.request("POST", self.table_name, dict(self.params, **(columns or {})) or None,
+                                       self.body, prefer)
+            self.client.invalidate(self.table_name)
+        else:
+            data = self.client.request("GET", self.table_name, self.params)
+        return APIResponse(data)
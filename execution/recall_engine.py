@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+"""
+Incremental Recall Engine
+
+Purpose: Finds the 6-month recall patients for n8n-7-daily-reminders-and-recall
+without re-reading the whole booking history every morning. The workflow's
+`Fetch Past Bookings` / `Fetch Future Bookings` nodes pull every booking ever
+made and `Filter Recall Patients` groups them by email in JS; this engine keeps
+a local SQLite mirror instead:
+
+    bookings   slim copy of every booking (id, email, status, start_time, ...)
+    patients   per email: last visit (and its clinic, for the recall email's
+               branding), next future visit, next time either can change
+               (the earliest booking start still in the future)
+    meta       sync high-water mark (bookings.updated_at, id)
+
+Each run fetches only bookings with updated_at >= high-water mark (minus a small
+overlap for transactions that committed late), refreshes the patients those
+rows touch plus the patients whose upcoming booking has just moved into the
+past, and answers the +/-7 day window from the index on last_visit.
+
+Requires bookings.updated_at (platform/widget/sql/16_bookings_updated_at.sql).
+Deleted bookings are only noticed by a full rebuild; run `rebuild` weekly.
+
+Usage:
+    python3 recall_engine.py run                       # Sync + print recall candidates (JSON)
+    python3 recall_engine.py run --no-sync
+    python3 recall_engine.py rebuild                   # Drop local state, full resync
+    python3 recall_engine.py status
+    python3 recall_engine.py parity                    # Compare with the n8n JS filter (live data)
+    python3 recall_engine.py parity --synthetic 50000  # Offline parity + timing check
+
+Environment Variables:
+    SUPABASE_URL - Supabase project URL
+    SUPABASE_SERVICE_KEY - Service role key
+    RECALL_DIR - Local state directory (default: /home/n8n/recall)
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+from env_config import load_env
+from slot_availability import parse_ts
+from postgrest_client import PostgrestClient
+
+# Configuration
+RECALL_DIR = os.getenv("RECALL_DIR", "/home/n8n/recall")
+INDEX_FILE = os.path.join(RECALL_DIR, "recall_index.sqlite")
+PAGE_SIZE = 1000
+SYNC_OVERLAP_SECONDS = 600     # re-read the last 10 min of changes every sync
+REQUEST_TIMEOUT = 30
+RECALL_MONTHS = 6
+RECALL_WINDOW_DAYS = 7
+
+PAST_STATUSES = ("completed", "confirmed")
+FUTURE_STATUSES = ("confirmed", "pending")
+TRACKED_STATUSES = tuple(sorted(set(PAST_STATUSES + FUTURE_STATUSES)))
+BOOKING_COLUMNS = ("id,clinic_id,customer_email,customer_name,customer_phone,language,status,"
+                   "start_time,updated_at")
+
+
+# =============================================================================
+# Recall rules (shared with the n8n Code nodes)
+# =============================================================================
+
+def js_add_months(dt: datetime, months: int) -> datetime:
+    """Date.setMonth() semantics: day overflow rolls into the next month."""
+    total = dt.month - 1 + months
+    year, month = dt.year + total // 12, total % 12 + 1
+    first = dt.replace(year=year, month=month, day=1)
+    return first + timedelta(days=dt.day - 1)
+
+
+def recall_window(now: datetime) -> tuple:
+    """`Calculate Recall Window`: 6 months ago +/- 7 days."""
+    six_months_ago = js_add_months(now, -RECALL_MONTHS)
+    return (six_months_ago - timedelta(days=RECALL_WINDOW_DAYS),
+            six_months_ago + timedelta(days=RECALL_WINDOW_DAYS))
+
+
+def language_preference(language, phone) -> str:
+    """Stored language if valid, else +371 / 8-digit phone = Latvian."""
+    lang = (language or "").lower()
+    if lang in ("lv", "en", "ru"):
+        return lang
+    digits = "".join(c for c in (phone or "") if c.isdigit())
+    return "lv" if not digits or digits.startswith("371") or len(digits) == 8 else "en"
+
+
+def js_iso(ts: float) -> str:
+    """Date.toISOString() output for an epoch timestamp."""
+    dt = datetime.fromtimestamp(ts, tz=timezone.utc)
+    return dt.strftime("%Y-%m-%dT%H:%M:%S.") + f"{dt.microsecond // 1000:03d}Z"
+
+
+def legacy_filter(past_bookings: list, future_bookings: list, window_start: float,
+                  window_end: float) -> list:
+    """Port of the `Filter Recall Patients` Code node (the parity reference)."""
+    emails_with_future = {
+        b["customer_email"].lower() for b in future_bookings if b.get("customer_email")
+    }
+    last = {}
+    for b in past_bookings:
+        if not b.get("customer_email"):
+            continue
+        email = b["customer_email"].lower()
+        start = parse_ts(b["start_time"])
+        if email not in last or start > last[email]["date"]:
+            last[email] = {"date": start, "name": b.get("customer_name"),
+                           "phone": b.get("customer_phone"), "email": b["customer_email"],
+                           "language": b.get("language")}
+
+    patients = []
+    for email, data in last.items():
+        if email in emails_with_future:
+            continue
+        if window_start <= data["date"] <= window_end:
+            patients.append({
+                "patient_email": data["email"],
+                "patient_name": data["name"],
+                "language_preference": language_preference(data["language"], data["phone"]),
+                "last_appointment": js_iso(data["date"]),
+            })
+    return patients
+
+
+# =============================================================================
+# Local index
+# =============================================================================
+
+class RecallIndex:
+    """SQLite mirror of bookings plus the per-patient recall aggregates."""
+
+    def __init__(self, path: str = INDEX_FILE):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.executescript(
+            """
+            PRAGMA journal_mode = WAL;
+            CREATE TABLE IF NOT EXISTS bookings (
+                id TEXT PRIMARY KEY,
+                email TEXT,
+                raw_email TEXT,
+                name TEXT,
+                phone TEXT,
+                language TEXT,
+                status TEXT,
+                start_time REAL,
+                clinic_id TEXT
+            );
+            CREATE INDEX IF NOT EXISTS bookings_email ON bookings (email, start_time);
+            CREATE TABLE IF NOT EXISTS patients (
+                email TEXT PRIMARY KEY,
+                raw_email TEXT,
+                name TEXT,
+                phone TEXT,
+                language TEXT,
+                last_visit REAL,
+                next_visit REAL,
+                next_change REAL,
+                clinic_id TEXT
+            );
+            CREATE INDEX IF NOT EXISTS patients_last_visit ON patients (last_visit);
+            CREATE INDEX IF NOT EXISTS patients_next_change ON patients (next_change);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            """
+        )
+        if "clinic_id" not in {row[1] for row in self.db.execute("PRAGMA table_info(patients)")}:
+            # index from before clinic_id was tracked: add the columns and resync from scratch
+            self.db.executescript(
+                "ALTER TABLE bookings ADD COLUMN clinic_id TEXT; ALTER TABLE patients ADD COLUMN clinic_id TEXT;")
+            self.reset()
+            self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+    def get_meta(self, key: str):
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value):
+        self.db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, str(value)))
+
+    def reset(self):
+        self.db.executescript("DELETE FROM bookings; DELETE FROM patients; DELETE FROM meta;")
+
+    def apply(self, rows: list) -> set:
+        """Upsert booking rows; return the (lowercased) emails they touch."""
+        touched = set()
+        for row in rows:
+            previous = self.db.execute("SELECT email FROM bookings WHERE id = ?", (row["id"],)).fetchone()
+            if previous and previous[0]:
+                touched.add(previous[0])
+            raw_email = row.get("customer_email")
+            email = raw_email.lower() if raw_email else None
+            if email:
+                touched.add(email)
+            self.db.execute(
+                "INSERT OR REPLACE INTO bookings VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (row["id"], email, raw_email, row.get("customer_name"), row.get("customer_phone"),
+                 row.get("language"), row.get("status"), parse_ts(row.get("start_time")),
+                 row.get("clinic_id")),
+            )
+        return touched
+
+    def refresh(self, emails, now: float):
+        """Recompute the patient aggregates for `emails` as of `now`."""
+        for email in emails:
+            last, next_visit, next_change = None, None, None
+            for raw_email, name, phone, language, status, start, clinic_id in self.db.execute(
+                "SELECT raw_email, name, phone, language, status, start_time, clinic_id FROM bookings "
+                "WHERE email = ? AND start_time IS NOT NULL ORDER BY rowid", (email,)
+            ):
+                if status in PAST_STATUSES and start < now and (last is None or start > last[5]):
+                    last = (raw_email, name, phone, language, status, start, clinic_id)
+                if start > now and status in TRACKED_STATUSES:
+                    next_change = start if next_change is None else min(next_change, start)
+                    if status in FUTURE_STATUSES:
+                        next_visit = start if next_visit is None else min(next_visit, start)
+            if last is None and next_change is None:
+                self.db.execute("DELETE FROM patients WHERE email = ?", (email,))
+                continue
+            raw_email, name, phone, language = last[:4] if last else (None,) * 4
+            self.db.execute(
+                "INSERT OR REPLACE INTO patients VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (email, raw_email, name, phone, language, last[5] if last else None,
+                 next_visit, next_change, last[6] if last else None),
+            )
+
+    def refresh_due(self, now: float) -> int:
+        """Refresh patients whose next booking start has passed since the last run."""
+        due = [row[0] for row in self.db.execute(
+            "SELECT email FROM patients WHERE next_change <= ?", (now,))]
+        self.refresh(due, now)
+        return len(due)
+
+    def candidates(self, window_start: float, window_end: float, now: float) -> list:
+        """Patients last seen inside the window with no upcoming visit."""
+        rows = self.db.execute(
+            "SELECT raw_email, name, phone, language, last_visit, clinic_id FROM patients "
+            "WHERE last_visit BETWEEN ? AND ? AND (next_visit IS NULL OR next_visit <= ?) "
+            "ORDER BY last_visit",
+            (window_start, window_end, now),
+        )
+        return [{
+            "patient_email": raw_email,
+            "patient_name": name,
+            "language_preference": language_preference(language, phone),
+            "last_appointment": js_iso(last_visit),
+            "clinic_id": clinic_id,
+        } for raw_email, name, phone, language, last_visit, clinic_id in rows]
+
+    def stats(self) -> dict:
+        return {
+            "bookings": self.db.execute("SELECT COUNT(*) FROM bookings").fetchone()[0],
+            "patients": self.db.execute("SELECT COUNT(*) FROM patients").fetchone()[0],
+            "high_water_mark": self.get_meta("hwm_updated_at"),
+            "last_sync": self.get_meta("last_sync"),
+        }
+
+
+# =============================================================================
+# Supabase sync
+# =============================================================================
+
+def make_client() -> PostgrestClient:
+    return PostgrestClient.from_env(timeout=REQUEST_TIMEOUT)
+
+
+def fetch_changed(client: PostgrestClient, since: str = None):
+    """Yield pages of bookings with updated_at >= since, keyset on (updated_at, id)."""
+    filters = {"updated_at": f"gte.{since}"} if since else None
+    page = []
+    for row in client.stream("bookings", BOOKING_COLUMNS, filters, order_column="updated_at",
+                             page_size=PAGE_SIZE):
+        page.append(row)
+        if len(page) == PAGE_SIZE:
+            yield page
+            page = []
+    if page:
+        yield page
+
+
+def sync(index: RecallIndex, client: PostgrestClient, now: float = None) -> dict:
+    """Pull changed bookings since the high-water mark and refresh affected patients."""
+    now = time.time() if now is None else now
+    started = time.perf_counter()
+    hwm = index.get_meta("hwm_updated_at")
+    since = None
+    if hwm:
+        since = datetime.fromtimestamp(parse_ts(hwm) - SYNC_OVERLAP_SECONDS, tz=timezone.utc).isoformat()
+
+    fetched, touched, newest = 0, set(), hwm
+    for page in fetch_changed(client, since):
+        fetched += len(page)
+        touched |= index.apply(page)
+        newest = page[-1]["updated_at"]
+
+    index.refresh(touched, now)
+    rolled = index.refresh_due(now)
+    if newest:
+        index.set_meta("hwm_updated_at", newest)
+    index.set_meta("last_sync", datetime.fromtimestamp(now, tz=timezone.utc).isoformat())
+    index.db.commit()
+    return {"fetched": fetched, "patients_touched": len(touched), "patients_rolled": rolled,
+            "seconds": round(time.perf_counter() - started, 3)}
+
+
+def rebuild(index: RecallIndex, client: PostgrestClient, now: float = None) -> dict:
+    index.reset()
+    index.db.commit()
+    return sync(index, client, now)
+
+
+def recall_candidates(index: RecallIndex, now_dt: datetime = None) -> list:
+    now_dt = now_dt or datetime.now(timezone.utc)
+    window_start, window_end = recall_window(now_dt)
+    now = now_dt.timestamp()
+    index.refresh_due(now)
+    index.db.commit()
+    return index.candidates(window_start.timestamp(), window_end.timestamp(), now)
+
+
+# =============================================================================
+# Parity check
+# =============================================================================
+
+def synthetic_bookings(count: int, now: datetime, seed: int = 7) -> list:
+    """Random booking history over the past 3 years plus the next 3 months."""
+    rng = random.Random(seed)
+    patients = max(1, count // 4)
+    rows = []
+    for i in range(count):
+        p = rng.randrange(patients)
+        start = now + timedelta(days=rng.uniform(-3 * 365, 90), seconds=0)
+        start = start.replace(microsecond=0)
+        rows.append({
+            "id": f"b{i:08d}",
+            "customer_email": f"Patient{p}@Example.com" if p % 5 == 0 else f"patient{p}@example.com",
+            "customer_name": f"Patient {p}",
+            "customer_phone": rng.choice(["+37120000000", "20000000", "+447700900000", None]),
+            "language": rng.choice(["lv", "en", "ru", None, "xx"]),
+            "status": rng.choices(["confirmed", "completed", "pending", "cancelled"], [50, 30, 10, 10])[0],
+            "start_time": start.isoformat(),
+            "updated_at": now.isoformat(),
+        })
+    return rows
+
+
+def compare(engine: list, legacy: list) -> dict:
+    def keyed(rows):
+        return {r["patient_email"].lower(): r for r in rows}
+
+    ours, theirs = keyed(engine), keyed(legacy)
+    differing = sorted(e for e in ours.keys() & theirs.keys()
+                       if (ours[e]["last_appointment"], ours[e]["language_preference"])
+                       != (theirs[e]["last_appointment"], theirs[e]["language_preference"]))
+    return {
+        "engine": len(ours), "legacy": len(theirs),
+        "only_engine": sorted(ours.keys() - theirs.keys()),
+        "only_legacy": sorted(theirs.keys() - ours.keys()),
+        "differing": differing,
+    }
+
+
+def parity(index_path: str = INDEX_FILE, synthetic: int = 0) -> dict:
+    """Run the n8n JS filter and the engine on the same data and diff the result."""
+    now_dt = datetime.now(timezone.utc).replace(microsecond=0)
+    now = now_dt.timestamp()
+    window_start, window_end = recall_window(now_dt)
+    timings = {}
+
+    if synthetic:
+        rows = synthetic_bookings(synthetic, now_dt)
+        started = time.perf_counter()
+        with tempfile.TemporaryDirectory() as tmp:
+            index = RecallIndex(os.path.join(tmp, "recall.sqlite"))
+            index.refresh(index.apply(rows), now)
+            index.db.commit()
+            timings["engine_build_seconds"] = round(time.perf_counter() - started, 3)
+            started = time.perf_counter()
+            engine = index.candidates(window_start.timestamp(), window_end.timestamp(), now)
+            timings["engine_query_seconds"] = round(time.perf_counter() - started, 4)
+            index.close()
+        past = [r for r in rows if r["status"] in PAST_STATUSES and parse_ts(r["start_time"]) < now]
+        future = [r for r in rows if r["status"] in FUTURE_STATUSES and parse_ts(r["start_time"]) > now]
+    else:
+        client = make_client()
+        index = RecallIndex(index_path)
+        timings["sync"] = sync(index, client, now)
+        engine = index.candidates(window_start.timestamp(), window_end.timestamp(), now)
+        index.close()
+        current = now_dt.isoformat()
+        started = time.perf_counter()
+        past, future = [], []
+        for page in fetch_changed(client):  # the full-history read the workflow does
+            past += [r for r in page if r["status"] in PAST_STATUSES and r["start_time"] < current]
+            future += [r for r in page if r["status"] in FUTURE_STATUSES and r["start_time"] > current]
+        timings["legacy_fetch_seconds"] = round(time.perf_counter() - started, 3)
+
+    started = time.perf_counter()
+    legacy = legacy_filter(past, future, window_start.timestamp(), window_end.timestamp())
+    timings["legacy_filter_seconds"] = round(time.perf_counter() - started, 4)
+
+    result = compare(engine, legacy)
+    result["timings"] = timings
+    return result
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental 6-month recall engine")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_parser = sub.add_parser("run", help="Sync and print recall candidates as JSON")
+    run_parser.add_argument("--no-sync", action="store_true", help="Answer from local state only")
+    sub.add_parser("rebuild", help="Drop local state and resync every booking")
+    sub.add_parser("status", help="Show local index statistics")
+    parity_parser = sub.add_parser("parity", help="Compare with the n8n Filter Recall Patients logic")
+    parity_parser.add_argument("--synthetic", type=int, default=0,
+                               help="Use N generated bookings instead of Supabase")
+    args = parser.parse_args()
+
+    load_env()
+
+    if args.command == "parity":
+        result = parity(synthetic=args.synthetic)
+        mismatches = len(result["only_engine"]) + len(result["only_legacy"]) + len(result["differing"])
+        print(json.dumps(result, indent=2))
+        print(f"{'✅' if not mismatches else '❌'} {result['engine']} engine vs "
+              f"{result['legacy']} legacy candidate(s), {mismatches} mismatch(es)", file=sys.stderr)
+        sys.exit(0 if not mismatches else 1)
+
+    if args.command == "rebuild" or (args.command == "run" and not args.no_sync):   # status is local only
+        if not os.getenv("SUPABASE_URL") or not os.getenv("SUPABASE_SERVICE_KEY"):
+            print("❌ SUPABASE_URL and SUPABASE_SERVICE_KEY must be set", file=sys.stderr)
+            sys.exit(1)
+
+    index = RecallIndex()
+    try:
+        if args.command == "status":
+            print(json.dumps(index.stats(), indent=2))
+        elif args.command == "rebuild":
+            stats = rebuild(index, make_client())
+            print(f"✅ Rebuilt: {stats['fetched']} booking(s), "
+                  f"{index.stats()['patients']} patient(s) in {stats['seconds']}s", file=sys.stderr)
+        else:
+            if not args.no_sync:
+                stats = sync(index, make_client())
+                print(f"🔄 Synced {stats['fetched']} changed booking(s), refreshed "
+                      f"{stats['patients_touched'] + stats['patients_rolled']} patient(s) "
+                      f"in {stats['seconds']}s", file=sys.stderr)
+            print(json.dumps(recall_candidates(index), indent=2, ensure_ascii=False))
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,14 @@ Usage:
     python3 recovery_dlq.py                    # Process all pending files
     python3 recovery_dlq.py --dry-run          # Preview without modifying
     python3 recovery_dlq.py --file <path>      # Process specific file
+    python3 recovery_dlq.py --bulk             # Batched lookups/inserts (large backlogs)
+    python3 recovery_dlq.py --bulk --batch-size 50
+    python3 recovery_dlq.py --workers 8 --max-rps 20   # Parallel workers, rate-capped
+    python3 recovery_dlq.py --watch            # Daemon: recover new files within seconds
+    python3 recovery_dlq.py --no-conflict-check   # Skip the double-booking check (not recommended)
+    python3 recovery_dlq.py --verify-index     # Reconcile local recovered index with DB
+    python3 recovery_dlq.py --metrics-prom /var/lib/node_exporter/dlq.prom --metrics-json run.json
+    python3 recovery_dlq.py --profile recovery.pstats   # cProfile the whole run
 
 Environment Variables Required:
     SUPABASE_URL - Supabase project URL
@@ -18,22 +26,64 @@ import os
 import json
 import glob
 import shutil
+import time
+import random
+import signal
+import sqlite3
 import argparse
+import threading
+from contextlib import contextmanager
 from datetime import datetime
-from pathlib import Path
 
-try:
-    from supabase import create_client, Client
-    SUPABASE_AVAILABLE = True
-except ImportError:
-    SUPABASE_AVAILABLE = False
-    print("⚠️  Warning: supabase-py not installed. Install with: pip install supabase")
+from env_config import load_env
 
 # Configuration
 DLQ_DIR = os.getenv("DLQ_DIR", "/home/n8n/dlq")
 PROCESSED_DIR = os.path.join(DLQ_DIR, "processed")
+INFLIGHT_DIR = os.path.join(DLQ_DIR, "inflight")
+QUARANTINE_DIR = os.path.join(DLQ_DIR, "quarantine")
+CONFLICT_DIR = os.path.join(DLQ_DIR, "conflicts")
+RETRY_INDEX_FILE = os.path.join(DLQ_DIR, ".retry_index.jsonl")
+RECOVERED_INDEX_FILE = os.path.join(DLQ_DIR, ".recovered_index.sqlite")
 MAX_RETRY_ATTEMPTS = 3
 
+# Retry scheduling: exponential backoff with jitter between attempts on the
+# same file, and a circuit breaker that stops the run after consecutive
+# connection errors (Supabase down, no point hammering it)
+RETRY_BASE_SECONDS = 60
+RETRY_MAX_SECONDS = 6 * 60 * 60
+CIRCUIT_BREAKER_THRESHOLD = 5
+CIRCUIT_BREAKER_COOLDOWN = 5 * 60
+
+# Metrics: histogram buckets (seconds) for per-stage timings
+METRIC_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRIC_STAGES = ("parse", "extract", "lookup", "conflicts", "insert", "move")
+METRIC_OUTCOMES = ("recovered", "already_existed", "missing_email", "insert_empty",
+                   "exception", "dry_run", "conflict")
+
+# Exception class names (httpx / postgrest) that mean "could not reach Supabase"
+CONNECTION_ERROR_NAMES = {
+    "ConnectError", "ConnectTimeout", "ReadTimeout", "WriteTimeout", "PoolTimeout",
+    "TimeoutException", "NetworkError", "RemoteProtocolError",
+}
+
+# Bulk mode: rows per insert request, and session IDs per in.(...) lookup
+# (kept small enough that the lookup URL stays well under proxy limits)
+BULK_BATCH_SIZE = 100
+LOOKUP_CHUNK_SIZE = 100
+
+# Worker mode: claims older than this are assumed to belong to a dead run
+STALE_CLAIM_SECONDS = 15 * 60
+
+# Watch mode: a file must be unchanged this long before it is picked up
+# (guards against half-written files)
+WATCH_DEBOUNCE_SECONDS = 2.0
+WATCH_POLL_SECONDS = 1.0
+
+# Watch mode: the session's conflict index is reused while it covers new
+# files and is younger than this; then it is reloaded from bookings
+CONFLICT_INDEX_MAX_AGE = 60
+
 # Supabase fields to insert (must match table schema)
 BOOKING_FIELDS = [
     "customer_name",
@@ -53,32 +103,102 @@ BOOKING_FIELDS = [
 ]
 
 
-def load_env():
-    """Load environment variables from .env file if present."""
-    env_path = Path(__file__).parent.parent / ".env"
-    if env_path.exists():
-        with open(env_path) as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith("#") and "=" in line:
-                    key, value = line.split("=", 1)
-                    os.environ.setdefault(key.strip(), value.strip().strip('"\''))
+class RecoveryMetrics:
+    """Per-stage latency histograms and outcome counters for one process."""
 
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.buckets = {stage: [0] * len(METRIC_BUCKETS) for stage in METRIC_STAGES}
+        self.sums = dict.fromkeys(METRIC_STAGES, 0.0)
+        self.counts = dict.fromkeys(METRIC_STAGES, 0)
+        self.outcomes = dict.fromkeys(METRIC_OUTCOMES, 0)
 
-def get_supabase_client() -> "Client":
-    """Initialize Supabase client with service role key."""
-    if not SUPABASE_AVAILABLE:
-        raise RuntimeError("supabase-py is not installed")
-    
-    url = os.getenv("SUPABASE_URL") or os.getenv("VITE_SUPABASE_URL")
-    key = os.getenv("SUPABASE_SERVICE_KEY") or os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-    
-    if not url or not key:
-        raise ValueError(
-            "Missing Supabase credentials. Set SUPABASE_URL and SUPABASE_SERVICE_KEY"
-        )
-    
-    return create_client(url, key)
+    def observe(self, stage: str, seconds: float):
+        with self.lock:
+            self.sums[stage] += seconds
+            self.counts[stage] += 1
+            for i, bound in enumerate(METRIC_BUCKETS):
+                if seconds <= bound:
+                    self.buckets[stage][i] += 1
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def count(self, outcome: str, n: int = 1):
+        with self.lock:
+            self.outcomes[outcome] += n
+
+    def summary(self) -> dict:
+        with self.lock:
+            return {
+                "started_at": datetime.fromtimestamp(self.started).isoformat(),
+                "duration_seconds": round(time.time() - self.started, 4),
+                "outcomes": dict(self.outcomes),
+                "stages": {
+                    stage: {
+                        "count": self.counts[stage],
+                        "sum_seconds": round(self.sums[stage], 6),
+                        "buckets": dict(zip(map(str, METRIC_BUCKETS), self.buckets[stage])),
+                    }
+                    for stage in METRIC_STAGES
+                },
+            }
+
+    def prometheus(self) -> str:
+        """Render in node_exporter textfile-collector format."""
+        with self.lock:
+            lines = [
+                "# HELP dlq_recovery_stage_seconds Time spent per DLQ recovery stage.",
+                "# TYPE dlq_recovery_stage_seconds histogram",
+            ]
+            for stage in METRIC_STAGES:
+                for bound, n in zip(METRIC_BUCKETS, self.buckets[stage]):
+                    lines.append(f'dlq_recovery_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {n}')
+                lines.append(f'dlq_recovery_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {self.counts[stage]}')
+                lines.append(f'dlq_recovery_stage_seconds_sum{{stage="{stage}"}} {self.sums[stage]:.6f}')
+                lines.append(f'dlq_recovery_stage_seconds_count{{stage="{stage}"}} {self.counts[stage]}')
+            lines += [
+                "# HELP dlq_recovery_files_total DLQ files handled, by outcome.",
+                "# TYPE dlq_recovery_files_total counter",
+            ]
+            for outcome, n in self.outcomes.items():
+                lines.append(f'dlq_recovery_files_total{{outcome="{outcome}"}} {n}')
+            lines += [
+                "# HELP dlq_recovery_last_run_timestamp_seconds When the metrics were written.",
+                "# TYPE dlq_recovery_last_run_timestamp_seconds gauge",
+                f"dlq_recovery_last_run_timestamp_seconds {time.time():.0f}",
+                "# HELP dlq_recovery_run_duration_seconds Wall time of the run so far.",
+                "# TYPE dlq_recovery_run_duration_seconds gauge",
+                f"dlq_recovery_run_duration_seconds {time.time() - self.started:.3f}",
+            ]
+        return "\n".join(lines) + "\n"
+
+
+metrics = RecoveryMetrics()
+
+
+def write_metrics(json_path: str = None, prom_path: str = None):
+    """Write the metrics summary; files are replaced atomically for the collector."""
+    for path, render in ((json_path, lambda: json.dumps(metrics.summary(), indent=2)),
+                         (prom_path, metrics.prometheus)):
+        if not path:
+            continue
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(render())
+        os.replace(tmp_path, path)
+
+
+def get_supabase_client() -> "PostgrestClient":
+    """Initialize the shared PostgREST client with the service role key."""
+    from postgrest_client import PostgrestClient
+    return PostgrestClient.from_env()
 
 
 def get_pending_files() -> list:
@@ -112,98 +232,930 @@ def extract_booking_data(dlq_data: dict) -> dict:
             "status": "confirmed",
         }
         
-        # Reconstruct timestamps
+        # Reconstruct timestamps (service duration from checkout metadata, else 1 hour)
         if metadata.get("booking_date") and metadata.get("booking_time"):
             start = f"{metadata['booking_date']}T{metadata['booking_time']}:00Z"
             booking["start_time"] = start
-            # Add 1 hour for end time
+            try:
+                duration = int(metadata.get("duration") or 60)
+            except (TypeError, ValueError):
+                duration = 60
             from datetime import datetime, timedelta
             start_dt = datetime.fromisoformat(start.replace("Z", "+00:00"))
-            end_dt = start_dt + timedelta(hours=1)
+            end_dt = start_dt + timedelta(minutes=duration)
             booking["end_time"] = end_dt.isoformat().replace("+00:00", "Z")
     
     # Filter to only known fields and remove None values
     return {k: v for k, v in booking.items() if k in BOOKING_FIELDS and v is not None}
 
 
-def insert_booking(client: "Client", booking: dict) -> dict:
+def insert_booking(client: "PostgrestClient", booking: dict) -> dict:
     """Insert booking into Supabase."""
     response = client.table("bookings").insert(booking).execute()
     return response.data[0] if response.data else None
 
 
-def mark_processed(filepath: str, success: bool = True):
-    """Move file to processed directory or increment retry count."""
+def chunked(items: list, size: int):
+    """Yield successive slices of at most `size` items."""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def fetch_existing_values(client: "PostgrestClient", column: str, values: list) -> set:
+    """Return the subset of `values` present in bookings.<column>."""
+    existing = set()
+    for chunk in chunked(values, LOOKUP_CHUNK_SIZE):
+        response = client.table("bookings").select(column).in_(column, chunk).execute()
+        existing.update(row[column] for row in response.data or [])
+    return existing
+
+
+def fetch_existing_session_ids(client: "PostgrestClient", session_ids: list) -> set:
+    """Return the subset of stripe_session_ids already present in bookings."""
+    return fetch_existing_values(client, "stripe_session_id", session_ids)
+
+
+def insert_bookings_batch(client: "PostgrestClient", bookings: list) -> list:
+    """Insert several bookings in one request (PostgREST commits all or nothing)."""
+    response = client.table("bookings").insert(bookings).execute()
+    return response.data or []
+
+
+def is_connection_error(error) -> bool:
+    """True if the error (or anything it was raised from) is a network failure."""
+    while error is not None and not isinstance(error, str):
+        if isinstance(error, (ConnectionError, TimeoutError)):
+            return True
+        if type(error).__name__ in CONNECTION_ERROR_NAMES:
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+class RetryScheduler:
+    """
+    Per-file retry state kept in an append-only sidecar index.
+
+    Each failure appends one small JSON line to RETRY_INDEX_FILE instead of
+    rewriting the DLQ payload. Only failures where Supabase answered count
+    towards MAX_RETRY_ATTEMPTS; connection errors just back off and feed the
+    circuit breaker, so an outage never quarantines good bookings.
+    """
+
+    def __init__(self, index_path: str = RETRY_INDEX_FILE):
+        self.index_path = index_path
+        self.entries = {}  # filename -> {"attempts", "failures", "next_attempt", ...}
+        self.consecutive_connection_errors = 0
+        self.open_until = 0.0
+        self.lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.index_path):
+            return
+        lines = 0
+        with open(self.index_path) as f:
+            for line in f:
+                lines += 1
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # torn write from a crash
+                if record.get("cleared"):
+                    self.entries.pop(record["file"], None)
+                else:
+                    self.entries[record["file"]] = record
+        if lines > 2 * len(self.entries) + 100:
+            self._compact()
+
+    def _compact(self):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            for record in self.entries.values():
+                f.write(json.dumps(record) + "\n")
+        os.replace(tmp_path, self.index_path)
+
+    def _append(self, record: dict):
+        with open(self.index_path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+    @property
+    def circuit_open(self) -> bool:
+        return time.time() < self.open_until
+
+    def is_due(self, filepath: str) -> bool:
+        entry = self.entries.get(os.path.basename(filepath))
+        return entry is None or time.time() >= entry["next_attempt"]
+
+    def seconds_until_due(self, filepath: str) -> float:
+        entry = self.entries.get(os.path.basename(filepath))
+        return max(0.0, entry["next_attempt"] - time.time()) if entry else 0.0
+
+    def record_success(self, filepath: str):
+        with self.lock:
+            self.consecutive_connection_errors = 0
+            self.open_until = 0.0
+            if self.entries.pop(os.path.basename(filepath), None) is not None:
+                self._append({"file": os.path.basename(filepath), "cleared": True})
+
+    def record_failure(self, filepath: str, error=None) -> dict:
+        """Schedule the next attempt; quarantine the file once attempts run out."""
+        name = os.path.basename(filepath)
+        connection_error = is_connection_error(error)
+        with self.lock:
+            entry = dict(self.entries.get(name) or {"file": name, "attempts": 0, "failures": 0})
+            entry["failures"] += 1
+            if connection_error:
+                self.consecutive_connection_errors += 1
+                if self.consecutive_connection_errors >= CIRCUIT_BREAKER_THRESHOLD:
+                    self.open_until = time.time() + CIRCUIT_BREAKER_COOLDOWN
+            else:
+                self.consecutive_connection_errors = 0
+                entry["attempts"] += 1
+
+            delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** (entry["failures"] - 1))
+            entry["next_attempt"] = time.time() + random.uniform(delay / 2, delay)
+            entry["last_error"] = str(error)[:200] if error is not None else None
+            entry["last_attempt"] = datetime.now().isoformat()
+
+            if entry["attempts"] >= MAX_RETRY_ATTEMPTS:
+                self.entries.pop(name, None)
+                self._append({"file": name, "cleared": True})
+                entry["quarantined"] = True
+            else:
+                self.entries[name] = entry
+                self._append(entry)
+        return entry
+
+
+_retry_scheduler = None
+
+
+def get_retry_scheduler() -> RetryScheduler:
+    """Shared scheduler for this process (loaded lazily from the sidecar index)."""
+    global _retry_scheduler
+    if _retry_scheduler is None:
+        os.makedirs(DLQ_DIR, exist_ok=True)
+        _retry_scheduler = RetryScheduler()
+    return _retry_scheduler
+
+
+class RecoveredIndex:
+    """
+    Local SQLite record of Stripe IDs known to exist in the bookings table.
+
+    Keys are stripe_session_id and payment_intent_id values that this host
+    inserted or saw already present. All keys are held in memory as well, so
+    a lookup never leaves the process; a hit means the remote check is skipped.
+    """
+
+    KEY_COLUMNS = ("stripe_session_id", "payment_intent_id")
+
+    def __init__(self, path: str = RECOVERED_INDEX_FILE):
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS recovered ("
+            " kind TEXT NOT NULL, value TEXT NOT NULL, recorded_at TEXT NOT NULL,"
+            " PRIMARY KEY (kind, value))"
+        )
+        self.db.commit()
+        self.keys = set(self.db.execute("SELECT kind, value FROM recovered"))
+
+    def _booking_keys(self, booking: dict) -> list:
+        return [(col, booking[col]) for col in self.KEY_COLUMNS if booking.get(col)]
+
+    def contains(self, booking: dict) -> bool:
+        return any(key in self.keys for key in self._booking_keys(booking))
+
+    def add(self, bookings: list):
+        """Record the Stripe IDs of bookings now known to be in the database."""
+        new_keys = [k for b in bookings for k in self._booking_keys(b) if k not in self.keys]
+        if not new_keys:
+            return
+        now = datetime.now().isoformat()
+        with self.lock:
+            self.db.executemany(
+                "INSERT OR IGNORE INTO recovered (kind, value, recorded_at) VALUES (?, ?, ?)",
+                [(kind, value, now) for kind, value in new_keys],
+            )
+            self.db.commit()
+            self.keys.update(new_keys)
+
+    def remove(self, keys: set):
+        with self.lock:
+            self.db.executemany("DELETE FROM recovered WHERE kind = ? AND value = ?", list(keys))
+            self.db.commit()
+            self.keys.difference_update(keys)
+
+    def values(self, kind: str) -> list:
+        return sorted(value for k, value in self.keys if k == kind)
+
+
+_recovered_index = None
+
+
+def get_recovered_index() -> RecoveredIndex:
+    """Shared recovered-ID index for this process (opened lazily)."""
+    global _recovered_index
+    if _recovered_index is None:
+        os.makedirs(DLQ_DIR, exist_ok=True)
+        _recovered_index = RecoveredIndex()
+    return _recovered_index
+
+
+def verify_index(client: "PostgrestClient") -> dict:
+    """
+    Reconcile the local index against the bookings table in bulk.
+
+    Every indexed key is checked with chunked in.(...) lookups; keys whose
+    booking no longer exists (deleted, or restored from a backup) are dropped
+    so the next run falls back to the remote check for them.
+    """
+    index = get_recovered_index()
+    summary = {}
+    for column in RecoveredIndex.KEY_COLUMNS:
+        values = index.values(column)
+        present = fetch_existing_values(client, column, values)
+        stale = {(column, value) for value in values if value not in present}
+        index.remove(stale)
+        summary[column] = {"checked": len(values), "present": len(present), "removed": len(stale)}
+    return summary
+
+
+def mark_processed(filepath: str, success: bool = True, error=None):
+    """Move file to processed directory, or schedule a retry / quarantine it."""
+    scheduler = get_retry_scheduler()
     if success:
         os.makedirs(PROCESSED_DIR, exist_ok=True)
         dest = os.path.join(PROCESSED_DIR, os.path.basename(filepath))
-        shutil.move(filepath, dest)
+        with metrics.stage("move"):
+            shutil.move(filepath, dest)
+        scheduler.record_success(filepath)
         print(f"  ✅ Moved to: {dest}")
     else:
-        # Increment retry counter in file
-        with open(filepath, "r") as f:
-            data = json.load(f)
-        data["recovery_attempts"] = data.get("recovery_attempts", 0) + 1
-        data["last_recovery_attempt"] = datetime.now().isoformat()
-        with open(filepath, "w") as f:
-            json.dump(data, f, indent=2)
-        print(f"  ⚠️  Retry count: {data['recovery_attempts']}")
-
-
-def process_file(client: "Client", filepath: str, dry_run: bool = False) -> bool:
-    """Process a single DLQ file."""
+        entry = scheduler.record_failure(filepath, error)
+        if entry.get("quarantined"):
+            os.makedirs(QUARANTINE_DIR, exist_ok=True)
+            dest = os.path.join(QUARANTINE_DIR, os.path.basename(filepath))
+            shutil.move(filepath, dest)
+            print(f"  🚫 Attempt {entry['attempts']}/{MAX_RETRY_ATTEMPTS} failed, quarantined: {dest}")
+        else:
+            wait = entry["next_attempt"] - time.time()
+            print(f"  ⚠️  Attempt {entry['attempts']}/{MAX_RETRY_ATTEMPTS}, "
+                  f"next retry in {wait / 60:.1f} min")
+            if scheduler.circuit_open:
+                print(f"  🔌 {CIRCUIT_BREAKER_THRESHOLD} connection errors in a row, circuit open")
+
+
+def flag_conflict(filepath: str, booking: dict, scope: dict, reason: str):
+    """Park a booking whose slot is taken in conflicts/ with a sidecar for manual handling."""
+    os.makedirs(CONFLICT_DIR, exist_ok=True)
+    dest = os.path.join(CONFLICT_DIR, os.path.basename(filepath))
+    sidecar = {"file": os.path.basename(filepath), "flagged_at": datetime.now().isoformat(),
+               "reason": reason, "booking": booking, "scope": scope}
+    tmp_path = f"{dest}.conflict.json.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(sidecar, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, dest + ".conflict.json")
+    with metrics.stage("move"):
+        shutil.move(filepath, dest)
+    get_retry_scheduler().record_success(filepath)
+    print(f"  🚧 Slot conflict, not inserted: {reason}")
+    print(f"  📁 Moved to: {dest} (see .conflict.json)")
+
+
+def build_conflict_index(client: "PostgrestClient", files: list, conflicts: "ConflictIndex" = None):
+    """
+    A ConflictIndex covering every file's date range (None if it cannot be built).
+
+    An existing index (the watch session's) is reused while it still covers
+    the files and is younger than CONFLICT_INDEX_MAX_AGE, otherwise reloaded.
+    """
+    from dlq_conflicts import ConflictIndex, booking_scope
+    candidates = []
+    for filepath in files:
+        try:
+            dlq_data = parse_dlq_file(filepath)
+        except (OSError, ValueError):
+            continue          # reported when the file itself is processed
+        candidates.append((extract_booking_data(dlq_data), booking_scope(dlq_data)))
+    if conflicts is None:
+        conflicts = ConflictIndex(client)
+    try:
+        with metrics.stage("conflicts"):
+            loaded = conflicts.refresh(candidates, CONFLICT_INDEX_MAX_AGE)
+    except Exception as e:
+        print(f"  ⚠️  Conflict index not built ({e}), checking file by file")
+        return None
+    if loaded is not None:
+        print(f"🗓️  Conflict index: {loaded} booking(s) in the replayed date range")
+    return conflicts
+
+
+def process_file(client: "PostgrestClient", filepath: str, dry_run: bool = False,
+                 limiter: "RateLimiter" = None, conflicts: "ConflictIndex" = None,
+                 check_conflicts: bool = True) -> str:
+    """
+    Process a single DLQ file.
+
+    Before inserting, the booking's slot is checked against `conflicts` (or a
+    one-file index built on the spot when it does not cover the booking); a
+    taken slot parks the file in conflicts/ instead of creating a double booking.
+
+    Returns the same statuses as process_bulk: "recovered", "existing",
+    "dry_run", "conflict" or "failed".
+    """
+    from dlq_conflicts import ConflictIndex, booking_scope
     filename = os.path.basename(filepath)
     print(f"\n📄 Processing: {filename}")
+    reserved = None       # index holding this booking's slot until the insert commits
     
     try:
-        dlq_data = parse_dlq_file(filepath)
-        booking = extract_booking_data(dlq_data)
+        with metrics.stage("parse"):
+            dlq_data = parse_dlq_file(filepath)
+        with metrics.stage("extract"):
+            booking = extract_booking_data(dlq_data)
+            scope = booking_scope(dlq_data)
         
         if not booking.get("customer_email"):
             print("  ❌ Error: Missing customer_email, cannot recover")
-            return False
+            metrics.count("missing_email")
+            if not dry_run:
+                mark_processed(filepath, success=False, error="missing customer_email")
+            return "failed"
+        
+        index = get_recovered_index()
+        if index.contains(booking):
+            print("  ⏭️  Already recovered (local index), skipping DB check")
+            metrics.count("already_existed")
+            if not dry_run:
+                mark_processed(filepath, success=True)
+            return "existing"
         
         # Check if already exists (idempotency via stripe_session_id)
         if booking.get("stripe_session_id"):
-            existing = client.table("bookings").select("id").eq(
-                "stripe_session_id", booking["stripe_session_id"]
-            ).execute()
+            if limiter:
+                limiter.wait()
+            with metrics.stage("lookup"):
+                existing = client.table("bookings").select("id").eq(
+                    "stripe_session_id", booking["stripe_session_id"]
+                ).execute()
             if existing.data:
                 print(f"  ⏭️  Already exists in DB (stripe_session_id: {booking['stripe_session_id']})")
+                metrics.count("already_existed")
+                index.add([booking])
                 mark_processed(filepath, success=True)
-                return True
+                return "existing"
         
         print(f"  📧 Customer: {booking.get('customer_email')}")
         print(f"  🦷 Service: {booking.get('service_name')}")
         print(f"  📅 Time: {booking.get('start_time')}")
         
+        if client is not None and check_conflicts:
+            if conflicts is None or not conflicts.covers([(booking, scope)]):
+                if limiter:
+                    limiter.wait()
+                conflicts = ConflictIndex(client)
+                with metrics.stage("conflicts"):
+                    conflicts.load([(booking, scope)])
+            reason = conflicts.claim(booking, scope)
+            if reason is None:
+                reserved = conflicts
+            else:
+                metrics.count("conflict")
+                if not dry_run:
+                    flag_conflict(filepath, booking, scope, reason)
+                else:
+                    print(f"  🚧 DRY RUN - Slot conflict, would not insert: {reason}")
+                return "conflict"
+        
         if dry_run:
             print("  🔍 DRY RUN - Would insert above booking")
-            return True
+            metrics.count("dry_run")
+            return "dry_run"
         
-        result = insert_booking(client, booking)
+        if limiter:
+            limiter.wait()
+        with metrics.stage("insert"):
+            result = insert_booking(client, booking)
         if result:
+            reserved = None   # committed: the slot stays taken
             print(f"  ✅ Inserted! ID: {result.get('id')}")
+            metrics.count("recovered")
+            index.add([booking])
             mark_processed(filepath, success=True)
-            return True
+            return "recovered"
         else:
             print("  ❌ Insert returned no data")
-            mark_processed(filepath, success=False)
-            return False
+            metrics.count("insert_empty")
+            if reserved is not None:
+                reserved.release(booking)
+            mark_processed(filepath, success=False, error="insert returned no data")
+            return "failed"
             
     except Exception as e:
         print(f"  ❌ Error: {e}")
+        metrics.count("exception")
+        if reserved is not None:
+            reserved.release(booking)
         if not dry_run:
-            mark_processed(filepath, success=False)
-        return False
+            mark_processed(filepath, success=False, error=e)
+        return "failed"
+
+
+def process_bulk(client: "PostgrestClient", files: list, dry_run: bool = False,
+                 batch_size: int = BULK_BATCH_SIZE, check_conflicts: bool = True) -> dict:
+    """
+    Recover many DLQ files with a handful of round trips.
+
+    All files are parsed up front, existing stripe_session_ids are resolved
+    with chunked in.(...) lookups and the remaining bookings are inserted in
+    batches. A batch that fails is retried row by row so one bad booking only
+    fails its own file. Files move to processed/ only after their row commits.
+    Before inserting, the replayed date range is loaded once into a
+    ConflictIndex and bookings whose slot is taken are parked in conflicts/.
 
+    Returns a per-file report: {filepath: (status, detail)} where status is
+    one of "recovered", "existing", "dry_run", "conflict" or "failed".
+    """
+    from dlq_conflicts import ConflictIndex, booking_scope
+    report = {}
+    index = get_recovered_index()
+    pending = []          # (filepath, booking) still needing an insert
+    scopes = {}           # filepath -> clinic / specialist of the booking
+    first_file = {}       # stripe_session_id -> first file seen for it
+    duplicates = {}       # stripe_session_id -> extra files for the same session
 
-def main():
+    # 1. Parse everything first (local I/O only)
+    for filepath in files:
+        try:
+            with metrics.stage("parse"):
+                dlq_data = parse_dlq_file(filepath)
+            with metrics.stage("extract"):
+                booking = extract_booking_data(dlq_data)
+                scopes[filepath] = booking_scope(dlq_data)
+        except Exception as e:
+            report[filepath] = ("failed", f"parse error: {e}")
+            metrics.count("exception")
+            if not dry_run:
+                mark_processed(filepath, success=False, error=e)
+            continue
+
+        if not booking.get("customer_email"):
+            report[filepath] = ("failed", "missing customer_email")
+            metrics.count("missing_email")
+            if not dry_run:
+                mark_processed(filepath, success=False, error="missing customer_email")
+            continue
+
+        session_id = booking.get("stripe_session_id")
+        if session_id:
+            if session_id in first_file:
+                duplicates.setdefault(session_id, []).append(filepath)
+                continue
+            first_file[session_id] = filepath
+
+        if index.contains(booking):
+            if not dry_run:
+                mark_processed(filepath, success=True)
+            report[filepath] = ("existing", "local index")
+            metrics.count("already_existed")
+            continue
+        pending.append((filepath, booking))
+
+    print(f"\n🧾 Parsed {len(pending)} recoverable booking(s), {len(report)} skipped or known")
+
+    # 2. Resolve idempotency keys in bulk
+    existing = set()
+    lookup_ids = sorted(sid for sid, fp in first_file.items() if fp not in report)
+    if client is not None and lookup_ids:
+        try:
+            with metrics.stage("lookup"):
+                existing = fetch_existing_session_ids(client, lookup_ids)
+        except Exception as e:
+            print(f"  ❌ Existence lookup failed: {e}")
+            metrics.count("exception", len(pending))
+            for filepath, _ in pending:
+                report[filepath] = ("failed", f"lookup error: {e}")
+                if not dry_run:
+                    mark_processed(filepath, success=False, error=e)
+            for dup_files in duplicates.values():
+                for filepath in dup_files:
+                    report[filepath] = ("failed", f"lookup error: {e}")
+            return report
+        print(f"  ⏭️  {len(existing)} already exist in DB")
+
+    to_insert = []
+    for filepath, booking in pending:
+        if booking.get("stripe_session_id") in existing:
+            if not dry_run:
+                index.add([booking])
+                mark_processed(filepath, success=True)
+            report[filepath] = ("existing", booking["stripe_session_id"])
+            metrics.count("already_existed")
+        else:
+            to_insert.append((filepath, booking))
+
+    # 2b. Conflict pass: one range query, then O(log n) per booking
+    if client is not None and check_conflicts and to_insert:
+        conflicts = ConflictIndex(client)
+        try:
+            with metrics.stage("conflicts"):
+                loaded = conflicts.load([(booking, scopes[filepath]) for filepath, booking in to_insert])
+        except Exception as e:
+            print(f"  ❌ Conflict check failed: {e}")
+            metrics.count("exception", len(to_insert))
+            for filepath, _ in to_insert:
+                report[filepath] = ("failed", f"conflict check error: {e}")
+                if not dry_run:
+                    mark_processed(filepath, success=False, error=e)
+            to_insert = []
+        else:
+            free = []
+            for filepath, booking in to_insert:
+                reason = conflicts.claim(booking, scopes[filepath])
+                if reason is None:
+                    free.append((filepath, booking))
+                    continue
+                report[filepath] = ("conflict", reason)
+                metrics.count("conflict")
+                if not dry_run:
+                    flag_conflict(filepath, booking, scopes[filepath], reason)
+            print(f"  🗓️  {loaded} booking(s) in the replayed range, "
+                  f"{len(to_insert) - len(free)} slot conflict(s)")
+            to_insert = free
+
+    if dry_run:
+        for filepath, booking in to_insert:
+            report[filepath] = ("dry_run", booking.get("customer_email"))
+        metrics.count("dry_run", len(to_insert))
+    else:
+        # 3. Insert in batches, falling back to single rows on batch failure
+        scheduler = get_retry_scheduler()
+        for batch in chunked(to_insert, batch_size):
+            if scheduler.circuit_open:
+                for filepath, _ in batch:
+                    report[filepath] = ("failed", "not attempted, circuit open")
+                continue
+            try:
+                with metrics.stage("insert"):
+                    inserted = insert_bookings_batch(client, [b for _, b in batch])
+                if len(inserted) != len(batch):
+                    raise RuntimeError(
+                        f"batch returned {len(inserted)} row(s) for {len(batch)}"
+                    )
+                rows = list(zip(batch, inserted))
+            except Exception as e:
+                print(f"  ⚠️  Batch of {len(batch)} failed ({e}), retrying row by row")
+                rows = []
+                for filepath, booking in batch:
+                    if scheduler.circuit_open:
+                        report[filepath] = ("failed", "not attempted, circuit open")
+                        continue
+                    try:
+                        with metrics.stage("insert"):
+                            result = insert_booking(client, booking)
+                    except Exception as row_error:
+                        result = row_error
+                    rows.append(((filepath, booking), result))
+                    # Record as we go so the circuit breaker sees each failure
+                    if not isinstance(result, dict):
+                        metrics.count("insert_empty" if result is None else "exception")
+                        mark_processed(filepath, success=False, error=result)
+                        report[filepath] = ("failed", str(result or "insert returned no data"))
+
+            index.add([booking for (_, booking), result in rows if isinstance(result, dict)])
+            for (filepath, booking), result in rows:
+                if isinstance(result, dict):
+                    mark_processed(filepath, success=True)
+                    report[filepath] = ("recovered", result.get("id"))
+                    metrics.count("recovered")
+
+    # 4. Same-session duplicates follow the fate of the first file
+    for session_id, dup_files in duplicates.items():
+        first_status = report.get(first_file[session_id], ("failed", None))[0]
+        for filepath in dup_files:
+            if first_status == "failed":
+                report[filepath] = ("failed", f"duplicate of unrecovered session {session_id}")
+                continue
+            if first_status == "conflict":
+                report[filepath] = ("conflict", f"duplicate of conflicting session {session_id}")
+                if not dry_run:
+                    os.makedirs(CONFLICT_DIR, exist_ok=True)
+                    shutil.move(filepath, os.path.join(CONFLICT_DIR, os.path.basename(filepath)))
+                continue
+            if not dry_run:
+                mark_processed(filepath, success=True)
+            report[filepath] = ("existing", session_id)
+            metrics.count("already_existed")
+
+    return report
+
+
+def print_bulk_report(report: dict):
+    """Print per-file outcome of a bulk run."""
+    print("\n📋 Per-file report:")
+    icons = {"recovered": "✅", "existing": "⏭️ ", "dry_run": "🔍", "conflict": "🚧", "failed": "❌"}
+    for filepath in sorted(report):
+        status, detail = report[filepath]
+        print(f"  {icons[status]} {os.path.basename(filepath)}: {status} ({detail})")
+
+
+class RateLimiter:
+    """Thread-safe limiter spacing requests evenly to at most `rate` per second."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def claim_file(filepath: str):
+    """
+    Atomically claim a DLQ file by renaming it into inflight/.
+
+    os.rename is atomic on the same filesystem, so exactly one worker (or
+    overlapping cron run) wins; everyone else gets None.
+    """
+    os.makedirs(INFLIGHT_DIR, exist_ok=True)
+    claimed = os.path.join(INFLIGHT_DIR, os.path.basename(filepath))
+    try:
+        os.rename(filepath, claimed)
+    except FileNotFoundError:
+        return None
+    os.utime(claimed)  # claim age, used by release_stale_claims
+    return claimed
+
+
+def release_file(claimed: str, original: str):
+    """Put a claimed file back where it came from (no-op if it was moved on)."""
+    if os.path.exists(claimed):
+        os.rename(claimed, original)
+
+
+def release_stale_claims(max_age: float = STALE_CLAIM_SECONDS):
+    """Return files left in inflight/ by a crashed run to the DLQ."""
+    cutoff = time.time() - max_age
+    for claimed in glob.glob(os.path.join(INFLIGHT_DIR, "failed-*.json")):
+        if os.path.getmtime(claimed) < cutoff:
+            release_file(claimed, os.path.join(DLQ_DIR, os.path.basename(claimed)))
+            print(f"  ♻️  Released stale claim: {os.path.basename(claimed)}")
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of a list of numbers (0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100 * len(ordered))))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def process_concurrent(client: "PostgrestClient", files: list, dry_run: bool = False,
+                       workers: int = 4, max_rps: float = 0, conflicts: "ConflictIndex" = None,
+                       check_conflicts: bool = True) -> list:
+    """
+    Process files on a thread pool sharing one client.
+
+    The PostgrestClient keeps one pooled keep-alive session, so workers
+    reuse connections instead of reconnecting per file. Each file is
+    claimed before processing so concurrent runs never handle the same file.
+
+    Returns a list of (status, latency_seconds) tuples, one per claimed file.
+    """
+    limiter = RateLimiter(max_rps)
+
+    scheduler = get_retry_scheduler()
+
+    def work(filepath: str):
+        if scheduler.circuit_open:
+            return None
+        started = time.perf_counter()
+        claimed = claim_file(filepath)
+        if claimed is None:
+            print(f"\n⏭️  {os.path.basename(filepath)} claimed by another run, skipping")
+            return None
+        try:
+            status = process_file(client, claimed, dry_run, limiter, conflicts, check_conflicts)
+        finally:
+            release_file(claimed, filepath)
+        return status, time.perf_counter() - started
+
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(work, files))
+    return [r for r in results if r is not None]
+
+
+def print_throughput(latencies: list, elapsed: float):
+    """Print files/sec and per-file latency percentiles."""
+    rate = len(latencies) / elapsed if elapsed > 0 else 0.0
+    print(f"⏱️  {rate:.1f} files/sec over {elapsed:.2f}s | "
+          f"p50 {percentile(latencies, 50) * 1000:.0f} ms | "
+          f"p95 {percentile(latencies, 95) * 1000:.0f} ms")
+
+
+class DLQWatcher:
+    """
+    Incrementally tracks failed-*.json files in DLQ_DIR.
+
+    Uses inotify (inotify_simple) when available; otherwise polls, re-listing
+    the directory only when its mtime changes. A file is handed out once its
+    size and mtime have been stable for `debounce` seconds.
+    """
+
+    def __init__(self, debounce: float = WATCH_DEBOUNCE_SECONDS,
+                 poll_interval: float = WATCH_POLL_SECONDS):
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.candidates = {}   # path -> (signature, stable_since)
+        self.retry_at = {}     # path -> monotonic time before which it is skipped
+        self.dir_mtime = None
+        self.inotify = None
+        try:
+            from inotify_simple import INotify, flags as inotify_flags
+        except ImportError:
+            pass          # optional dependency: fall back to polling
+        else:
+            self.inotify = INotify()
+            self.inotify.add_watch(
+                DLQ_DIR, inotify_flags.CLOSE_WRITE | inotify_flags.MOVED_TO
+            )
+        self._scan()
+
+    def _scan(self):
+        """Full listing of the DLQ directory (startup, or polling after a change)."""
+        with os.scandir(DLQ_DIR) as entries:
+            for entry in entries:
+                if entry.name.startswith("failed-") and entry.name.endswith(".json"):
+                    self.candidates.setdefault(entry.path, (None, 0.0))
+
+    def _discover(self):
+        if self.inotify is not None:
+            for event in self.inotify.read(timeout=int(self.poll_interval * 1000)):
+                if event.name.startswith("failed-") and event.name.endswith(".json"):
+                    self.candidates.setdefault(os.path.join(DLQ_DIR, event.name), (None, 0.0))
+            return
+        time.sleep(self.poll_interval)
+        mtime = os.stat(DLQ_DIR).st_mtime_ns
+        if mtime != self.dir_mtime:
+            self.dir_mtime = mtime
+            self._scan()
+
+    def defer(self, filepath: str, seconds: float):
+        """Skip a file for `seconds` (e.g. after a failed recovery attempt)."""
+        self.retry_at[filepath] = time.monotonic() + seconds
+
+    def poll(self) -> list:
+        """Wait up to one poll interval and return files ready for recovery."""
+        self._discover()
+        now = time.monotonic()
+        ready = []
+        for path, (old_sig, since) in list(self.candidates.items()):
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                self.candidates.pop(path, None)
+                self.retry_at.pop(path, None)
+                continue
+            sig = (st.st_size, st.st_mtime_ns)
+            if sig != old_sig:
+                self.candidates[path] = (sig, now)
+                continue
+            if now - since >= self.debounce and now >= self.retry_at.get(path, 0):
+                ready.append(path)
+        return sorted(ready)
+
+    def close(self):
+        if self.inotify is not None:
+            self.inotify.close()
+
+
+def watch(client: "PostgrestClient", dry_run: bool = False, debounce: float = WATCH_DEBOUNCE_SECONDS,
+          max_rps: float = 0, metrics_json: str = None, metrics_prom: str = None,
+          check_conflicts: bool = True):
+    """Run until SIGINT/SIGTERM, recovering DLQ files as soon as they are complete."""
+    stop = threading.Event()
+
+    def request_stop(signum, frame):
+        print(f"\n🛑 Received signal {signum}, finishing current file and exiting...")
+        stop.set()
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    os.makedirs(DLQ_DIR, exist_ok=True)
+    release_stale_claims()
+    watcher = DLQWatcher(debounce)
+    limiter = RateLimiter(max_rps)
+    scheduler = get_retry_scheduler()
+    mode = "inotify" if watcher.inotify is not None else "polling"
+    print(f"\n👀 Watching {DLQ_DIR} ({mode}, debounce {debounce}s)")
+
+    conflicts = None          # one index per session, refreshed by build_conflict_index
+    recovered = failed = conflicted = 0
+    try:
+        while not stop.is_set():
+            ready = watcher.poll()
+            due = []
+            for filepath in ready:
+                if scheduler.is_due(filepath):
+                    due.append(filepath)
+                else:
+                    watcher.defer(filepath, scheduler.seconds_until_due(filepath))
+            if due and client is not None and check_conflicts and not scheduler.circuit_open:
+                conflicts = build_conflict_index(client, due, conflicts)
+            for filepath in due:
+                if stop.is_set() or scheduler.circuit_open:
+                    break
+                claimed = claim_file(filepath)
+                if claimed is None:
+                    print(f"\n⏭️  {os.path.basename(filepath)} claimed by another run, skipping")
+                    continue
+                try:
+                    status = process_file(client, claimed, dry_run, limiter, conflicts, check_conflicts)
+                finally:
+                    release_file(claimed, filepath)
+                if status == "conflict":
+                    conflicted += 1
+                    watcher.defer(filepath, float("inf"))     # parked in conflicts/ (or dry run)
+                elif status != "failed":
+                    recovered += 1
+                    if dry_run:
+                        watcher.defer(filepath, float("inf"))
+                else:
+                    failed += 1
+                    watcher.defer(filepath, scheduler.seconds_until_due(filepath)
+                                  if not dry_run else float("inf"))
+            if ready:
+                write_metrics(metrics_json, metrics_prom)
+    finally:
+        watcher.close()
+        print(f"\n📊 Watch stopped: {recovered} recovered, {failed} failed attempts, "
+              f"{conflicted} slot conflict(s) parked in {CONFLICT_DIR}")
+
+
+def print_stage_summary():
+    """One line of average time per stage, so slow stages stand out in logs."""
+    summary = metrics.summary()["stages"]
+    parts = [
+        f"{stage} {stats['sum_seconds'] / stats['count'] * 1000:.1f}ms"
+        for stage, stats in summary.items() if stats["count"]
+    ]
+    if parts:
+        print("🧮 Avg per stage: " + " | ".join(parts))
+
+
+def parse_args(argv: list = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Recover failed bookings from DLQ")
     parser.add_argument("--dry-run", action="store_true", help="Preview without changes")
     parser.add_argument("--file", help="Process specific file instead of all")
-    args = parser.parse_args()
-    
+    parser.add_argument("--bulk", action="store_true",
+                        help="Parse all files first, then use chunked lookups and batched inserts")
+    parser.add_argument("--batch-size", type=int, default=BULK_BATCH_SIZE,
+                        help=f"Rows per insert request in --bulk mode (default: {BULK_BATCH_SIZE})")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of files processed in parallel (default: 1)")
+    parser.add_argument("--max-rps", type=float, default=0,
+                        help="Cap on Supabase requests per second across all workers (0 = no cap)")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running and recover new DLQ files as soon as they are written")
+    parser.add_argument("--debounce", type=float, default=WATCH_DEBOUNCE_SECONDS,
+                        help=f"Seconds a file must stay unchanged before --watch picks it up "
+                             f"(default: {WATCH_DEBOUNCE_SECONDS})")
+    parser.add_argument("--no-conflict-check", action="store_true",
+                        help="Insert without checking the slot against existing bookings")
+    parser.add_argument("--verify-index", action="store_true",
+                        help="Reconcile the local recovered-ID index against the bookings table")
+    parser.add_argument("--metrics-json", metavar="PATH",
+                        help="Write per-stage histograms and outcome counts as JSON")
+    parser.add_argument("--metrics-prom", metavar="PATH",
+                        help="Write metrics in Prometheus textfile-collector format (*.prom)")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="Run under cProfile and write pstats to PATH")
+    args = parser.parse_args(argv)
+    if args.watch and (args.bulk or args.file):
+        parser.error("--watch cannot be combined with --bulk or --file")
+    if args.bulk and args.workers > 1:
+        parser.error("--bulk and --workers are mutually exclusive")
+    if args.watch and args.workers > 1:
+        parser.error("--watch processes files one at a time; --workers cannot be combined with it")
+    return args
+
+
+def run(args: argparse.Namespace):
+    """Execute one recovery run (or the watch loop) for parsed arguments."""
     load_env()
     
     print("=" * 60)
@@ -212,16 +1164,35 @@ def main():
     print(f"🔍 Dry Run: {args.dry_run}")
     print("=" * 60)
     
-    if args.file:
+    if args.verify_index:
+        try:
+            client = get_supabase_client()
+        except Exception as e:
+            print(f"❌ Supabase connection failed: {e}")
+            return
+        for column, counts in verify_index(client).items():
+            print(f"🗂️  {column}: {counts['checked']} indexed, {counts['present']} in DB, "
+                  f"{counts['removed']} stale removed")
+        return
+    
+    if args.watch:
+        files = []
+    elif args.file:
         files = [args.file] if os.path.exists(args.file) else []
     else:
         files = get_pending_files()
+        scheduler = get_retry_scheduler()
+        due = [f for f in files if scheduler.is_due(f)]
+        if len(due) < len(files):
+            print(f"\n⏳ {len(files) - len(due)} file(s) waiting for their retry backoff")
+        files = due
     
-    if not files:
+    if not files and not args.watch:
         print("\n✨ No pending DLQ files found!")
         return
     
-    print(f"\n📋 Found {len(files)} file(s) to process")
+    if files:
+        print(f"\n📋 Found {len(files)} file(s) to process")
     
     if not args.dry_run:
         try:
@@ -233,19 +1204,73 @@ def main():
     else:
         client = None
     
-    success_count = 0
-    fail_count = 0
-    
-    for filepath in files:
-        if process_file(client, filepath, args.dry_run):
-            success_count += 1
-        else:
-            fail_count += 1
+    if args.watch:
+        watch(client, args.dry_run, args.debounce, args.max_rps,
+              args.metrics_json, args.metrics_prom, not args.no_conflict_check)
+        return
+
+    if args.bulk:
+        report = process_bulk(client, files, args.dry_run, max(1, args.batch_size),
+                              not args.no_conflict_check)
+        print_bulk_report(report)
+        fail_count = sum(1 for status, _ in report.values() if status == "failed")
+        conflict_count = sum(1 for status, _ in report.values() if status == "conflict")
+        print("\n" + "=" * 60)
+        print(f"📊 Results: {len(report) - fail_count - conflict_count} recovered, {fail_count} failed, "
+              f"{conflict_count} slot conflict(s) parked in {CONFLICT_DIR}")
+        print("=" * 60)
+        return
+
+    started = time.perf_counter()
+    conflicts = None
+    if client is not None and not args.no_conflict_check and len(files) > 1:
+        conflicts = build_conflict_index(client, files)
+    if args.workers > 1:
+        release_stale_claims()
+        results = process_concurrent(client, files, args.dry_run, args.workers, args.max_rps,
+                                     conflicts, not args.no_conflict_check)
+    else:
+        limiter = RateLimiter(args.max_rps)
+        results = []
+        for filepath in files:
+            if get_retry_scheduler().circuit_open:
+                break
+            file_started = time.perf_counter()
+            status = process_file(client, filepath, args.dry_run, limiter, conflicts,
+                                  not args.no_conflict_check)
+            results.append((status, time.perf_counter() - file_started))
+    elapsed = time.perf_counter() - started
+
+    fail_count = sum(1 for status, _ in results if status == "failed")
+    conflict_count = sum(1 for status, _ in results if status == "conflict")
     
     print("\n" + "=" * 60)
-    print(f"📊 Results: {success_count} recovered, {fail_count} failed")
+    print(f"📊 Results: {len(results) - fail_count - conflict_count} recovered, {fail_count} failed, "
+          f"{conflict_count} slot conflict(s) parked in {CONFLICT_DIR}")
+    print_throughput([latency for _, latency in results], elapsed)
+    if get_retry_scheduler().circuit_open:
+        print(f"🔌 Circuit breaker open: stopped after {CIRCUIT_BREAKER_THRESHOLD} "
+              f"connection errors, {len(files) - len(results)} file(s) left for the next run")
     print("=" * 60)
 
 
+def main(argv: list = None):
+    args = parse_args(argv)
+    try:
+        if args.profile:
+            import cProfile
+            profiler = cProfile.Profile()
+            try:
+                profiler.runcall(run, args)
+            finally:
+                profiler.dump_stats(args.profile)
+                print(f"🔬 Profile written to {args.profile} (inspect with: python3 -m pstats {args.profile})")
+        else:
+            run(args)
+    finally:
+        print_stage_summary()
+        write_metrics(args.metrics_json, args.metrics_prom)
+
+
 if __name__ == "__main__":
     main()
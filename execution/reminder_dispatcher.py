@@ -0,0 +1,693 @@
+#!/usr/bin/env python3
+"""
+Reminder & Recall Dispatcher
+
+Purpose: Sends the daily appointment reminders (email + SMS) and 6-month recall
+emails from n8n-7-daily-reminders-and-recall without the one-item-at-a-time
+Split Batches -> Gmail -> Twilio loop.
+
+How it works:
+    - templates are rendered once per (message kind, language, clinic); only
+      the patient fields are substituted per message (HTML-escaped)
+    - every message is an async job; a global semaphore bounds concurrency and
+      each provider has its own token bucket (Gmail and Twilio throttle
+      independently)
+    - transient errors (timeouts, 429, 5xx) retry with exponential backoff and
+      jitter, honouring Retry-After
+    - an idempotency key per (kind, booking / patient, channel, day) is claimed
+      in a local SQLite ledger before sending, so re-running the job (or the
+      n8n cron firing twice) never double-sends; a send interrupted mid-flight
+      is reported as "uncertain" and skipped unless --resend-uncertain
+
+Providers:
+    stub    local simulator (latency, failure and throttling rates) for testing
+    smtp    SMTP (Gmail: smtp.gmail.com:587 with an app password)
+    twilio  Twilio Messages REST API
+
+Usage:
+    python3 reminder_dispatcher.py --fetch                           # Tomorrow's reminders + recall (Supabase)
+    python3 reminder_dispatcher.py --bookings tomorrow.json --recall recall.json
+    python3 reminder_dispatcher.py --fetch --dry-run                 # Render only
+    python3 reminder_dispatcher.py --simulate 5000 --email stub --sms stub --report report.json
+
+Environment Variables:
+    SUPABASE_URL, SUPABASE_SERVICE_KEY - for --fetch
+    SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASSWORD, EMAIL_FROM - smtp provider
+    TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, TWILIO_FROM - twilio provider
+    DISPATCH_DIR - idempotency ledger directory (default: /home/n8n/dispatch)
+"""
+
+import os
+import sys
+import json
+import time
+import html
+import random
+import asyncio
+import hashlib
+import sqlite3
+import argparse
+import threading
+from string import Template
+from datetime import datetime, timedelta, timezone
+
+from env_config import load_env
+from recall_engine import language_preference
+
+# Configuration
+DISPATCH_DIR = os.getenv("DISPATCH_DIR", "/home/n8n/dispatch")
+LEDGER_FILE = os.path.join(DISPATCH_DIR, "dispatch_ledger.sqlite")
+DEFAULT_CONCURRENCY = 32
+MAX_ATTEMPTS = 5
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 30
+REQUEST_TIMEOUT = 20
+
+# Per-provider limits: (messages per second, burst)
+PROVIDER_LIMITS = {
+    "stub": (200.0, 50),
+    "smtp": (5.0, 10),      # Gmail SMTP is throttled well below its daily quota
+    "twilio": (1.0, 5),     # one long-code number: ~1 SMS/s
+}
+
+DEFAULT_CLINIC = {
+    "name": "Butkeviča Dental Practice",
+    "address": "Dzirnavu iela 45, Centra rajons, Rīga, LV-1050",
+    "short_address": "Dzirnavu iela 45",
+    "maps_url": "https://maps.google.com/?q=Dzirnavu+iela+62A,+Riga,+Latvia",
+    "booking_url": "https://butkevica-dental-booking.pages.dev",
+    "recall_address": "Dzirnavu iela 62A, Rīga",
+}
+
+WEEKDAYS_LV = ["pirmdiena", "otrdiena", "trešdiena", "ceturtdiena", "piektdiena", "sestdiena", "svētdiena"]
+MONTHS_LV = ["janvāris", "februāris", "marts", "aprīlis", "maijs", "jūnijs", "jūlijs", "augusts",
+             "septembris", "oktobris", "novembris", "decembris"]
+
+
+# =============================================================================
+# Templates
+# =============================================================================
+
+STYLES = (
+    "body { font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif; line-height: 1.6; "
+    "color: #333; max-width: 600px; margin: 0 auto; padding: 20px; } "
+    ".header { background: linear-gradient(135deg, #0d9488 0%, #14b8a6 100%); color: white; padding: 30px; "
+    "border-radius: 12px 12px 0 0; text-align: center; } .header h1 { margin: 0; font-size: 24px; } "
+    ".content { background: #f8fafc; padding: 30px; border-radius: 0 0 12px 12px; } "
+    ".info-card { background: white; border-radius: 8px; padding: 20px; margin: 20px 0; "
+    "box-shadow: 0 2px 4px rgba(0,0,0,0.05); } "
+    ".badge { padding: 12px 20px; border-radius: 8px; text-align: center; margin-bottom: 20px; font-weight: 600; } "
+    ".reminder { background: #fef3c7; color: #92400e; } .recall { background: #dbeafe; color: #1e40af; } "
+    ".btn { display: inline-block; background: #0d9488; color: white !important; padding: 14px 28px; "
+    "border-radius: 8px; text-decoration: none; font-weight: 600; margin: 10px 5px 10px 0; } "
+    ".footer { text-align: center; margin-top: 30px; color: #64748b; font-size: 14px; } "
+    ".tip { background: #ecfdf5; border-left: 4px solid #10b981; padding: 15px; margin: 20px 0; "
+    "border-radius: 0 8px 8px 0; }"
+)
+
+PAGE = ('<!DOCTYPE html><html><head><meta charset="utf-8"><style>{styles}</style></head><body>'
+        '<div class="header"><h1>{title}</h1></div><div class="content">{content}'
+        '<div class="footer">{footer}</div></div></body></html>')
+
+REMINDER_CARD = (
+    '<div class="info-card"><p>📅 {date_label}: <strong>$date</strong></p>'
+    '<p>⏰ {time_label}: <strong>$time</strong></p><p>🏥 {service_label}: <strong>$service</strong></p>'
+    '<p>📍 {address_label}: <a href="$maps_url" style="color: #0d9488;">$address</a></p></div>'
+    '<div style="text-align: center;"><a href="$maps_url" class="btn">{map_button}</a></div>'
+    '<div class="tip">💡 {tip}</div>'
+)
+
+REMINDER_TEXT = {
+    "lv": {
+        "subject": "⏰ Atgādinājums: Vizīte rīt plkst. $time",
+        "title": "🦷 Vizītes Atgādinājums",
+        "greeting": "<p>Labdien, <strong>$name</strong>!</p>",
+        "badge": "⏰ Jūsu vizīte ir ieplānota rīt, plkst. <strong>$time</strong>",
+        "labels": ("Datums", "Laiks", "Pakalpojums", "Adrese", "📍 Skatīt Kartē",
+                   "<strong>Ieteikums:</strong> Lūdzu, ierodieties 5-10 minūtes pirms vizītes laika."),
+        "footer": "<p>Ja nepieciešams pārcelt vizīti, lūdzu, sazinieties ar mums nekavējoties.</p>"
+                  "<p>Ar cieņu,<br><strong>$clinic_name</strong></p>",
+        "sms": "Atgādinājums: Zobārsta vizīte rīt plkst. $time. Adrese: $short_address. Uz tikšanos! - $clinic_name",
+    },
+    "ru": {
+        "subject": "⏰ Напоминание: Визит завтра в $time",
+        "title": "🦷 Напоминание о Визите",
+        "greeting": "<p>Здравствуйте, <strong>$name</strong>!</p>",
+        "badge": "⏰ Ваш визит запланирован на <strong>ЗАВТРА</strong>",
+        "labels": ("Дата", "Время", "Услуга", "Адрес", "📍 Показать на Карте",
+                   "<strong>Совет:</strong> Пожалуйста, приходите за 5-10 минут до назначенного времени."),
+        "footer": "<p>Если вам нужно перенести визит, пожалуйста, свяжитесь с нами немедленно.</p>"
+                  "<p>С уважением,<br><strong>$clinic_name</strong></p>",
+        "sms": "Напоминание: Визит к стоматологу завтра в $time. Адрес: $short_address. До встречи! - $clinic_name",
+    },
+    "en": {
+        "subject": "⏰ Reminder: Appointment Tomorrow at $time",
+        "title": "🦷 Appointment Reminder",
+        "greeting": "<p>Hi <strong>$name</strong>,</p>",
+        "badge": "⏰ Your appointment is scheduled for <strong>TOMORROW</strong>",
+        "labels": ("Date", "Time", "Service", "Address", "📍 View on Map",
+                   "<strong>Tip:</strong> Please arrive 5-10 minutes before your appointment time."),
+        "footer": "<p>If you need to reschedule, please contact us immediately.</p>"
+                  "<p>Best regards,<br><strong>$clinic_name</strong></p>",
+        "sms": "Reminder: Dental appointment tomorrow at $time. Address: $short_address. See you soon! - $clinic_name",
+    },
+}
+
+RECALL_TEXT = {
+    "lv": {
+        "subject": "🦷 Laiks smaida pārbaudei — 6 mēneši jau pagājuši!",
+        "title": "🦷 Laiks Smaida Pārbaudei!",
+        "content": '<p>Sveiki, <strong>$name</strong>!</p><div class="badge recall">📅 Ir pagājuši '
+                   '<strong>6 mēneši</strong> kopš Jūsu pēdējās vizītes</div><div class="info-card"><p>Lai smaids '
+                   'būtu vesels un skaists, zobārsti rekomendē veikt pārbaudi un profesionālo higiēnu <strong>reizi '
+                   'pusgadā</strong>.</p><p>Tas palīdz:</p><ul><li>✓ Novērst kariesu agrīnā stadijā</li><li>✓ '
+                   'Saglabāt smaganu veselību</li><li>✓ Izvairīties no dārgākas ārstēšanas nākotnē</li></ul></div>'
+                   '<div style="text-align: center;"><a href="$booking_url" class="btn">📅 Rezervēt Vizīti</a></div>'
+                   '<div class="tip">💡 <strong>Ieteikums:</strong> Rezervējiet laiku jau šodien — populārākie '
+                   'laiki aizpildās ātri!</div>',
+        "footer": "<p>Uz drīzu tikšanos!</p><p>Ar cieņu,<br><strong>$clinic_name</strong><br>$recall_address</p>",
+    },
+    "en": {
+        "subject": "🦷 Time for Your Smile Check — 6 Months Already!",
+        "title": "🦷 Time for Your Smile Check!",
+        "content": '<p>Hi <strong>$name</strong>,</p><div class="badge recall">📅 It\'s been <strong>6 months'
+                   '</strong> since your last visit</div><div class="info-card"><p>For a healthy and beautiful '
+                   'smile, dentists recommend a checkup and professional cleaning <strong>every 6 months</strong>.'
+                   '</p><p>This helps:</p><ul><li>✓ Catch cavities early</li><li>✓ Maintain healthy gums</li><li>✓ '
+                   'Avoid costly treatments later</li></ul></div><div style="text-align: center;"><a href='
+                   '"$booking_url" class="btn">📅 Book Your Appointment</a></div><div class="tip">💡 <strong>Tip:'
+                   '</strong> Book today — popular time slots fill up quickly!</div>',
+        "footer": "<p>Looking forward to seeing you!</p><p>Best regards,<br><strong>$clinic_name</strong>"
+                  "<br>$recall_address</p>",
+    },
+}
+
+
+class TemplateCache:
+    """Compiled templates keyed by (kind, language, clinic); clinic fields pre-filled."""
+
+    def __init__(self, clinics: dict):
+        self.clinics = clinics
+        self.cache = {}
+        self.compiled = 0
+
+    def clinic_fields(self, clinic_id: str) -> dict:
+        info = dict(DEFAULT_CLINIC)
+        info.update({k: v for k, v in (self.clinics.get(clinic_id) or {}).items() if v})
+        fields = {k: html.escape(v) for k, v in info.items()}
+        fields["clinic_name"] = fields.pop("name")
+        return fields
+
+    def get(self, kind: str, language: str, clinic_id: str) -> dict:
+        key = (kind, language, clinic_id)
+        if key not in self.cache:
+            self.cache[key] = self._compile(kind, language, clinic_id)
+            self.compiled += 1
+        return self.cache[key]
+
+    def _compile(self, kind, language, clinic_id) -> dict:
+        fields = self.clinic_fields(clinic_id)
+        if kind == "reminder":
+            t = REMINDER_TEXT[language]
+            labels = dict(zip(("date_label", "time_label", "service_label", "address_label",
+                               "map_button", "tip"), t["labels"]))
+            content = (t["greeting"] + f'<div class="badge reminder">{t["badge"]}</div>'
+                       + REMINDER_CARD.format(**labels))
+            parts = {"subject": t["subject"], "sms": t["sms"],
+                     "html": PAGE.format(styles=STYLES, title=t["title"], content=content, footer=t["footer"])}
+        else:
+            t = RECALL_TEXT["lv" if language == "lv" else "en"]  # Check Language: lv, else English
+            parts = {"subject": t["subject"],
+                     "html": PAGE.format(styles=STYLES, title=t["title"], content=t["content"], footer=t["footer"])}
+        # Clinic-level substitution happens once; patient fields stay as $placeholders
+        return {k: Template(Template(v).safe_substitute(fields)) for k, v in parts.items()}
+
+
+def lv_long_date(d) -> str:
+    """toLocaleDateString('lv-LV', {weekday, year, month: 'long', day})."""
+    return f"{WEEKDAYS_LV[d.weekday()]}, {d.year}. gada {d.day}. {MONTHS_LV[d.month - 1]}"
+
+
+# =============================================================================
+# Jobs and idempotency
+# =============================================================================
+
+def idempotency_key(kind: str, ref: str, channel: str, day: str) -> str:
+    return hashlib.sha256(f"{kind}|{ref}|{channel}|{day}".encode()).hexdigest()[:32]
+
+
+def build_jobs(bookings: list, recall: list, templates: TemplateCache, today: datetime) -> list:
+    """Render every message (reminder email + SMS per booking, recall email per patient)."""
+    day = today.date().isoformat()
+    tomorrow_lv = lv_long_date(today.date() + timedelta(days=1))
+    jobs = []
+    for b in bookings:
+        lang = language_preference(b.get("language"), b.get("customer_phone"))
+        t = templates.get("reminder", lang, b.get("clinic_id"))
+        start = b.get("start_time") or ""
+        display_time = start.split("T")[1][:5] if "T" in start else start
+        values = {
+            "name": html.escape(b.get("customer_name") or "Pacients"),
+            "time": display_time,
+            "date": tomorrow_lv if lang == "lv" else ("Завтра" if lang == "ru" else "Tomorrow"),
+            "service": html.escape(b.get("service_name") or "Zobārstniecības vizīte"),
+        }
+        ref = str(b.get("id") or f"{b.get('customer_email')}|{start}")
+        if b.get("customer_email"):
+            jobs.append({"key": idempotency_key("reminder", ref, "email", day), "kind": "reminder",
+                         "channel": "email", "to": b["customer_email"],
+                         "subject": t["subject"].safe_substitute(values),
+                         "body": t["html"].safe_substitute(values)})
+        if b.get("customer_phone"):
+            jobs.append({"key": idempotency_key("reminder", ref, "sms", day), "kind": "reminder",
+                         "channel": "sms", "to": b["customer_phone"],
+                         "body": t["sms"].safe_substitute(
+                             {**values, "name": b.get("customer_name") or "Pacients"})})
+    for p in recall:
+        if not p.get("patient_email"):
+            continue
+        t = templates.get("recall", p.get("language_preference") or "lv", p.get("clinic_id"))
+        values = {"name": html.escape(p.get("patient_name") or "")}
+        ref = f"{p['patient_email'].lower()}|{p.get('last_appointment')}"
+        jobs.append({"key": idempotency_key("recall", ref, "email", day), "kind": "recall",
+                     "channel": "email", "to": p["patient_email"],
+                     "subject": t["subject"].safe_substitute(values),
+                     "body": t["html"].safe_substitute(values)})
+    return jobs
+
+
+class Ledger:
+    """Idempotency ledger: a key is claimed ('sending') before the provider call."""
+
+    def __init__(self, path: str = LEDGER_FILE):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.executescript(
+            """
+            PRAGMA journal_mode = WAL;
+            CREATE TABLE IF NOT EXISTS sends (
+                key TEXT PRIMARY KEY,
+                kind TEXT, channel TEXT, recipient TEXT, provider TEXT,
+                status TEXT, provider_id TEXT, attempts INTEGER, updated_at TEXT
+            );
+            """
+        )
+
+    def claim(self, job: dict, provider: str, resend_uncertain: bool = False) -> str:
+        """Return 'claimed', 'duplicate' (already sent) or 'uncertain' (interrupted earlier)."""
+        row = self.db.execute("SELECT status FROM sends WHERE key = ?", (job["key"],)).fetchone()
+        if row and row[0] == "sent":
+            return "duplicate"
+        if row and row[0] == "sending" and not resend_uncertain:
+            return "uncertain"
+        self.db.execute(
+            "INSERT OR REPLACE INTO sends VALUES (?, ?, ?, ?, ?, 'sending', NULL, 0, ?)",
+            (job["key"], job["kind"], job["channel"], job["to"], provider,
+             datetime.now(timezone.utc).isoformat()),
+        )
+        self.db.commit()
+        return "claimed"
+
+    def finish(self, key: str, status: str, provider_id: str = None, attempts: int = 0):
+        self.db.execute(
+            "UPDATE sends SET status = ?, provider_id = ?, attempts = ?, updated_at = ? WHERE key = ?",
+            (status, provider_id, attempts, datetime.now(timezone.utc).isoformat(), key),
+        )
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+
+# =============================================================================
+# Providers
+# =============================================================================
+
+class TransientError(Exception):
+    """Retryable provider failure (timeout, 429, 5xx)."""
+
+    def __init__(self, message: str, retry_after: float = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class PermanentError(Exception):
+    """Non-retryable failure (bad address, auth, 4xx)."""
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, up to `capacity` banked."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class StubProvider:
+    """Local simulator: random latency, transient failures and 429s."""
+
+    def __init__(self, name: str = "stub", latency_ms: float = 40, failure_rate: float = 0.02,
+                 throttle_rate: float = 0.01, seed: int = 1):
+        self.name = name
+        self.latency = latency_ms / 1000
+        self.failure_rate = failure_rate
+        self.throttle_rate = throttle_rate
+        self.rng = random.Random(seed)
+        self.delivered = []
+
+    async def send(self, job: dict) -> str:
+        await asyncio.sleep(self.rng.uniform(0.5, 1.5) * self.latency)
+        roll = self.rng.random()
+        if roll < self.throttle_rate:
+            raise TransientError("429 Too Many Requests", retry_after=0.2)
+        if roll < self.throttle_rate + self.failure_rate:
+            raise TransientError("503 Service Unavailable")
+        self.delivered.append(job["key"])
+        return f"{self.name}-{len(self.delivered)}"
+
+
+class SmtpEmailProvider:
+    """SMTP sender; one persistent connection per worker thread."""
+
+    name = "smtp"
+
+    def __init__(self):
+        self.host = os.getenv("SMTP_HOST", "smtp.gmail.com")
+        self.port = int(os.getenv("SMTP_PORT", 587))
+        self.user = os.getenv("SMTP_USER")
+        self.password = os.getenv("SMTP_PASSWORD")
+        self.sender = os.getenv("EMAIL_FROM") or self.user
+        self.local = threading.local()
+
+    def _connection(self):
+        import smtplib
+
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = smtplib.SMTP(self.host, self.port, timeout=REQUEST_TIMEOUT)
+            conn.starttls()
+            if self.user:
+                conn.login(self.user, self.password)
+            self.local.conn = conn
+        return conn
+
+    def _send(self, job: dict) -> str:
+        import smtplib
+        from email.message import EmailMessage
+
+        msg = EmailMessage()
+        msg["From"], msg["To"], msg["Subject"] = self.sender, job["to"], job["subject"]
+        msg["Message-ID"] = f"<{job['key']}@reminders>"  # stable per idempotency key
+        msg.set_content("Please view this message in an HTML-capable email client.")
+        msg.add_alternative(job["body"], subtype="html")
+        try:
+            self._connection().send_message(msg)
+        except smtplib.SMTPRecipientsRefused as e:
+            raise PermanentError(str(e))
+        except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError) as e:
+            self.local.conn = None
+            raise TransientError(str(e))
+        except smtplib.SMTPResponseException as e:
+            # Before OSError: SMTPException subclasses OSError, so a hard bounce
+            # (5xx) would otherwise be retried as a network error.
+            if e.smtp_code >= 500:
+                raise PermanentError(f"{e.smtp_code} {e.smtp_error!r}")
+            self.local.conn = None
+            raise TransientError(f"{e.smtp_code} {e.smtp_error!r}")
+        except OSError as e:
+            self.local.conn = None
+            raise TransientError(str(e))
+        return msg["Message-ID"]
+
+    async def send(self, job: dict) -> str:
+        return await asyncio.to_thread(self._send, job)
+
+
+class TwilioSmsProvider:
+    """Twilio Messages API over a pooled requests session."""
+
+    name = "twilio"
+
+    def __init__(self):
+        import requests
+
+        self.sid = os.getenv("TWILIO_ACCOUNT_SID")
+        self.sender = os.getenv("TWILIO_FROM")
+        self.session = requests.Session()
+        self.session.auth = (self.sid, os.getenv("TWILIO_AUTH_TOKEN"))
+
+    def _send(self, job: dict) -> str:
+        import requests
+
+        try:
+            resp = self.session.post(
+                f"https://api.twilio.com/2010-04-01/Accounts/{self.sid}/Messages.json",
+                data={"From": self.sender, "To": job["to"], "Body": job["body"]},
+                timeout=REQUEST_TIMEOUT,
+            )
+        except requests.RequestException as e:
+            raise TransientError(str(e))
+        if resp.status_code == 429 or resp.status_code >= 500:
+            retry_after = resp.headers.get("Retry-After")
+            raise TransientError(f"HTTP {resp.status_code}", float(retry_after) if retry_after else None)
+        if resp.status_code >= 400:
+            raise PermanentError(f"HTTP {resp.status_code} {resp.text[:200]}")
+        return resp.json().get("sid")
+
+    async def send(self, job: dict) -> str:
+        return await asyncio.to_thread(self._send, job)
+
+
+def make_provider(kind: str, channel: str):
+    if kind == "stub":
+        return StubProvider(name=f"stub-{channel}", seed=1 if channel == "email" else 2)
+    if kind == "smtp":
+        return SmtpEmailProvider()
+    if kind == "twilio":
+        return TwilioSmsProvider()
+    raise ValueError(f"Unknown provider: {kind}")
+
+
+# =============================================================================
+# Dispatcher
+# =============================================================================
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class Dispatcher:
+    """Bounded-concurrency async sender with per-provider token buckets."""
+
+    def __init__(self, providers: dict, ledger: Ledger = None, concurrency: int = DEFAULT_CONCURRENCY,
+                 limits: dict = None, resend_uncertain: bool = False):
+        self.providers = providers          # channel -> provider
+        self.ledger = ledger
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.resend_uncertain = resend_uncertain
+        limits = limits or {}
+        self.buckets = {}
+        for channel, provider in providers.items():
+            base = provider.name.split("-")[0]
+            rate, burst = limits.get(channel) or PROVIDER_LIMITS.get(base, (10.0, 10))
+            self.buckets[channel] = TokenBucket(rate, burst)
+        self.stats = {"sent": 0, "failed": 0, "duplicate": 0, "uncertain": 0, "retries": 0}
+        self.latencies = {channel: [] for channel in providers}
+        self.failures = []
+
+    async def dispatch(self, job: dict):
+        channel = job["channel"]
+        provider = self.providers[channel]
+        async with self.semaphore:
+            # Claim only once a worker slot is free: a killed run then leaves at
+            # most `concurrency` rows 'sending', not every job still queued.
+            if self.ledger:
+                claim = self.ledger.claim(job, provider.name, self.resend_uncertain)
+                if claim != "claimed":
+                    self.stats[claim] += 1
+                    return
+            for attempt in range(1, MAX_ATTEMPTS + 1):
+                await self.buckets[channel].acquire()
+                started = time.perf_counter()
+                try:
+                    provider_id = await provider.send(job)
+                except TransientError as e:
+                    if attempt == MAX_ATTEMPTS:
+                        self._fail(job, str(e), attempt)
+                        return
+                    self.stats["retries"] += 1
+                    delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (attempt - 1))
+                    await asyncio.sleep(e.retry_after or random.uniform(delay / 2, delay))
+                    continue
+                except Exception as e:
+                    self._fail(job, str(e), attempt)
+                    return
+                self.latencies[channel].append(time.perf_counter() - started)
+                self.stats["sent"] += 1
+                if self.ledger:
+                    self.ledger.finish(job["key"], "sent", provider_id, attempt)
+                return
+
+    def _fail(self, job: dict, error: str, attempts: int):
+        self.stats["failed"] += 1
+        self.failures.append({"to": job["to"], "channel": job["channel"], "kind": job["kind"], "error": error})
+        if self.ledger:
+            self.ledger.finish(job["key"], "failed", None, attempts)
+
+    async def run(self, jobs: list) -> dict:
+        started = time.perf_counter()
+        await asyncio.gather(*(self.dispatch(job) for job in jobs))
+        elapsed = time.perf_counter() - started
+        report = dict(self.stats, jobs=len(jobs), seconds=round(elapsed, 3),
+                      throughput_per_s=round(self.stats["sent"] / elapsed, 1) if elapsed else None)
+        report["latency_ms"] = {
+            channel: {"p50": round(percentile(v, 50) * 1000, 1), "p95": round(percentile(v, 95) * 1000, 1),
+                      "p99": round(percentile(v, 99) * 1000, 1), "count": len(v)}
+            for channel, v in self.latencies.items()
+        }
+        report["failures"] = self.failures[:50]
+        return report
+
+
+# =============================================================================
+# Inputs
+# =============================================================================
+
+def fetch_inputs(today: datetime) -> tuple:
+    """Tomorrow's confirmed bookings (workflow filter), clinic profiles and recall candidates."""
+    from postgrest_client import PostgrestClient
+    from recall_engine import RecallIndex, recall_candidates, sync
+
+    client = PostgrestClient.from_env(timeout=REQUEST_TIMEOUT)
+    tomorrow = (today + timedelta(days=1)).date().isoformat()
+    bookings = client.fetch_all("bookings", "*", {
+        "and": f"(status.eq.confirmed,start_time.gte.{tomorrow}T00:00:00,"
+               f"start_time.lte.{tomorrow}T23:59:59)",
+    })
+    clinics = {c["id"]: {"name": c.get("name"), **{k: (c.get("settings") or {}).get(k) for k in
+               ("address", "short_address", "maps_url", "booking_url", "recall_address")}}
+               for c in client.fetch_all("clinics", "id,name,settings", cache=True)}
+
+    index = RecallIndex()
+    try:
+        sync(index, client)
+        recall = recall_candidates(index)
+    finally:
+        index.close()
+    return bookings, recall, clinics
+
+
+def simulated_inputs(count: int) -> tuple:
+    rng = random.Random(3)
+    tomorrow = (datetime.now(timezone.utc) + timedelta(days=1)).date().isoformat()
+    bookings = [{
+        "id": f"sim-{i}", "clinic_id": rng.choice(["butkevica", "sample", None]),
+        "customer_email": f"patient{i}@example.com",
+        "customer_phone": rng.choice(["+37120000000", "+447700900000", None]),
+        "customer_name": f"Patient {i}", "language": rng.choice(["lv", "en", "ru", None]),
+        "start_time": f"{tomorrow}T{rng.randrange(9, 18):02d}:00:00", "service_name": None,
+    } for i in range(count)]
+    recall = [{"patient_email": f"recall{i}@example.com", "patient_name": f"Recall {i}",
+               "language_preference": rng.choice(["lv", "en"]),
+               "last_appointment": "2026-04-17T10:00:00.000Z",
+               "clinic_id": rng.choice(["butkevica", "sample", None])} for i in range(count // 2)]
+    return bookings, recall, {}
+
+
+def load_json(path: str) -> list:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return [item.get("json", item) for item in data]  # accept raw n8n item exports too
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send daily reminders and recall emails")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--fetch", action="store_true", help="Fetch tomorrow's bookings and recall candidates")
+    source.add_argument("--bookings", help="JSON file of bookings to remind")
+    source.add_argument("--simulate", type=int, metavar="N", help="Generate N synthetic bookings")
+    parser.add_argument("--recall", help="JSON file of recall candidates (recall_engine.py run output)")
+    parser.add_argument("--email", default="smtp", choices=["smtp", "stub"], help="Email provider")
+    parser.add_argument("--sms", default="twilio", choices=["twilio", "stub"], help="SMS provider")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--email-rate", type=float, help="Override email messages/second")
+    parser.add_argument("--sms-rate", type=float, help="Override SMS messages/second")
+    parser.add_argument("--resend-uncertain", action="store_true",
+                        help="Retry messages whose earlier send was interrupted")
+    parser.add_argument("--ledger", default=LEDGER_FILE, help="Idempotency ledger path")
+    parser.add_argument("--dry-run", action="store_true", help="Render messages, send nothing")
+    parser.add_argument("--report", help="Write the throughput/latency report as JSON")
+    args = parser.parse_args()
+
+    load_env()
+
+    today = datetime.now(timezone.utc)
+    if args.fetch:
+        bookings, recall, clinics = fetch_inputs(today)
+    elif args.simulate:
+        bookings, recall, clinics = simulated_inputs(args.simulate)
+    else:
+        bookings, recall, clinics = load_json(args.bookings), [], {}
+    if args.recall:
+        recall = load_json(args.recall)
+    # clinic_id None = booking made before multi-clinic (default clinic); a missing key means
+    # an export from before recall_engine tracked the clinic, which we must not rebrand
+    unknown_clinic = [p for p in recall if "clinic_id" not in p]
+    if unknown_clinic:
+        print(f"⚠️  Skipping {len(unknown_clinic)} recall patient(s) without clinic_id "
+              f"(re-export with recall_engine.py run)")
+        recall = [p for p in recall if "clinic_id" in p]
+
+    templates = TemplateCache(clinics)
+    started = time.perf_counter()
+    jobs = build_jobs(bookings, recall, templates, today)
+    print(f"📨 {len(jobs)} message(s) for {len(bookings)} booking(s) and {len(recall)} recall patient(s); "
+          f"{templates.compiled} template(s) compiled in {time.perf_counter() - started:.2f}s")
+    if args.dry_run:
+        print("🔍 DRY RUN - nothing sent")
+        return
+
+    limits = {}
+    if args.email_rate:
+        limits["email"] = (args.email_rate, max(1, int(args.email_rate)))
+    if args.sms_rate:
+        limits["sms"] = (args.sms_rate, max(1, int(args.sms_rate)))
+    ledger = Ledger(args.ledger)
+    try:
+        providers = {"email": make_provider(args.email, "email"), "sms": make_provider(args.sms, "sms")}
+        dispatcher = Dispatcher(providers, ledger, args.concurrency, limits, args.resend_uncertain)
+        report = asyncio.run(dispatcher.run(jobs))
+    finally:
+        ledger.close()
+
+    print(f"✅ Sent {report['sent']} in {report['seconds']}s ({report['throughput_per_s']}/s), "
+          f"{report['retries']} retries, {report['duplicate']} duplicate(s) skipped, "
+          f"{report['uncertain']} uncertain, {report['failed']} failed")
+    for channel, lat in report["latency_ms"].items():
+        print(f"   {channel:<6} p50 {lat['p50']}ms  p95 {lat['p95']}ms  p99 {lat['p99']}ms  ({lat['count']})")
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"📄 Report written to {args.report}")
+    sys.exit(0 if report["failed"] == 0 else 1)
+
+
+if __name__ == "__main__":
+    main()
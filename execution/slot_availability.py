@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+"""
+Slot Availability Engine
+
+Purpose: Computes bookable slots for a clinic over a date range, for many
+specialists and services with different durations, in one call. Replaces the
+per-request `Availability Logic` loop in workflows/n8n-4-check-availability.json
+(which scans every booking and calendar event for every slot and re-parses
+ISO dates on each comparison).
+
+How it works:
+    - every booking / calendar event is parsed once into epoch-second intervals
+    - busy time per specialist (and clinic-wide calendar time) is merged with
+      a sorted sweep into disjoint intervals, so "is this slot free" is a
+      binary search
+    - unassigned bookings count against the specialist pool (same rule as the
+      check-availability edge function), counted in O(log n) per slot
+    - pending bookings only block while slot_lock_expires_at is in the future
+
+All times without an explicit offset are treated as UTC, like the edge function.
+
+Usage:
+    python3 slot_availability.py check --clinic butkevica --date 2025-12-08
+    python3 slot_availability.py check --clinic butkevica --date 2025-12-08 --to 2025-12-14 --service butkevica_s2
+    python3 slot_availability.py serve --port 8787
+
+HTTP API (serve):
+    GET  /availability?clinic_id=butkevica&date=2025-12-08[&date_to=...][&service_id=...]
+         Fetches clinic hours, specialists, services and bookings from Supabase.
+    POST /availability   {"date": "...", "bookings": [...], "events": [...],
+                          "specialists": [...], "services": [...], ...}
+         Pure computation on data the caller already has (drop-in for the n8n
+         Code node: POST the Supabase + Google Calendar node output).
+    Single date + single service responses keep the {"slots": [...]} shape.
+
+Environment Variables (GET mode only):
+    SUPABASE_URL - Supabase project URL
+    SUPABASE_SERVICE_KEY - Service role key
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from bisect import bisect_left, bisect_right, insort
+from datetime import date as date_cls, datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+from env_config import load_env
+from postgrest_client import PostgrestClient
+
+# Defaults mirror supabase/functions/check-availability
+DEFAULT_OPEN_DAYS = {1, 2, 3, 4, 5}   # day_of_week: 0 = Sunday ... 6 = Saturday
+DEFAULT_OPEN_TIME = "09:00"
+DEFAULT_CLOSE_TIME = "18:00"
+DEFAULT_DURATION_MINUTES = 60
+DEFAULT_SLOT_STEP_MINUTES = 60
+MAX_RANGE_DAYS = 62
+BLOCKING_STATUSES = {"confirmed", "completed"}
+
+DAY = 86400
+
+
+# =============================================================================
+# Parsing
+# =============================================================================
+
+def parse_ts(value) -> float:
+    """ISO timestamp/date string -> epoch seconds (naive values are UTC)."""
+    if not value:
+        return None
+    dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def parse_clock(value: str) -> int:
+    """'HH:MM' or 'HH:MM:SS' -> seconds after midnight."""
+    parts = [int(p) for p in value.split(":")]
+    return parts[0] * 3600 + parts[1] * 60 + (parts[2] if len(parts) > 2 else 0)
+
+
+def day_start(d: date_cls) -> float:
+    return datetime(d.year, d.month, d.day, tzinfo=timezone.utc).timestamp()
+
+
+def day_of_week(d: date_cls) -> int:
+    """Postgres/JS convention: 0 = Sunday."""
+    return (d.weekday() + 1) % 7
+
+
+def is_blocking(booking: dict, now: float) -> bool:
+    """Confirmed/completed always block; pending only while its slot lock is live."""
+    status = booking.get("status")
+    if status in BLOCKING_STATUSES:
+        return True
+    if status == "pending" and booking.get("slot_lock_expires_at"):
+        return parse_ts(booking["slot_lock_expires_at"]) > now
+    return False
+
+
+def event_bounds(event: dict) -> tuple:
+    """Google Calendar event -> (start, end) strings (dateTime or all-day date)."""
+    start = event.get("start") or {}
+    end = event.get("end") or {}
+    return start.get("dateTime") or start.get("date"), end.get("dateTime") or end.get("date")
+
+
+# =============================================================================
+# Interval structures
+# =============================================================================
+
+class MergedIntervals:
+    """Disjoint, sorted busy intervals; overlap test is one binary search."""
+
+    def __init__(self, intervals):
+        self.starts, self.ends = [], []
+        for start, end in sorted(intervals):
+            if self.ends and start <= self.ends[-1]:
+                self.ends[-1] = max(self.ends[-1], end)
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+    def overlaps(self, start: float, end: float) -> bool:
+        i = bisect_right(self.ends, start)
+        return i < len(self.starts) and self.starts[i] < end
+
+
+class OverlapCounter:
+    """Counts (possibly overlapping) intervals intersecting [start, end)."""
+
+    def __init__(self, intervals):
+        intervals = list(intervals)
+        self.starts = sorted(s for s, _ in intervals)
+        self.ends = sorted(e for _, e in intervals)
+
+    def count(self, start: float, end: float) -> int:
+        # intervals with s < end, minus those that already finished (e <= start)
+        return bisect_left(self.starts, end) - bisect_right(self.ends, start)
+
+    def add(self, start: float, end: float):
+        insort(self.starts, start)
+        insort(self.ends, end)
+
+    def remove(self, start: float, end: float):
+        """Undo one add(start, end)."""
+        del self.starts[bisect_left(self.starts, start)]
+        del self.ends[bisect_left(self.ends, end)]
+
+
+# =============================================================================
+# Engine
+# =============================================================================
+
+def daterange(first: date_cls, last: date_cls):
+    d = first
+    while d <= last:
+        yield d
+        d += timedelta(days=1)
+
+
+def specialist_off_hours(hours: dict, first: date_cls, last: date_cls) -> list:
+    """Busy intervals outside a specialist's working hours ({dow: row})."""
+    busy = []
+    for d in daterange(first, last):
+        row = hours.get(day_of_week(d))
+        if row is None:
+            continue
+        base = day_start(d)
+        if not row.get("is_available", True):
+            busy.append((base, base + DAY))
+            continue
+        busy.append((base, base + parse_clock(row.get("start_time", DEFAULT_OPEN_TIME))))
+        busy.append((base + parse_clock(row.get("end_time", DEFAULT_CLOSE_TIME)), base + DAY))
+    return busy
+
+
+def compute_availability(date_from: str, date_to: str = None, bookings=(), events=(),
+                         specialists=None, services=None, clinic_hours=None,
+                         specialist_hours=None, slot_step_minutes: int = DEFAULT_SLOT_STEP_MINUTES,
+                         now: float = None) -> dict:
+    """
+    Availability for every day in [date_from, date_to] and every service.
+
+    bookings        rows with start_time, end_time, status, slot_lock_expires_at, specialist_id
+    events          Google Calendar events (block every specialist)
+    specialists     rows with id, is_active, specialties; None = single pool of
+                    capacity 1 where any blocking booking takes the slot (the
+                    original n8n behaviour)
+    services        [{"id", "duration_minutes"}]; default one 60-minute "any" service
+    clinic_hours    clinic_working_hours rows (day_of_week, is_open, open_time, close_time)
+    specialist_hours specialist_working_hours rows (specialist_id, day_of_week, ...)
+
+    Returns {"YYYY-MM-DD": {service_id or "any": [{"time", "available",
+    "available_specialists"}]}}.
+    """
+    now = time.time() if now is None else now
+    first = date_cls.fromisoformat(date_from)
+    last = date_cls.fromisoformat(date_to) if date_to else first
+    if (last - first).days >= MAX_RANGE_DAYS:
+        raise ValueError(f"Date range is limited to {MAX_RANGE_DAYS} days")
+    services = services or [{"id": None, "duration_minutes": DEFAULT_DURATION_MINUTES}]
+    hours_by_dow = {row["day_of_week"]: row for row in clinic_hours or []}
+
+    # 1. Parse everything exactly once
+    calendar_busy = []
+    for event in events or []:
+        start, end = event_bounds(event)
+        if start and end:
+            calendar_busy.append((parse_ts(start), parse_ts(end)))
+    calendar = MergedIntervals(calendar_busy)
+
+    active = None
+    if specialists is not None:
+        active = {s["id"]: s for s in specialists if s.get("is_active", True) is True}
+
+    per_specialist, unassigned = {}, []
+    for booking in bookings or []:
+        if not booking.get("start_time") or not booking.get("end_time"):
+            continue
+        if not is_blocking(booking, now):
+            continue
+        interval = (parse_ts(booking["start_time"]), parse_ts(booking["end_time"]))
+        specialist_id = booking.get("specialist_id")
+        if active is not None and specialist_id:
+            if specialist_id in active:
+                per_specialist.setdefault(specialist_id, []).append(interval)
+        else:
+            unassigned.append(interval)
+
+    hours_by_specialist = {}
+    for row in specialist_hours or []:
+        hours_by_specialist.setdefault(row["specialist_id"], {})[row["day_of_week"]] = row
+    for specialist_id, hours in hours_by_specialist.items():
+        if active is not None and specialist_id in active:
+            per_specialist.setdefault(specialist_id, []).extend(specialist_off_hours(hours, first, last))
+
+    busy = {sid: MergedIntervals(intervals) for sid, intervals in per_specialist.items()}
+    pool = OverlapCounter(unassigned)
+
+    # 2. Qualified specialists per service (same rule as the n8n specialists query)
+    qualified = {}
+    for service in services:
+        if active is None:
+            qualified[service["id"]] = None
+        elif service["id"] is None:
+            qualified[service["id"]] = list(active)
+        else:
+            qualified[service["id"]] = [
+                sid for sid, s in active.items() if service["id"] in (s.get("specialties") or [])
+            ]
+
+    # 3. Walk the slots
+    step = slot_step_minutes * 60
+    result = {}
+    for d in daterange(first, last):
+        row = hours_by_dow.get(day_of_week(d))
+        if row is not None:
+            is_open = row.get("is_open", True)
+            open_at, close_at = parse_clock(row["open_time"]), parse_clock(row["close_time"])
+        else:
+            is_open = day_of_week(d) in DEFAULT_OPEN_DAYS
+            open_at, close_at = parse_clock(DEFAULT_OPEN_TIME), parse_clock(DEFAULT_CLOSE_TIME)
+
+        base = day_start(d)
+        day_result = {}
+        for service in services:
+            key = service["id"] or "any"
+            if not is_open:
+                day_result[key] = []
+                continue
+            duration = (service.get("duration_minutes") or DEFAULT_DURATION_MINUTES) * 60
+            specialist_ids = qualified[service["id"]]
+            capacity = 1 if specialist_ids is None else len(specialist_ids)
+            slots = []
+            offset = open_at
+            while offset + duration <= close_at:
+                start = base + offset
+                end = start + duration
+                if calendar.overlaps(start, end):
+                    free = 0
+                else:
+                    taken = pool.count(start, end)
+                    if specialist_ids:
+                        taken += sum(1 for sid in specialist_ids
+                                     if sid in busy and busy[sid].overlaps(start, end))
+                    free = max(0, capacity - taken)
+                slots.append({
+                    "time": f"{offset // 3600:02d}:{offset % 3600 // 60:02d}",
+                    "available": free > 0,
+                    "available_specialists": free,
+                })
+                offset += step
+            day_result[key] = slots
+        result[d.isoformat()] = day_result
+    return result
+
+
+# =============================================================================
+# Supabase inputs (GET mode)
+# =============================================================================
+
+def config_rows(client: PostgrestClient, table: str, select: str, filters: dict, **mirror_filters) -> list:
+    """Config table rows from the local config mirror when it is fresh, else PostgREST."""
+    from config_mirror import mirrored_rows      # lazy: config_mirror imports this module
+    rows = mirrored_rows(table, **mirror_filters)
+    return rows if rows is not None else client.select(table, select, filters, cache=True)
+
+
+def fetch_inputs(client: PostgrestClient, clinic_id: str, date_from: str, date_to: str) -> dict:
+    """
+    Everything compute_availability needs for one clinic and date range.
+
+    Config tables are read from the config mirror (config_mirror.py), or from
+    the client's TTL cache when the mirror is missing or stale, so a busy
+    endpoint only pays for the bookings query on each request.
+    """
+    clinic = {"clinic_id": f"eq.{clinic_id}"}
+    specialists = config_rows(client, "specialists", "id,name,is_active,specialties", clinic,
+                              clinic_id=clinic_id)
+    specialist_ids = {s["id"] for s in specialists}
+    return {
+        "clinic_hours": config_rows(client, "clinic_working_hours",
+                                    "day_of_week,is_open,open_time,close_time", clinic, clinic_id=clinic_id),
+        "specialists": specialists,
+        "specialist_hours": [
+            row for row in config_rows(
+                client, "specialist_working_hours", "specialist_id,day_of_week,is_available,start_time,end_time",
+                {"specialist_id": f"in.({','.join(sorted(specialist_ids))})"},
+            ) if row.get("specialist_id") in specialist_ids
+        ] if specialist_ids else [],
+        "services": config_rows(client, "services", "id,duration_minutes", clinic, clinic_id=clinic_id),
+        "bookings": client.fetch_all("bookings", "id,start_time,end_time,status,slot_lock_expires_at,specialist_id", {
+            "clinic_id": f"eq.{clinic_id}",
+            "and": f"(start_time.gte.{date_from}T00:00:00,start_time.lte.{date_to}T23:59:59)",
+            "status": "in.(confirmed,completed,pending)",
+        }),
+    }
+
+
+def availability_for_clinic(client: PostgrestClient, clinic_id: str, date_from: str,
+                            date_to: str = None, service_id: str = None) -> dict:
+    date_to = date_to or date_from
+    inputs = fetch_inputs(client, clinic_id, date_from, date_to)
+    if service_id:
+        inputs["services"] = [s for s in inputs["services"] if s["id"] == service_id] or [
+            {"id": service_id, "duration_minutes": DEFAULT_DURATION_MINUTES}
+        ]
+    return compute_availability(date_from, date_to, **inputs)
+
+
+def shape_response(days: dict) -> dict:
+    """Single day + single service keeps the {"slots": [...]} contract."""
+    if len(days) == 1:
+        services = next(iter(days.values()))
+        if len(services) == 1:
+            return {"slots": next(iter(services.values()))}
+    return {"days": days}
+
+
+# =============================================================================
+# HTTP endpoint
+# =============================================================================
+
+class AvailabilityHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    client = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status: int, body: dict):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/health":
+            return self._reply(200, {"status": "ok"})
+        if url.path != "/availability":
+            return self._reply(404, {"error": "Not found"})
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if not query.get("date") or not query.get("clinic_id"):
+            return self._reply(400, {"error": "clinic_id and date (YYYY-MM-DD) are required"})
+        try:
+            days = availability_for_clinic(self.client, query["clinic_id"], query["date"],
+                                           query.get("date_to"), query.get("service_id"))
+        except ValueError as e:
+            return self._reply(400, {"error": str(e)})
+        except Exception as e:
+            return self._reply(502, {"error": "Supabase query failed", "details": str(e)})
+        self._reply(200, shape_response(days))
+
+    def do_POST(self):
+        if urlsplit(self.path).path != "/availability":
+            return self._reply(404, {"error": "Not found"})
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            days = compute_availability(
+                body["date"], body.get("date_to"), body.get("bookings", []), body.get("events", []),
+                body.get("specialists"), body.get("services"), body.get("clinic_hours"),
+                body.get("specialist_hours"),
+                body.get("slot_step_minutes", DEFAULT_SLOT_STEP_MINUTES),
+                parse_ts(body["now"]) if body.get("now") else None,
+            )
+        except (KeyError, ValueError, TypeError) as e:
+            return self._reply(400, {"error": f"Invalid request: {e}"})
+        self._reply(200, shape_response(days))
+
+
+def serve(port: int):
+    handler = type("Handler", (AvailabilityHandler,), {"client": None})
+    if os.getenv("SUPABASE_URL") or os.getenv("VITE_SUPABASE_URL"):
+        handler.client = PostgrestClient.from_env(timeout=15)
+    server = ThreadingHTTPServer(("", port), handler)
+    print(f"✅ Availability engine running at http://localhost:{port}/availability")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Slot availability engine")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    check = sub.add_parser("check", help="Print availability fetched from Supabase")
+    check.add_argument("--clinic", required=True)
+    check.add_argument("--date", required=True, help="YYYY-MM-DD")
+    check.add_argument("--to", help="Last date of the range (default: --date)")
+    check.add_argument("--service", help="Only this service ID")
+
+    srv = sub.add_parser("serve", help="Run the HTTP endpoint")
+    srv.add_argument("--port", type=int, default=int(os.getenv("AVAILABILITY_PORT", 8787)))
+    args = parser.parse_args()
+
+    load_env()
+
+    if args.command == "serve":
+        serve(args.port)
+        return
+
+    days = availability_for_clinic(PostgrestClient.from_env(timeout=15), args.clinic, args.date, args.to, args.service)
+    json.dump(shape_response(days), sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
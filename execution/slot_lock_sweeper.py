@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+"""
+Slot Lock Sweeper
+
+Purpose: Retires pending bookings that no longer hold a slot, so availability
+checks (the `Availability Logic` node, reserve_slot, slot_availability.py)
+stop wading through dead rows:
+
+    - lapsed locks: `reserve_slot` creates a pending row with
+      slot_lock_expires_at = NOW() + N minutes; nothing expired it afterwards
+    - superseded duplicates: a pending row with the same customer_email and
+      start_time as a confirmed booking (n8n created a new confirmed row
+      instead of promoting the pending one). This replaces pasting
+      platform/widget/sql/cleanup_pending_duplicates.sql into the SQL editor.
+
+Both are PATCHed to status 'expired' (already excluded by the analytics
+views), never deleted.
+
+How it works:
+    - pending rows are loaded once, then kept current incrementally from
+      bookings.updated_at (see platform/widget/sql/16_bookings_updated_at.sql)
+    - upcoming lock expiries sit in a min-heap; the daemon sleeps exactly
+      until the earliest one lapses (or the next refresh), then expires every
+      lapsed lock in batched PATCH calls (`id=in.(...)`)
+    - every PATCH re-checks `status=eq.pending` (and the lock time), so a row
+      confirmed in the meantime is never touched
+    - confirmed bookings are kept in a hash index keyed by (email, start), so
+      finding superseded pending rows is O(1) per row instead of a self-join
+    - counts of swept rows and the sweep lag (sweep time - lock expiry) are
+      written as JSON and/or Prometheus textfile metrics
+
+Usage:
+    python3 slot_lock_sweeper.py run                       # daemon (SIGINT/SIGTERM to stop)
+    python3 slot_lock_sweeper.py run --metrics-prom /var/lib/node_exporter/slot_locks.prom
+    python3 slot_lock_sweeper.py once                      # one refresh + sweep (cron)
+    python3 slot_lock_sweeper.py once --dry-run            # only report what would be swept
+
+Environment Variables Required:
+    SUPABASE_URL - Supabase project URL
+    SUPABASE_SERVICE_KEY - Service role key (bypasses RLS)
+"""
+
+import os
+import sys
+import json
+import time
+import heapq
+import signal
+import argparse
+import threading
+from datetime import datetime, timezone
+
+from env_config import load_env
+from slot_availability import parse_ts
+from postgrest_client import PostgrestClient
+
+# Configuration
+REQUEST_TIMEOUT = 30
+PATCH_BATCH_SIZE = 100            # ids per PATCH (keeps the URL short)
+LOOKUP_BATCH_SIZE = 100           # emails per confirmed-booking lookup
+REFRESH_SECONDS = 30              # pick up new / changed bookings this often
+REFRESH_OVERLAP_SECONDS = 120     # re-read the last 2 min of changes every refresh
+WAKE_SLACK_SECONDS = 0.05         # sleep this much past an expiry (clock granularity)
+EXPIRED_STATUS = "expired"
+BOOKING_COLUMNS = "id,status,customer_email,start_time,slot_lock_expires_at,updated_at"
+LAG_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+def iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat()
+
+
+def chunked(items: list, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+# =============================================================================
+# Metrics
+# =============================================================================
+
+class SweeperMetrics:
+    """Swept-row counters, sweep lag histogram and state gauges."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.counters = {"locks_expired": 0, "duplicates_expired": 0, "patch_requests": 0,
+                         "rows_loaded": 0, "refreshes": 0, "errors": 0}
+        self.lag_buckets = [0] * len(LAG_BUCKETS)
+        self.lag_sum = 0.0
+        self.lag_count = 0
+        self.lag_max = 0.0
+        self.gauges = {"pending_tracked": 0, "locks_scheduled": 0, "next_expiry_seconds": 0.0,
+                       "last_sweep_timestamp": 0.0}
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] += n
+
+    def observe_lag(self, seconds: float):
+        seconds = max(0.0, seconds)
+        self.lag_sum += seconds
+        self.lag_count += 1
+        self.lag_max = max(self.lag_max, seconds)
+        for i, bound in enumerate(LAG_BUCKETS):
+            if seconds <= bound:
+                self.lag_buckets[i] += 1
+
+    def summary(self) -> dict:
+        return {
+            "started_at": iso(self.started),
+            "uptime_seconds": round(time.time() - self.started, 3),
+            "counters": dict(self.counters),
+            "gauges": {k: round(v, 3) for k, v in self.gauges.items()},
+            "sweep_lag_seconds": {
+                "count": self.lag_count,
+                "avg": round(self.lag_sum / self.lag_count, 3) if self.lag_count else 0.0,
+                "max": round(self.lag_max, 3),
+                "buckets": dict(zip(map(str, LAG_BUCKETS), self.lag_buckets)),
+            },
+        }
+
+    def prometheus(self) -> str:
+        """Render in node_exporter textfile-collector format."""
+        lines = [
+            "# HELP slot_sweeper_rows_total Pending bookings set to expired, by reason.",
+            "# TYPE slot_sweeper_rows_total counter",
+            f'slot_sweeper_rows_total{{reason="lock_expired"}} {self.counters["locks_expired"]}',
+            f'slot_sweeper_rows_total{{reason="superseded"}} {self.counters["duplicates_expired"]}',
+            "# HELP slot_sweeper_lag_seconds Time between a lock lapsing and the sweep that expired it.",
+            "# TYPE slot_sweeper_lag_seconds histogram",
+        ]
+        for bound, n in zip(LAG_BUCKETS, self.lag_buckets):
+            lines.append(f'slot_sweeper_lag_seconds_bucket{{le="{bound}"}} {n}')
+        lines += [
+            f'slot_sweeper_lag_seconds_bucket{{le="+Inf"}} {self.lag_count}',
+            f"slot_sweeper_lag_seconds_sum {self.lag_sum:.3f}",
+            f"slot_sweeper_lag_seconds_count {self.lag_count}",
+        ]
+        for name in ("patch_requests", "rows_loaded", "refreshes", "errors"):
+            lines += [f"# TYPE slot_sweeper_{name}_total counter",
+                      f"slot_sweeper_{name}_total {self.counters[name]}"]
+        for name, value in self.gauges.items():
+            lines += [f"# TYPE slot_sweeper_{name} gauge", f"slot_sweeper_{name} {value:.3f}"]
+        return "\n".join(lines) + "\n"
+
+    def write(self, json_path: str = None, prom_path: str = None):
+        """Files are replaced atomically for the collector."""
+        for path, render in ((json_path, lambda: json.dumps(self.summary(), indent=2)),
+                             (prom_path, self.prometheus)):
+            if not path:
+                continue
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write(render())
+            os.replace(tmp_path, path)
+
+
+# =============================================================================
+# Sweeper
+# =============================================================================
+
+class SlotLockSweeper:
+    """In-memory view of pending bookings: expiry heap + (email, start) hash index."""
+
+    def __init__(self, client: PostgrestClient, dry_run: bool = False, clock=time.time):
+        self.client = client
+        self.dry_run = dry_run
+        self.clock = clock
+        self.metrics = SweeperMetrics()
+        self.pending = {}          # id -> (lock_expires_ts or None, (email, start_ts))
+        self.heap = []             # (lock_expires_ts, id); stale entries skipped on pop
+        self.confirmed = set()     # (email, start_ts) of confirmed bookings
+        self.by_key = {}           # (email, start_ts) -> {pending ids}
+        self.looked_up = set()     # emails whose confirmed bookings are in self.confirmed
+        self.superseded = set()    # pending ids waiting to be expired as duplicates
+        self.hwm = None            # newest updated_at seen
+
+    # -------------------------------------------------------------------------
+    # Loading
+    # -------------------------------------------------------------------------
+
+    @staticmethod
+    def key(row: dict) -> tuple:
+        return (row.get("customer_email") or "", parse_ts(row.get("start_time")))
+
+    def apply(self, row: dict):
+        """Fold one booking row (any status) into the in-memory state."""
+        booking_id = row["id"]
+        self._forget(booking_id)
+        key = self.key(row)
+        if row.get("status") == "confirmed":
+            if key[0] and key[1] is not None and key not in self.confirmed:
+                self.confirmed.add(key)
+                self.superseded |= self.by_key.get(key, set())
+        elif row.get("status") == "pending":
+            expires = parse_ts(row.get("slot_lock_expires_at"))
+            self.pending[booking_id] = (expires, key)
+            self.by_key.setdefault(key, set()).add(booking_id)
+            if expires is not None:
+                heapq.heappush(self.heap, (expires, booking_id))
+            if key in self.confirmed:
+                self.superseded.add(booking_id)
+        updated = row.get("updated_at")
+        if updated and (self.hwm is None or parse_ts(updated) > parse_ts(self.hwm)):
+            self.hwm = updated
+
+    def _forget(self, booking_id):
+        entry = self.pending.pop(booking_id, None)
+        if entry:
+            ids = self.by_key.get(entry[1])
+            if ids:
+                ids.discard(booking_id)
+                if not ids:
+                    del self.by_key[entry[1]]
+            self.superseded.discard(booking_id)
+
+    def load(self) -> int:
+        """Initial load: every pending row, plus the confirmed bookings of their emails."""
+        loaded = 0
+        for row in self.client.stream("bookings", BOOKING_COLUMNS, {"status": "eq.pending"}):
+            self.apply(row)
+            loaded += 1
+        loaded += self._lookup_confirmed()
+        self.metrics.count("rows_loaded", loaded)
+        self._update_gauges()
+        return loaded
+
+    def refresh(self) -> int:
+        """Apply bookings changed since the high-water mark (any status)."""
+        if self.hwm is None:
+            return self.load()
+        since = iso(parse_ts(self.hwm) - REFRESH_OVERLAP_SECONDS)
+        loaded = 0
+        for row in self.client.stream("bookings", BOOKING_COLUMNS, {"updated_at": f"gte.{since}"},
+                                      order_column="updated_at"):
+            self.apply(row)
+            loaded += 1
+        loaded += self._lookup_confirmed()
+        self.metrics.count("rows_loaded", loaded)
+        self.metrics.count("refreshes")
+        self._update_gauges()
+        return loaded
+
+    def _lookup_confirmed(self) -> int:
+        """Confirmed bookings for pending emails not seen yet (older than the high-water mark)."""
+        emails = sorted({key[0] for _, key in self.pending.values() if key[0]} - self.looked_up)
+        loaded = 0
+        for batch in chunked(emails, LOOKUP_BATCH_SIZE):
+            quoted = ",".join('"' + e.replace('"', '\\"') + '"' for e in batch)
+            for row in self.client.stream("bookings", BOOKING_COLUMNS,
+                                          {"status": "eq.confirmed", "customer_email": f"in.({quoted})"}):
+                self.apply(row)
+                loaded += 1
+            self.looked_up.update(batch)
+        return loaded
+
+    # -------------------------------------------------------------------------
+    # Sweeping
+    # -------------------------------------------------------------------------
+
+    def next_expiry(self) -> float:
+        """Earliest live lock expiry (None if no locks are scheduled)."""
+        while self.heap:
+            expires, booking_id = self.heap[0]
+            entry = self.pending.get(booking_id)
+            if entry and entry[0] == expires:
+                return expires
+            heapq.heappop(self.heap)            # confirmed, cancelled or re-locked since
+        return None
+
+    def due_locks(self, now: float) -> list:
+        """Pop every lock that has lapsed by `now`: [(id, expires_ts)]."""
+        due = []
+        while True:
+            expires = self.next_expiry()
+            if expires is None or expires > now:
+                return due
+            _, booking_id = heapq.heappop(self.heap)
+            due.append((booking_id, expires))
+
+    def _patch(self, ids: list, filters: dict) -> list:
+        """Expire `ids` (still pending) in batches; returns the ids actually changed."""
+        changed = []
+        for batch in chunked(ids, PATCH_BATCH_SIZE):
+            params = {"id": "in.(" + ",".join(str(i) for i in batch) + ")", "status": "eq.pending",
+                      "select": "id"}
+            params.update(filters)
+            self.metrics.count("patch_requests")
+            rows = self.client.update("bookings", params, {"status": EXPIRED_STATUS}, returning=True)
+            changed.extend(row["id"] for row in rows)
+        return changed
+
+    def sweep(self) -> dict:
+        """Expire lapsed locks and superseded duplicates once; returns what was swept."""
+        now = self.clock()
+        due = self.due_locks(now)
+        duplicates = sorted(self.superseded - {booking_id for booking_id, _ in due})
+        result = {"locks": 0, "duplicates": 0, "dry_run": self.dry_run,
+                  "lock_ids": [b for b, _ in due], "duplicate_ids": duplicates}
+        if self.dry_run:
+            result["locks"], result["duplicates"] = len(due), len(duplicates)
+            for booking_id, _ in due:
+                self._forget(booking_id)
+            self.superseded.clear()
+            return result
+
+        if due:
+            expiries = dict(due)
+            try:
+                changed = self._patch(list(expiries), {"slot_lock_expires_at": f"lte.{iso(now)}"})
+            except Exception:
+                for booking_id, expires in due:
+                    heapq.heappush(self.heap, (expires, booking_id))   # retried on the next sweep
+                raise
+            swept_at = self.clock()
+            for booking_id in changed:
+                self.metrics.observe_lag(swept_at - expiries[booking_id])
+            for booking_id in expiries:
+                self._forget(booking_id)        # changed, or no longer pending anyway
+            result["locks"] = len(changed)
+            self.metrics.count("locks_expired", len(changed))
+        if duplicates:
+            changed = self._patch(duplicates, {})
+            for booking_id in duplicates:
+                self._forget(booking_id)
+            result["duplicates"] = len(changed)
+            self.metrics.count("duplicates_expired", len(changed))
+        if due or duplicates:
+            self.metrics.gauges["last_sweep_timestamp"] = now
+        self._update_gauges()
+        return result
+
+    def _update_gauges(self):
+        expiry = self.next_expiry()
+        self.metrics.gauges["pending_tracked"] = len(self.pending)
+        self.metrics.gauges["locks_scheduled"] = len(self.heap)
+        self.metrics.gauges["next_expiry_seconds"] = max(0.0, expiry - self.clock()) if expiry else 0.0
+
+
+# =============================================================================
+# Daemon
+# =============================================================================
+
+def report(result: dict):
+    if result["locks"] or result["duplicates"]:
+        verb = "Would expire" if result["dry_run"] else "Expired"
+        print(f"🧹 {verb} {result['locks']} lapsed lock(s), {result['duplicates']} superseded duplicate(s)")
+
+
+def run_daemon(sweeper: SlotLockSweeper, refresh_seconds: float = REFRESH_SECONDS,
+               metrics_json: str = None, metrics_prom: str = None):
+    """Sleep until the next lock lapses or the next refresh is due; SIGINT/SIGTERM stops."""
+    stop = threading.Event()
+
+    def request_stop(signum, frame):
+        print(f"\n🛑 Received signal {signum}, exiting...")
+        stop.set()
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    loaded = sweeper.load()
+    print(f"👀 Tracking {len(sweeper.pending)} pending booking(s) ({loaded} rows loaded), "
+          f"refresh every {refresh_seconds}s")
+    next_refresh = time.monotonic() + refresh_seconds
+    while not stop.is_set():
+        failed = False
+        try:
+            if time.monotonic() >= next_refresh:
+                sweeper.refresh()
+                next_refresh = time.monotonic() + refresh_seconds
+            report(sweeper.sweep())
+        except (ConnectionError, TimeoutError, OSError, ValueError) as e:
+            sweeper.metrics.count("errors")
+            failed = True
+            print(f"⚠️  {type(e).__name__}: {e} (retrying at next refresh)")
+            next_refresh = time.monotonic() + refresh_seconds
+        sweeper.metrics.write(metrics_json, metrics_prom)
+
+        wait = next_refresh - time.monotonic()
+        expiry = sweeper.next_expiry()
+        if expiry is not None and not failed:   # lapsed locks put back after an error wait for the retry
+            wait = min(wait, expiry - sweeper.clock() + WAKE_SLACK_SECONDS)
+        stop.wait(max(0.0, wait))
+    summary = sweeper.metrics.summary()
+    print(f"📊 Sweeper stopped: {summary['counters']['locks_expired']} lock(s), "
+          f"{summary['counters']['duplicates_expired']} duplicate(s) expired, "
+          f"max lag {summary['sweep_lag_seconds']['max']}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Expire lapsed slot locks and superseded pending duplicates")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (("run", "Run as a daemon"), ("once", "Load, sweep once and exit")):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("--dry-run", action="store_true", help="Report what would be expired")
+        p.add_argument("--metrics-json", metavar="PATH", help="Write counters / lag as JSON")
+        p.add_argument("--metrics-prom", metavar="PATH", help="Write Prometheus textfile metrics (*.prom)")
+        if name == "run":
+            p.add_argument("--refresh", type=float, default=REFRESH_SECONDS,
+                           help=f"Seconds between incremental loads (default: {REFRESH_SECONDS})")
+    args = parser.parse_args()
+
+    load_env()
+
+    try:
+        client = PostgrestClient.from_env(timeout=REQUEST_TIMEOUT)
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+    sweeper = SlotLockSweeper(client, dry_run=args.dry_run)
+
+    if args.command == "run":
+        run_daemon(sweeper, args.refresh, args.metrics_json, args.metrics_prom)
+        return
+
+    try:
+        loaded = sweeper.load()
+        result = sweeper.sweep()
+    except (ConnectionError, TimeoutError, OSError, ValueError) as e:
+        print(f"❌ {type(e).__name__}: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        sweeper.metrics.write(args.metrics_json, args.metrics_prom)
+    print(f"✅ {loaded} row(s) loaded, {len(sweeper.pending)} pending still locked")
+    report(result)
+    if args.dry_run:
+        print(json.dumps({"lock_ids": result["lock_ids"], "duplicate_ids": result["duplicate_ids"]},
+                         indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
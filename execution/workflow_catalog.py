@@ -0,0 +1,633 @@
+#!/usr/bin/env python3
+"""
+Workflow Catalog
+
+Purpose: Answers questions about the n8n exports without opening 5-45 KB JSON
+blobs by hand ("which nodes fetch bookings with returnAll and no time
+bound?", "which Code nodes hardcode CLINIC_ADDRESS?") and lints them for
+queries whose cost grows with the tables behind them.
+
+How it works:
+    - every workflow file is parsed once into an SQLite catalog: nodes,
+      types, operations, Supabase tables and filter strings, Postgres
+      queries, credentials and the identifiers used in jsCode
+    - each file is re-parsed only when its mtime or size changed; deleted
+      files drop out of the catalog
+    - the fetch "bound" of every read is classified from its filter:
+        key     - filtered on a unique key (id, *_session_id)
+        window  - lower and upper bound on a time column
+        open    - one-sided time bound (grows with the table)
+        none    - no usable filter (full table)
+        limit   - returnAll off, capped by `limit`
+    - Code nodes are scanned for nested loops over fetched arrays
+      (O(n*m)), and for many separate passes over the same fetched array
+    - `cost` estimates rows pulled per run from supplied table sizes and ranks
+      workflows by it
+
+Lint rules:
+    unbounded-fetch     returnAll over a table with no filter          (warning)
+    open-ended-fetch    returnAll with a one-sided time bound          (warning)
+    truncated-fetch     getAll without returnAll or limit: n8n stops
+                        at 50 rows (missing pagination)                (warning)
+    unbounded-query     Postgres SELECT with no LIMIT and no bound     (warning)
+    filter-ignored      filter set but no operation: the node default
+                        (create) ignores it                            (warning)
+    nested-scan         loop over a fetched array inside a loop over
+                        another one                                    (warning)
+    repeated-scan       >= 4 separate passes over one fetched array    (info)
+
+Usage:
+    python3 workflow_catalog.py index                              # refresh catalog
+    python3 workflow_catalog.py nodes --table bookings --return-all --bound open,none
+    python3 workflow_catalog.py nodes --ident CLINIC_ADDRESS --type code
+    python3 workflow_catalog.py lint
+    python3 workflow_catalog.py lint --strict                      # exit 1 on warnings (CI)
+    python3 workflow_catalog.py cost --size bookings=50000 --size booking_events=400000
+    python3 workflow_catalog.py cost --sizes table_sizes.json --history-days 730
+
+Environment Variables:
+    WORKFLOW_CATALOG - SQLite catalog path (default: workflows/.catalog.sqlite)
+"""
+
+import os
+import re
+import sys
+import glob
+import json
+import time
+import sqlite3
+import argparse
+
+# Configuration
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # Workspace root
+CATALOG_FILE = os.getenv("WORKFLOW_CATALOG", os.path.join(BASE_DIR, "workflows", ".catalog.sqlite"))
+DEFAULT_ROOTS = ("workflows", "clients/*/workflows")
+DEFAULT_TABLE_ROWS = 10000          # used when no size is given for a table
+DEFAULT_HISTORY_DAYS = 365          # how many days of data the tables hold
+N8N_DEFAULT_LIMIT = 50              # Supabase getAll without returnAll
+REPEATED_SCAN_MIN = 4
+CATALOG_VERSION = 1                 # bump to force a full re-parse
+
+READ_OPERATIONS = {"get", "getAll", "executeQuery", "select"}
+TIME_COLUMN = re.compile(r"(_at|_time|_date|^date|^day)$")
+FILTER_TERM = re.compile(r"\b([a-z_][a-z0-9_]*)(?:\.|=)(eq|neq|gt|gte|lt|lte|in|cs|cd|like|ilike|is)\.")
+SQL_TERM = re.compile(r"\b([a-z_][a-z0-9_]*)\s*(>=|<=|<>|!=|=|>|<|\bbetween\b|\bin\b)", re.I)
+WINDOW_HINTS = (("hour", 1 / 24), ("minute", 1 / 24), ("tomorrow", 1), ("today", 1), ("t23:59", 1),
+                ("week", 7), ("month", 31), ("year", 365))
+
+JS_KEYWORDS = set("""
+    break case catch class const continue debugger default delete do else export extends false
+    finally for function if import in instanceof let new null of return super switch this throw
+    true try typeof undefined var void while with yield async await
+""".split())
+SCAN_METHODS = "forEach|map|filter|reduce|some|every|find|findIndex|flatMap|includes|indexOf"
+LOOP_METHODS = "forEach|map|filter|reduce|some|every|find|findIndex|flatMap"
+
+
+# =============================================================================
+# Filter / query analysis
+# =============================================================================
+
+def key_column(column: str) -> bool:
+    return column == "id" or column.endswith("session_id")
+
+
+def window_days(*texts) -> float:
+    """Guess how many days a windowed fetch covers from its filter / node name."""
+    text = " ".join(t for t in texts if t).lower()
+    for hint, days in WINDOW_HINTS:
+        if hint in text:
+            return days
+    return 1
+
+
+def classify_terms(terms: list) -> str:
+    """[(column, op)] -> key / window / open / none."""
+    lower = {c for c, op in terms if TIME_COLUMN.search(c) and op in ("gt", "gte", ">", ">=", "between")}
+    upper = {c for c, op in terms if TIME_COLUMN.search(c) and op in ("lt", "lte", "<", "<=", "between")}
+    if any(key_column(c) and op in ("eq", "=") for c, op in terms):
+        return "key"
+    if lower & upper:
+        return "window"
+    if lower or upper:
+        return "open"
+    return "none"
+
+
+def filter_text(params: dict) -> str:
+    """Supabase node filter as one string (string filters and UI conditions)."""
+    text = params.get("filterString") or ""
+    conditions = (params.get("filters") or {}).get("conditions") or []
+    text += ",".join(f"{c.get('keyName')}.{c.get('condition', 'eq')}.{c.get('keyValue', '')}"
+                     for c in conditions if isinstance(c, dict))
+    return text
+
+
+def analyze_supabase(name: str, params: dict) -> dict:
+    operation = params.get("operation") or ""
+    text = filter_text(params)
+    terms = [(c, op) for c, op in FILTER_TERM.findall(text)]
+    return_all = bool(params.get("returnAll"))
+    limit = params.get("limit")
+    if operation in ("get", "getAll") and not return_all:
+        bound = "key" if classify_terms(terms) == "key" else "limit"
+        limit = limit or N8N_DEFAULT_LIMIT
+    elif operation in READ_OPERATIONS:
+        bound = classify_terms(terms)
+    else:
+        bound = "key" if classify_terms(terms) == "key" else None
+    return {
+        "operation": operation, "table": params.get("tableId") or "", "filter": text,
+        "return_all": return_all, "limit": limit, "bound": bound,
+        "window_days": window_days(text, name) if bound == "window" else None,
+    }
+
+
+def analyze_postgres(name: str, params: dict) -> dict:
+    operation = params.get("operation") or ""
+    query = params.get("query") or ""
+    table = params.get("table") or ""
+    bound, limit = None, None
+    if operation == "executeQuery" and re.match(r"\s*(with|select)\b", query, re.I):
+        operation = "select"
+        match = re.search(r"\bfrom\s+([\w.\"]+)", query, re.I)
+        table = match.group(1).strip('"').split(".")[-1] if match else ""
+        where = re.split(r"\bwhere\b", query, maxsplit=1, flags=re.I)
+        terms = [(c.lower(), op.lower()) for c, op in SQL_TERM.findall(where[1])] if len(where) > 1 else []
+        limit_match = re.search(r"\blimit\s+(\d+)", query, re.I)
+        limit = int(limit_match.group(1)) if limit_match else None
+        bound = classify_terms(terms)
+        if bound not in ("key", "window") and limit:
+            bound = "limit"
+    if isinstance(table, dict):
+        table = table.get("value", "")
+    return {
+        "operation": operation, "table": table, "filter": query, "return_all": False,
+        "limit": limit, "bound": bound,
+        "window_days": window_days(query, name) if bound == "window" else None,
+    }
+
+
+# =============================================================================
+# jsCode analysis
+# =============================================================================
+
+def mask_js(code: str) -> str:
+    """Blank out comments and string / template literal contents (same length)."""
+    out, i, n = list(code), 0, len(code)
+    while i < n:
+        ch = code[i]
+        if code.startswith("//", i):
+            end = code.find("\n", i)
+            end = n if end < 0 else end
+        elif code.startswith("/*", i):
+            end = code.find("*/", i + 2)
+            end = n if end < 0 else end + 2
+        elif ch in "'\"`":
+            end = i + 1
+            while end < n and code[end] != ch:
+                end += 2 if code[end] == "\\" else 1
+            for j in range(i + 1, min(end, n)):
+                out[j] = " " if code[j] != "\n" else "\n"
+            i = end + 1
+            continue
+        else:
+            i += 1
+            continue
+        for j in range(i, end):
+            out[j] = " " if code[j] != "\n" else "\n"
+        i = end
+    return "".join(out)
+
+
+def matching(code: str, start: int) -> int:
+    """Index just past the bracket that closes code[start] ('(' / '{' / '[')."""
+    pairs = {"(": ")", "{": "}", "[": "]"}
+    depth, opener, closer = 0, code[start], pairs[code[start]]
+    for i in range(start, len(code)):
+        if code[i] == opener:
+            depth += 1
+        elif code[i] == closer:
+            depth -= 1
+            if depth == 0:
+                return i + 1
+    return len(code)
+
+
+def fetched_arrays(masked: str, raw: str) -> set:
+    """Variables holding items of another node ($('X').all(), $input.all()) or derived from them."""
+    fetched = set()
+    assignments = [(m.group(1), raw[m.end():masked.find(";", m.end()) if masked.find(";", m.end()) > 0 else None])
+                   for m in re.finditer(r"(?:\b(?:const|let|var)\s+)?\b([A-Za-z_$][\w$]*)\s*=(?![=>])", masked)]
+    for name, rhs in assignments:
+        if re.search(r"\$\([^)]*\)\s*\.all\(|\$input\s*\.all\(|\$items\(", rhs or ""):
+            fetched.add(name)
+    changed = True
+    while changed:
+        changed = False
+        for name, rhs in assignments:
+            head = (rhs or "").lstrip()
+            if name not in fetched and any(re.match(rf"(\[\s*\.\.\.)?{re.escape(f)}\b\s*[.\]]", head)
+                                           for f in fetched):
+                fetched.add(name)
+                changed = True
+    return fetched
+
+
+def loops_over(masked: str, names: set) -> list:
+    """[(array, body_start, body_end)] for every loop / callback pass over one of `names`."""
+    loops = []
+    for m in re.finditer(r"\bfor\s*\(", masked):
+        header_end = matching(masked, m.end() - 1)
+        of = re.search(r"\b(?:of|in)\s+([A-Za-z_$][\w$]*)\s*\)$", masked[m.end():header_end])
+        if not of or of.group(1) not in names:
+            continue
+        body = header_end
+        while body < len(masked) and masked[body].isspace():
+            body += 1
+        end = matching(masked, body) if masked[body:body + 1] == "{" else masked.find(";", body) + 1
+        loops.append((of.group(1), body, end or len(masked)))
+    for m in re.finditer(rf"\b([A-Za-z_$][\w$]*)\s*\.\s*(?:{LOOP_METHODS})\s*\(", masked):
+        if m.group(1) in names:
+            loops.append((m.group(1), m.end() - 1, matching(masked, m.end() - 1)))
+    return loops
+
+
+def analyze_code(code: str) -> dict:
+    """Identifiers, referenced nodes and scan findings for one Code node."""
+    masked = mask_js(code)
+    identifiers = {w for w in re.findall(r"[A-Za-z_$][\w$]*", masked) if w not in JS_KEYWORDS}
+    references = sorted(set(re.findall(r"\$\(\s*['\"]([^'\"]+)['\"]\s*\)", code)))
+    fetched = fetched_arrays(masked, code)
+    findings = []
+
+    loops = loops_over(masked, fetched)
+    seen = set()
+    for outer, start, end in loops:
+        for inner, inner_start, _ in loops:
+            if start < inner_start < end and (outer, inner) not in seen:
+                seen.add((outer, inner))
+                line = code.count("\n", 0, inner_start) + 1
+                findings.append(("nested-scan", "warning",
+                                 f"pass over `{inner}` inside a loop over `{outer}` (line {line}): "
+                                 f"O(n*m); build a Map/Set of `{inner}` once"))
+        for m in re.finditer(r"\b([A-Za-z_$][\w$]*)\s*\.\s*(?:includes|indexOf)\s*\(", masked[start:end]):
+            if m.group(1) in fetched and (outer, m.group(1)) not in seen:
+                seen.add((outer, m.group(1)))
+                line = code.count("\n", 0, start + m.start()) + 1
+                findings.append(("nested-scan", "warning",
+                                 f"`{m.group(1)}.{m.group(0).split('.')[-1].split('(')[0].strip()}` inside "
+                                 f"a loop over `{outer}` (line {line}): O(n*m); use a Set"))
+
+    passes = {}
+    for m in re.finditer(rf"\b([A-Za-z_$][\w$]*)\s*\.\s*(?:{SCAN_METHODS})\s*\(", masked):
+        if m.group(1) in fetched:
+            passes[m.group(1)] = passes.get(m.group(1), 0) + 1
+    for m in re.finditer(r"\bfor\s*\([^)]*\bof\s+([A-Za-z_$][\w$]*)\s*\)", masked):
+        if m.group(1) in fetched:
+            passes[m.group(1)] = passes.get(m.group(1), 0) + 1
+    for name, count in sorted(passes.items()):
+        if count >= REPEATED_SCAN_MIN:
+            findings.append(("repeated-scan", "info",
+                             f"{count} separate passes over `{name}`; one loop can compute them together"))
+
+    return {"identifiers": identifiers, "references": references, "findings": findings}
+
+
+# =============================================================================
+# Catalog
+# =============================================================================
+
+def workflow_files(roots=DEFAULT_ROOTS) -> list:
+    files = []
+    for root in roots:
+        root = root if os.path.isabs(root) else os.path.join(BASE_DIR, root)
+        for directory in sorted(glob.glob(root)):
+            if os.path.isdir(directory):
+                files.extend(sorted(glob.glob(os.path.join(directory, "*.json"))))
+            elif directory.endswith(".json"):
+                files.append(directory)
+    return files
+
+
+def parse_workflow(path: str) -> dict:
+    """One workflow file -> rows for the nodes / identifiers / findings tables."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    nodes, identifiers, findings = [], [], []
+    for node in data.get("nodes", []):
+        name = node.get("name", "")
+        node_type = node.get("type", "").replace("n8n-nodes-base.", "")
+        params = node.get("parameters") or {}
+        credentials = ",".join(f"{kind}:{(value or {}).get('name', '')}"
+                               for kind, value in sorted((node.get("credentials") or {}).items()))
+        info = {"operation": params.get("operation") or "", "table": "", "filter": "", "return_all": False,
+                "limit": None, "bound": None, "window_days": None}
+        if node_type == "supabase":
+            info = analyze_supabase(name, params)
+            if not params.get("operation") and params.get("filterString"):
+                findings.append((name, "filter-ignored", "warning",
+                                 f"filterString on `{info['table']}` but no operation; the node default "
+                                 f"(create) ignores it - set operation explicitly"))
+        elif node_type == "postgres":
+            info = analyze_postgres(name, params)
+        elif node_type == "httpRequest":
+            info["operation"] = params.get("method", "GET")
+            info["filter"] = params.get("url", "")
+
+        code = params.get("jsCode") or params.get("functionCode") or ""
+        code_info = analyze_code(code) if code else None
+        if code_info:
+            identifiers.extend((name, ident) for ident in sorted(code_info["identifiers"]))
+            identifiers.extend((name, f"$('{ref}')") for ref in code_info["references"])
+            findings.extend((name,) + f for f in code_info["findings"])
+
+        bound, table = info["bound"], info["table"]
+        if node_type == "supabase" and info["return_all"] and bound == "none":
+            findings.append((name, "unbounded-fetch", "warning",
+                             f"returnAll over `{table}` with no filter: pulls the whole table every run"))
+        elif node_type == "supabase" and info["return_all"] and bound == "open":
+            findings.append((name, "open-ended-fetch", "warning",
+                             f"returnAll over `{table}` with a one-sided time bound: grows with the table"))
+        elif node_type == "supabase" and bound == "limit" and not params.get("limit"):
+            findings.append((name, "truncated-fetch", "warning",
+                             f"getAll on `{table}` without returnAll or limit: n8n stops at "
+                             f"{N8N_DEFAULT_LIMIT} rows and never pages"))
+        elif node_type == "postgres" and info["operation"] == "select" and bound in ("none", "open"):
+            findings.append((name, "unbounded-query", "warning",
+                             f"SELECT from `{table}` with no LIMIT and no {'upper/lower ' if bound == 'open' else ''}"
+                             f"time bound"))
+
+        nodes.append((name, node_type, info["operation"], table, info["filter"], int(info["return_all"]),
+                      info["limit"], bound, info["window_days"], credentials, len(code)))
+    return {"name": data.get("name") or os.path.basename(path), "nodes": nodes,
+            "identifiers": identifiers, "findings": findings}
+
+
+class WorkflowCatalog:
+    """SQLite catalog of workflow nodes, refreshed per file by mtime / size."""
+
+    def __init__(self, path: str = CATALOG_FILE, roots=DEFAULT_ROOTS):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.roots = roots
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        if self.db.execute("PRAGMA user_version").fetchone()[0] != CATALOG_VERSION:
+            self.db.executescript("""
+                DROP TABLE IF EXISTS files; DROP TABLE IF EXISTS nodes;
+                DROP TABLE IF EXISTS identifiers; DROP TABLE IF EXISTS findings;
+            """)
+            self.db.execute(f"PRAGMA user_version = {CATALOG_VERSION}")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY, workflow TEXT, mtime_ns INTEGER, size INTEGER, indexed_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS nodes (
+                path TEXT, name TEXT, type TEXT, operation TEXT, table_name TEXT, filter TEXT,
+                return_all INTEGER, row_limit INTEGER, bound TEXT, window_days REAL,
+                credentials TEXT, code_len INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS identifiers (path TEXT, node TEXT, ident TEXT);
+            CREATE TABLE IF NOT EXISTS findings (path TEXT, node TEXT, rule TEXT, severity TEXT, message TEXT);
+            CREATE INDEX IF NOT EXISTS nodes_path ON nodes (path);
+            CREATE INDEX IF NOT EXISTS nodes_table ON nodes (table_name);
+            CREATE INDEX IF NOT EXISTS identifiers_ident ON identifiers (ident);
+            CREATE INDEX IF NOT EXISTS identifiers_path ON identifiers (path);
+            CREATE INDEX IF NOT EXISTS findings_path ON findings (path);
+        """)
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+    def refresh(self, force: bool = False) -> dict:
+        """Re-parse new / changed files, drop deleted ones."""
+        started = time.perf_counter()
+        stats = {"files": 0, "parsed": 0, "removed": 0, "errors": 0}
+        known = {row["path"]: (row["mtime_ns"], row["size"])
+                 for row in self.db.execute("SELECT path, mtime_ns, size FROM files")}
+        current = set()
+        for path in workflow_files(self.roots):
+            rel = os.path.relpath(path, BASE_DIR)
+            current.add(rel)
+            stats["files"] += 1
+            st = os.stat(path)
+            if not force and known.get(rel) == (st.st_mtime_ns, st.st_size):
+                continue
+            try:
+                parsed = parse_workflow(path)
+            except (OSError, ValueError) as e:
+                print(f"⚠️  {rel}: {e}")
+                stats["errors"] += 1
+                continue
+            self._drop(rel)
+            self.db.execute("INSERT INTO files VALUES (?, ?, ?, ?, ?)",
+                            (rel, parsed["name"], st.st_mtime_ns, st.st_size, time.time()))
+            self.db.executemany("INSERT INTO nodes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                [(rel,) + row for row in parsed["nodes"]])
+            self.db.executemany("INSERT INTO identifiers VALUES (?, ?, ?)",
+                                [(rel,) + row for row in parsed["identifiers"]])
+            self.db.executemany("INSERT INTO findings VALUES (?, ?, ?, ?, ?)",
+                                [(rel,) + row for row in parsed["findings"]])
+            stats["parsed"] += 1
+        for rel in set(known) - current:
+            self._drop(rel)
+            stats["removed"] += 1
+        self.db.commit()
+        stats["ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return stats
+
+    def _drop(self, rel: str):
+        for table in ("files", "nodes", "identifiers", "findings"):
+            self.db.execute(f"DELETE FROM {table} WHERE path = ?", (rel,))
+
+    def nodes(self, node_type=None, table=None, operation=None, return_all=None, bound=None,
+              credential=None, ident=None, name=None, path=None) -> list:
+        """Nodes matching every given filter (bound may be a list)."""
+        clauses, params = [], []
+        for column, value in (("n.type", node_type), ("n.table_name", table), ("n.operation", operation)):
+            if value:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if return_all is not None:
+            clauses.append("n.return_all = ?")
+            params.append(int(return_all))
+        if bound:
+            bounds = [bound] if isinstance(bound, str) else list(bound)
+            clauses.append(f"n.bound IN ({','.join('?' * len(bounds))})")
+            params.extend(bounds)
+        if credential:
+            clauses.append("n.credentials LIKE ?")
+            params.append(f"%{credential}%")
+        if name:
+            clauses.append("n.name LIKE ?")
+            params.append(f"%{name}%")
+        if path:
+            clauses.append("n.path LIKE ?")
+            params.append(f"%{path}%")
+        if ident:
+            clauses.append("EXISTS (SELECT 1 FROM identifiers i WHERE i.path = n.path AND i.node = n.name "
+                           "AND i.ident = ?)")
+            params.append(ident)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return [dict(row) for row in self.db.execute(
+            f"SELECT n.* FROM nodes n {where} ORDER BY n.path, n.name", params)]
+
+    def findings(self, rule=None, severity=None) -> list:
+        clauses, params = [], []
+        if rule:
+            clauses.append("rule = ?")
+            params.append(rule)
+        if severity:
+            clauses.append("severity = ?")
+            params.append(severity)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return [dict(row) for row in self.db.execute(
+            f"SELECT * FROM findings {where} ORDER BY path, node, rule", params)]
+
+    def estimate(self, sizes: dict, history_days: float = DEFAULT_HISTORY_DAYS) -> list:
+        """Estimated rows pulled per run, per workflow, most expensive first."""
+        by_path = {}
+        for row in self.db.execute("SELECT n.*, f.workflow FROM nodes n JOIN files f ON f.path = n.path "
+                                   "WHERE n.bound IS NOT NULL AND n.operation IN (?, ?, ?, ?)",
+                                   sorted(READ_OPERATIONS)):
+            size = sizes.get(row["table_name"], DEFAULT_TABLE_ROWS)
+            if row["bound"] == "key":
+                rows = 1
+            elif row["bound"] == "limit":
+                rows = min(row["row_limit"] or N8N_DEFAULT_LIMIT, size)
+            elif row["bound"] == "window":
+                rows = size * min(1.0, (row["window_days"] or 1) / history_days)
+            else:
+                rows = size
+            entry = by_path.setdefault(row["path"], {"path": row["path"], "workflow": row["workflow"],
+                                                     "rows": 0, "fetches": []})
+            entry["rows"] += rows
+            entry["fetches"].append({"node": row["name"], "table": row["table_name"], "bound": row["bound"],
+                                     "rows": round(rows), "assumed_size": row["table_name"] not in sizes})
+        for entry in by_path.values():
+            entry["rows"] = round(entry["rows"])
+            entry["fetches"].sort(key=lambda f: -f["rows"])
+        return sorted(by_path.values(), key=lambda e: -e["rows"])
+
+    def stats(self) -> dict:
+        one = lambda sql: self.db.execute(sql).fetchone()[0]
+        return {
+            "workflows": one("SELECT COUNT(*) FROM files"),
+            "nodes": one("SELECT COUNT(*) FROM nodes"),
+            "reads": one("SELECT COUNT(*) FROM nodes WHERE bound IS NOT NULL"),
+            "code_nodes": one("SELECT COUNT(*) FROM nodes WHERE code_len > 0"),
+            "findings": one("SELECT COUNT(*) FROM findings"),
+        }
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def parse_sizes(files: list, pairs: list) -> dict:
+    sizes = {}
+    for path in files or []:
+        with open(path, "r", encoding="utf-8") as f:
+            sizes.update({k: int(v) for k, v in json.load(f).items()})
+    for pair in pairs or []:
+        table, _, value = pair.partition("=")
+        sizes[table.strip()] = int(value)
+    return sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Indexed catalog and query-cost linter for n8n workflows")
+    parser.add_argument("--catalog", default=CATALOG_FILE, help="SQLite catalog path")
+    parser.add_argument("--root", action="append", help="Workflow dir / glob (default: workflows, clients/*/workflows)")
+    parser.add_argument("--json", action="store_true", help="Machine-readable output")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    idx = sub.add_parser("index", help="Refresh the catalog")
+    idx.add_argument("--force", action="store_true", help="Re-parse every file")
+
+    q = sub.add_parser("nodes", help="Query nodes")
+    q.add_argument("--type", help="Node type without prefix (supabase, code, postgres, ...)")
+    q.add_argument("--table")
+    q.add_argument("--operation")
+    q.add_argument("--return-all", action="store_true")
+    q.add_argument("--bound", help="Comma list of key,window,open,none,limit")
+    q.add_argument("--credential", help="Credential type or name (substring)")
+    q.add_argument("--ident", help="Identifier used in jsCode (e.g. CLINIC_ADDRESS, $('Fetch Services'))")
+    q.add_argument("--name", help="Node name substring")
+    q.add_argument("--path", help="Workflow path substring")
+
+    lint = sub.add_parser("lint", help="Report query-cost findings")
+    lint.add_argument("--rule")
+    lint.add_argument("--strict", action="store_true", help="Exit 1 if there are warnings")
+
+    cost = sub.add_parser("cost", help="Rank workflows by estimated rows pulled per run")
+    cost.add_argument("--sizes", action="append", help="JSON file {table: rows}")
+    cost.add_argument("--size", action="append", help="table=rows")
+    cost.add_argument("--history-days", type=float, default=DEFAULT_HISTORY_DAYS,
+                      help="Days of data the tables hold (scales windowed fetches)")
+
+    sub.add_parser("stats", help="Catalog statistics")
+    args = parser.parse_args()
+
+    catalog = WorkflowCatalog(args.catalog, args.root or DEFAULT_ROOTS)
+    try:
+        refreshed = catalog.refresh(force=getattr(args, "force", False))
+        if args.command == "index":
+            print(f"✅ {refreshed['parsed']} of {refreshed['files']} workflow(s) re-parsed, "
+                  f"{refreshed['removed']} removed in {refreshed['ms']} ms")
+            print(f"📊 {json.dumps(catalog.stats())}")
+
+        elif args.command == "nodes":
+            rows = catalog.nodes(args.type, args.table, args.operation, True if args.return_all else None,
+                                 args.bound.split(",") if args.bound else None, args.credential,
+                                 args.ident, args.name, args.path)
+            if args.json:
+                print(json.dumps(rows, indent=2, ensure_ascii=False))
+            else:
+                for r in rows:
+                    detail = f" {r['operation']} {r['table_name']}" if r["table_name"] else ""
+                    bound = f" [{r['bound']}{', returnAll' if r['return_all'] else ''}]" if r["bound"] else ""
+                    print(f"{r['path']}: {r['name']} ({r['type']}{detail}){bound}")
+                print(f"📊 {len(rows)} node(s)")
+
+        elif args.command == "lint":
+            findings = catalog.findings(args.rule)
+            if args.json:
+                print(json.dumps(findings, indent=2, ensure_ascii=False))
+            else:
+                for f in findings:
+                    icon = "⚠️ " if f["severity"] == "warning" else "💡"
+                    print(f"{icon} {f['path']}: {f['node']}: [{f['rule']}] {f['message']}")
+                warnings = sum(f["severity"] == "warning" for f in findings)
+                print(f"📊 {warnings} warning(s), {len(findings) - warnings} info")
+            if args.strict and any(f["severity"] == "warning" for f in findings):
+                sys.exit(1)
+
+        elif args.command == "cost":
+            sizes = parse_sizes(args.sizes, args.size)
+            ranking = catalog.estimate(sizes, args.history_days)
+            if args.json:
+                print(json.dumps(ranking, indent=2, ensure_ascii=False))
+            else:
+                print(f"{'Rows/run':>10}  Workflow")
+                for entry in ranking:
+                    print(f"{entry['rows']:>10}  {entry['path']}")
+                    for fetch in entry["fetches"]:
+                        assumed = " (assumed size)" if fetch["assumed_size"] else ""
+                        print(f"{fetch['rows']:>10}    {fetch['node']} -> {fetch['table']} "
+                              f"[{fetch['bound']}]{assumed}")
+                if any(f["assumed_size"] for e in ranking for f in e["fetches"]):
+                    print(f"⚠️  Tables without --size/--sizes assumed {DEFAULT_TABLE_ROWS} rows")
+
+        elif args.command == "stats":
+            print(json.dumps(catalog.stats(), indent=2))
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    finally:
+        catalog.close()
+
+
+if __name__ == "__main__":
+    main()
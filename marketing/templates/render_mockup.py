@@ -1,46 +1,47 @@
 import os
+import sys
+
+# Shared render engine lives in execution/mockup_renderer.py
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(REPO_ROOT, "execution"))
+from mockup_renderer import render_targets, print_stats
 
-# Configuration
 # Configuration
 TEMPLATE_PATH = "marketing/templates/modern_dental_site.html"
 OUTPUT_DIR = "marketing/outreach"
 
+def resolve(path):
+    """Relative paths work from the repo root or from any CWD (fallback to the repo root)."""
+    if os.path.exists(TEMPLATE_PATH):
+        return path
+    return os.path.join(REPO_ROOT, path)
+
+def generate_mockups(clinics, force=False):
+    """
+    Generates customized preview.html files for a batch of clinics.
+    The template is parsed once; pages whose template and data are unchanged are not rewritten.
+    """
+    template = resolve(TEMPLATE_PATH)
+    if not os.path.exists(template):
+        print(f"❌ Error: Template not found at {TEMPLATE_PATH}")
+        return None
+
+    output_dir = resolve(OUTPUT_DIR)
+    stats = render_targets(template, clinics, output_dir, "preview.html", force=force)
+    for slug in stats["rendered_slugs"]:
+        print(f"✅ Generated Mockup: {os.path.join(output_dir, slug, 'preview.html')}")
+    print_stats(stats, output_dir)
+    return stats
+
 def generate_mockup(clinic_name, phone, filename_slug):
     """
     Generates a customized HTML file for a clinic.
     """
-    # Ensure output directory exists
-    target_dir = os.path.join(OUTPUT_DIR, filename_slug)
-    os.makedirs(target_dir, exist_ok=True)
-    
-    # Read Template
-    template_to_use = TEMPLATE_PATH
-    if not os.path.exists(template_to_use):
-        # Fallback for relative path execution
-        base_path = os.path.join(os.getcwd(), template_to_use)
-        if os.path.exists(base_path):
-           template_to_use = base_path
-        else:
-           print(f"❌ Error: Template not found at {TEMPLATE_PATH}")
-           return
-
-    with open(template_to_use, "r", encoding="utf-8") as f:
-        content = f.read()
-    
-    # Substitute
-    content = content.replace("{{CLINIC_NAME}}", clinic_name)
-    content = content.replace("{{PHONE}}", phone)
-    
-    # Write Output
-    output_path = os.path.join(target_dir, "preview.html")
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(content)
-        
-    print(f"✅ Generated Mockup: {output_path}")
+    return generate_mockups([{"name": clinic_name, "phone": phone, "slug": filename_slug}])
 
 if __name__ == "__main__":
     print("--- Dental Clinic Mockup Generator (Trojan Horse) ---")
-    
+
     # Batch 2 Targets (High Probability)
     clinics = [
         {"name": "Alpha Dental Clinic", "phone": "+371 29206450", "slug": "alpha-dental-clinic"},
@@ -54,6 +55,5 @@ if __name__ == "__main__":
         {"name": "ComfortDent", "phone": "+371 29713775", "slug": "comfortdent"},
         {"name": "Smile Office", "phone": "+371 23302158", "slug": "smile-office"}
     ]
-    
-    for c in clinics:
-        generate_mockup(c["name"], c["phone"], c["slug"])
+
+    generate_mockups(clinics)
@@ -1,95 +1,231 @@
 #!/usr/bin/env python3
 """
-Update clinic address and email in n8n workflow JSON files.
-Works by parsing JSON properly and modifying jsCode strings.
+Update clinic address, phone, email and Maps URL in n8n workflow JSON files.
+Works by parsing JSON properly and modifying jsCode / message strings.
+
+All substitutions from a mapping file are compiled into one regex
+(longest match first) and applied in a single pass over every string.
+Files are processed in parallel and written atomically, and only when
+something actually changed.
+
+Usage:
+    python3 update_clinic_info.py                                  # built-in Butkeviča move, workflows/
+    python3 update_clinic_info.py --mapping clinic.json --dry-run  # show diff, write nothing
+    python3 update_clinic_info.py --mapping clinics.json           # bulk: list of jobs
+
+Mapping file (a single job object, or a list of them for bulk migrations):
+    {
+        "workflows": ["clients/acme/workflows"],       # dirs and/or files (default: workflows/)
+        "replace": {"Old street 1, Rīga": "New street 2, Rīga",
+                    "+371 11111111": "+371 22222222"},
+        "clinic_email": "info@acme.lv",                # optional: add CLINIC_EMAIL next to CLINIC_ADDRESS
+        "clinic_address": "New street 2, Rīga"
+    }
 """
-import json
 import os
 import re
+import sys
+import json
+import time
+import difflib
+import argparse
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+WORKFLOW_DIR = os.path.join(REPO_ROOT, 'workflows')
+FIELDS = ('jsCode', 'message')
 
-# New values
+# Built-in job (the original Butkeviča address move)
 NEW_ADDRESS = 'Dzirnavu iela 45, Centra rajons, Rīga, LV-1010'
 NEW_EMAIL = 'info@drbutkevicadentalpractice.com'
 NEW_MAPS_URL = 'https://maps.google.com/?q=Dzirnavu+iela+45,+Riga,+Latvia'
+DEFAULT_JOB = {
+    'workflows': [WORKFLOW_DIR],
+    'replace': {
+        'Dzirnavu iela 62A, Centra rajons, Rīga, LV-1050': NEW_ADDRESS,
+        'Dzirnavu iela 62A, Centra rajons, Rīga': NEW_ADDRESS,
+        'Dzirnavu iela 62A, Rīga': NEW_ADDRESS,
+        'Dzirnavu iela 62A, Riga': NEW_ADDRESS,
+        'Dzirnavu iela 62A.': 'Dzirnavu iela 45.',     # SMS short address
+        'https://maps.google.com/?q=Dzirnavu+iela+62A,+Riga,+Latvia': NEW_MAPS_URL,
+    },
+    'clinic_email': NEW_EMAIL,
+    'clinic_address': NEW_ADDRESS,
+}
+
+
+class Rewriter:
+    """All substitutions of one job, compiled into a single alternation."""
 
-# Old patterns to replace
-OLD_ADDRESS_PATTERNS = [
-    r"Dzirnavu iela 62A, Centra rajons, Rīga, LV-1050",
-    r"Dzirnavu iela 62A, Centra rajons, Rīga",
-    r"Dzirnavu iela 62A, Rīga",
-    r"Dzirnavu iela 62A, Riga",
-]
-
-# We also need to replace in SMS messages: "Dzirnavu iela 62A."
-OLD_SMS_ADDRESS = "Dzirnavu iela 62A."
-NEW_SMS_ADDRESS = "Dzirnavu iela 45."
-
-# Files to update
-WORKFLOW_DIR = '/home/as/Desktop/Antigravity/Workspace/src/widget/butkevica-dental-booking/workflows'
-WORKFLOW_FILES = [
-    'n8n-2-stripe-confirmation-supabase.json',
-    'n8n-5-google-review-request.json', 
-    'n8n-7-daily-reminders-and-recall.json',
-]
-
-def update_string(s):
-    """Update addresses in a string (typically jsCode or message fields)."""
-    # Replace full addresses
-    for pattern in OLD_ADDRESS_PATTERNS:
-        s = s.replace(pattern, NEW_ADDRESS)
-    
-    # Replace SMS short address
-    s = s.replace(OLD_SMS_ADDRESS, NEW_SMS_ADDRESS)
-    
-    # Replace Maps URL
-    s = s.replace(
-        'https://maps.google.com/?q=Dzirnavu+iela+62A,+Riga,+Latvia',
-        NEW_MAPS_URL
-    )
-    
-    # Add CLINIC_EMAIL if CLINIC_ADDRESS exists but CLINIC_EMAIL doesn't
-    if 'CLINIC_ADDRESS' in s and 'CLINIC_EMAIL' not in s:
-        s = s.replace(
-            f"const CLINIC_ADDRESS = '{NEW_ADDRESS}';",
-            f"const CLINIC_EMAIL = '{NEW_EMAIL}';\\nconst CLINIC_ADDRESS = '{NEW_ADDRESS}';"
-        )
-    
-    return s
-
-def update_node(node):
-    """Recursively update strings in a node."""
-    if isinstance(node, dict):
-        for key, value in node.items():
-            if key == 'jsCode' and isinstance(value, str):
-                node[key] = update_string(value)
-            elif key == 'message' and isinstance(value, str):
-                node[key] = update_string(value)
-            else:
-                update_node(value)
-    elif isinstance(node, list):
-        for item in node:
-            update_node(item)
-
-def update_workflow(filepath):
+    def __init__(self, job):
+        self.table = dict(job.get('replace') or {})
+        keys = sorted(self.table, key=len, reverse=True)     # longest match wins
+        self.pattern = re.compile('|'.join(map(re.escape, keys))) if keys else None
+        self.email = job.get('clinic_email')
+        self.address = job.get('clinic_address')
+        self.fields = tuple(job.get('fields') or FIELDS)
+
+    def update_string(self, s):
+        """Return (new string, number of substitutions)."""
+        count = 0
+        if self.pattern is not None:
+            def substitute(match):
+                nonlocal count
+                count += 1
+                return self.table[match.group(0)]
+            s = self.pattern.sub(substitute, s)
+
+        # Add CLINIC_EMAIL if CLINIC_ADDRESS exists but CLINIC_EMAIL doesn't
+        if self.email and self.address and 'CLINIC_ADDRESS' in s and 'CLINIC_EMAIL' not in s:
+            declaration = f"const CLINIC_ADDRESS = '{self.address}';"
+            if declaration in s:
+                s = s.replace(declaration, f"const CLINIC_EMAIL = '{self.email}';\\nconst CLINIC_ADDRESS = '{self.address}';")
+                count += 1
+        return s, count
+
+    def update_node(self, node, changes, label=''):
+        """Recursively update jsCode / message strings; records (label, field, old, new)."""
+        if isinstance(node, dict):
+            label = node.get('name', label) if isinstance(node.get('name'), str) else label
+            for key, value in node.items():
+                if key in self.fields and isinstance(value, str):
+                    new, count = self.update_string(value)
+                    if count and new != value:
+                        node[key] = new
+                        changes.append((label, key, value, new, count))
+                else:
+                    self.update_node(value, changes, label)
+        elif isinstance(node, list):
+            for item in node:
+                self.update_node(item, changes, label)
+
+
+def atomic_write(filepath, text):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(filepath), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.chmod(tmp, os.stat(filepath).st_mode & 0o777)
+        os.replace(tmp, filepath)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def update_workflow(job):
+    """Rewrite one file for one job; returns a result dict (runs in a worker process)."""
+    filepath, job_spec, dry_run, want_diff = job
+    timings = {}
+    started = time.perf_counter()
     with open(filepath, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    # Update all nodes
-    update_node(data)
-    
-    # Write back with proper formatting
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
-    
-    print(f"✅ {os.path.basename(filepath)} - updated successfully")
+        raw = f.read()
+    data = json.loads(raw)
+    timings['parse_ms'] = (time.perf_counter() - started) * 1000
 
-if __name__ == '__main__':
-    for wf_file in WORKFLOW_FILES:
-        filepath = os.path.join(WORKFLOW_DIR, wf_file)
-        if os.path.exists(filepath):
-            try:
-                update_workflow(filepath)
-            except Exception as e:
-                print(f"❌ {wf_file}: {e}")
+    t = time.perf_counter()
+    changes = []
+    Rewriter(job_spec).update_node(data, changes)
+    timings['rewrite_ms'] = (time.perf_counter() - t) * 1000
+
+    diff = []
+    if want_diff:
+        for label, field, old, new, _ in changes:
+            diff.extend(difflib.unified_diff(
+                old.splitlines(), new.splitlines(), lineterm='',
+                fromfile=f"{os.path.basename(filepath)} [{label}] {field}",
+                tofile=f"{os.path.basename(filepath)} [{label}] {field} (new)", n=1))
+
+    written = False
+    t = time.perf_counter()
+    if changes and not dry_run:
+        text = json.dumps(data, ensure_ascii=False, indent=4)
+        if raw.endswith('\n'):
+            text += '\n'
+        if text != raw:
+            atomic_write(filepath, text)
+            written = True
+    timings['write_ms'] = (time.perf_counter() - t) * 1000
+    timings['total_ms'] = (time.perf_counter() - started) * 1000
+
+    return {
+        'file': filepath,
+        'substitutions': sum(c[4] for c in changes),
+        'strings_changed': len(changes),
+        'written': written,
+        'diff': diff,
+        'timings': {k: round(v, 2) for k, v in timings.items()},
+    }
+
+
+def workflow_files(paths):
+    files = []
+    for path in paths:
+        path = path if os.path.isabs(path) else os.path.join(REPO_ROOT, path)
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, n) for n in sorted(os.listdir(path)) if n.endswith('.json'))
+        elif os.path.exists(path):
+            files.append(path)
         else:
-            print(f"⚠️ {wf_file} not found")
+            print(f"⚠️ {path} not found")
+    return files
+
+
+def load_jobs(mapping_path):
+    if not mapping_path:
+        return [DEFAULT_JOB]
+    with open(mapping_path, 'r', encoding='utf-8') as f:
+        spec = json.load(f)
+    jobs = spec if isinstance(spec, list) else [spec]
+    for job in jobs:
+        job.setdefault('workflows', [WORKFLOW_DIR])
+    return jobs
+
+
+def run(jobs, dry_run=False, show_diff=False, workers=None, file_override=None):
+    tasks = []
+    for job in jobs:
+        files = workflow_files(file_override or job['workflows'])
+        tasks.extend((path, job, dry_run, show_diff or dry_run) for path in files)
+
+    # Two jobs touching the same file must run in order, not in parallel
+    paths = [t[0] for t in tasks]
+    if len(set(paths)) != len(paths) or workers == 1 or len(tasks) < 2:
+        return [update_workflow(t) for t in tasks]
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(update_workflow, tasks))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Bulk-update clinic details in n8n workflow JSON")
+    parser.add_argument('--mapping', help="JSON mapping file (job object or list of jobs)")
+    parser.add_argument('--workflows', nargs='+', help="Override the job's workflow dirs/files")
+    parser.add_argument('--dry-run', action='store_true', help="Show the diff, write nothing")
+    parser.add_argument('--diff', action='store_true', help="Show the diff when writing too")
+    parser.add_argument('--workers', type=int, help="Parallel processes (default: CPU count)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    try:
+        results = run(load_jobs(args.mapping), args.dry_run, args.diff, args.workers, args.workflows)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    for r in results:
+        for line in r['diff']:
+            print(line)
+    print()
+    print(f"{'File':<48} {'Subs':>5} {'Parse ms':>9} {'Rewrite ms':>11} {'Write ms':>9}  Status")
+    for r in results:
+        t = r['timings']
+        status = ("✅ updated" if r['written'] else
+                  "📝 would update" if args.dry_run and r['substitutions'] else "⏭️  unchanged")
+        name = os.path.relpath(r['file'], REPO_ROOT) if r['file'].startswith(REPO_ROOT + os.sep) else r['file']
+        print(f"{name[-48:]:<48} {r['substitutions']:>5} "
+              f"{t['parse_ms']:>9} {t['rewrite_ms']:>11} {t['write_ms']:>9}  {status}")
+    changed = sum(1 for r in results if r['written'] or (args.dry_run and r['substitutions']))
+    print(f"📊 {len(results)} file(s), {changed} changed, "
+          f"{sum(r['substitutions'] for r in results)} substitution(s) in "
+          f"{(time.perf_counter() - started) * 1000:.0f} ms")
@@ -0,0 +1,54 @@
+-- ===========================================
+-- BOOKINGS updated_at - CHANGE TRACKING
+-- ===========================================
+-- Run this in Supabase SQL Editor
+-- Purpose: Give every booking row a reliable "last changed" timestamp so
+--          execution/recall_engine.py can sync only rows changed since its
+--          last run instead of re-reading the whole booking history.
+
+-- ===========================================
+-- STEP 1: Add the column (backfilled from created_at)
+-- ===========================================
+ALTER TABLE public.bookings
+ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ;
+
+UPDATE public.bookings
+SET updated_at = COALESCE(created_at, NOW())
+WHERE updated_at IS NULL;
+
+ALTER TABLE public.bookings
+ALTER COLUMN updated_at SET DEFAULT NOW(),
+ALTER COLUMN updated_at SET NOT NULL;
+
+-- ===========================================
+-- STEP 2: Bump updated_at on every UPDATE
+-- ===========================================
+CREATE OR REPLACE FUNCTION public.touch_bookings_updated_at()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SET search_path = ''
+AS $$
+BEGIN
+    NEW.updated_at := NOW();
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trigger_touch_bookings_updated_at ON public.bookings;
+
+CREATE TRIGGER trigger_touch_bookings_updated_at
+    BEFORE UPDATE ON public.bookings
+    FOR EACH ROW
+    EXECUTE FUNCTION public.touch_bookings_updated_at();
+
+-- ===========================================
+-- STEP 3: Index for the (updated_at, id) keyset scan
+-- ===========================================
+CREATE INDEX IF NOT EXISTS bookings_updated_at_id_idx
+    ON public.bookings (updated_at, id);
+
+-- ===========================================
+-- STEP 4: Verify
+-- ===========================================
+SELECT COUNT(*) AS bookings, MIN(updated_at), MAX(updated_at)
+FROM public.bookings;
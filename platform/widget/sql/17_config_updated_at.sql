@@ -0,0 +1,64 @@
+-- ===========================================
+-- CONFIG TABLES updated_at - CHANGE TRACKING
+-- ===========================================
+-- Run this in Supabase SQL Editor
+-- Purpose: Give the slow-changing configuration tables a reliable "last
+--          changed" timestamp so execution/config_mirror.py can sync only the
+--          rows edited since its last run. Same pattern as
+--          16_bookings_updated_at.sql. The working-hours tables already have
+--          the column (05_working_hours.sql) but nothing bumped it on UPDATE.
+-- Tables that do not exist in this project are skipped.
+
+-- ===========================================
+-- STEP 1: Shared trigger function
+-- ===========================================
+CREATE OR REPLACE FUNCTION public.touch_config_updated_at()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SET search_path = ''
+AS $$
+BEGIN
+    NEW.updated_at := NOW();
+    RETURN NEW;
+END;
+$$;
+
+-- ===========================================
+-- STEP 2: Column, trigger and index per table
+-- ===========================================
+DO $$
+DECLARE
+    tbl TEXT;
+BEGIN
+    FOREACH tbl IN ARRAY ARRAY[
+        'clinics', 'services', 'specialists', 'doctors_services',
+        'clinic_working_hours', 'specialist_working_hours'
+    ]
+    LOOP
+        IF to_regclass('public.' || tbl) IS NULL THEN
+            RAISE NOTICE 'Skipping %, table does not exist', tbl;
+            CONTINUE;
+        END IF;
+
+        EXECUTE format('ALTER TABLE public.%I ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ', tbl);
+        EXECUTE format('UPDATE public.%I SET updated_at = NOW() WHERE updated_at IS NULL', tbl);
+        EXECUTE format('ALTER TABLE public.%I ALTER COLUMN updated_at SET DEFAULT NOW(), '
+                       'ALTER COLUMN updated_at SET NOT NULL', tbl);
+
+        EXECUTE format('DROP TRIGGER IF EXISTS trigger_touch_%s_updated_at ON public.%I', tbl, tbl);
+        EXECUTE format('CREATE TRIGGER trigger_touch_%s_updated_at BEFORE UPDATE ON public.%I '
+                       'FOR EACH ROW EXECUTE FUNCTION public.touch_config_updated_at()', tbl, tbl);
+
+        EXECUTE format('CREATE INDEX IF NOT EXISTS %s_updated_at_id_idx ON public.%I (updated_at, id)',
+                       tbl, tbl);
+    END LOOP;
+END;
+$$;
+
+-- ===========================================
+-- STEP 3: Verify
+-- ===========================================
+SELECT event_object_table AS table_name, trigger_name
+FROM information_schema.triggers
+WHERE trigger_name LIKE 'trigger_touch_%_updated_at'
+ORDER BY 1;
@@ -9,6 +9,10 @@
 -- 2. n8n creates a NEW confirmed booking instead of updating the pending one
 -- 
 -- Run this in Supabase SQL Editor to clean up duplicates.
+--
+-- execution/slot_lock_sweeper.py now does this continuously (and expires
+-- lapsed locks); see directives/slot-lock-sweeper.md. Keep this script for
+-- one-off cleanups only.
 
 -- First, let's see what will be deleted (dry run)
 SELECT 
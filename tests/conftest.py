@@ -0,0 +1,10 @@
+"""Point the execution/ scripts at throwaway state before any of them is imported."""
+
+import os
+import sys
+import tempfile
+
+STATE_DIR = tempfile.mkdtemp(prefix="dlq-test-")
+os.environ["DLQ_DIR"] = STATE_DIR
+os.environ["CONFIG_MIRROR_PATH"] = os.path.join(STATE_DIR, "no-mirror.sqlite")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "execution"))
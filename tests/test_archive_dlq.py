@@ -0,0 +1,18 @@
+"""DLQ archive: records containing Unicode line separators must read back intact."""
+
+import os
+import tempfile
+
+from archive_dlq import append_block, read_block
+
+
+def test_block_lines_split_only_on_newline():
+    lines = ['{"file":"a.json","data":{"notes":"line\u2028sep\u2029par\u0085nel\x1crs"}}\n',
+             '{"file":"b.json","data":{}}\n']
+    with tempfile.TemporaryDirectory() as tmp:
+        segment = os.path.join(tmp, "segment-000001.jsonl.gz")
+        append_block(segment, ["{}\n"])
+        offset = append_block(segment, lines)
+        block = read_block(segment, offset)
+    assert block[0] + "\n" == lines[0]
+    assert block[1] + "\n" == lines[1]
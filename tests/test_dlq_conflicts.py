@@ -0,0 +1,78 @@
+"""DLQ replay conflict check: a failed insert must not block its own retry."""
+
+import json
+import os
+
+import recovery_dlq
+from recovery_dlq import DLQ_DIR
+
+
+class Response:
+    def __init__(self, data):
+        self.data = data
+
+
+class Query:
+    def __init__(self, client):
+        self.client = client
+        self.row = None
+
+    def select(self, *args):
+        return self
+
+    def eq(self, *args):
+        return self
+
+    def insert(self, row):
+        self.row = row
+        return self
+
+    def execute(self):
+        if self.row is None:
+            return Response([])               # stripe_session_id lookup: not in DB yet
+        self.client.insert_attempts += 1
+        if self.client.insert_attempts == 1:
+            raise ConnectionError("connection reset by peer")
+        return Response([dict(self.row, id=self.client.insert_attempts)])
+
+
+class FlakyClient:
+    """No existing bookings; the first insert fails with a connection error."""
+
+    def __init__(self):
+        self.insert_attempts = 0
+
+    def table(self, name):
+        return Query(self)
+
+    def stream(self, table, select="*", filters=None, **kwargs):
+        return iter([])
+
+    def select(self, table, select="*", filters=None, cache=False):
+        return []
+
+
+def write_dlq_file(name: str) -> str:
+    path = os.path.join(DLQ_DIR, name)
+    with open(path, "w") as f:
+        json.dump({"booking_data": {
+            "customer_email": "anna@example.com", "service_id": "s1",
+            "start_time": "2026-11-02T09:00:00Z", "end_time": "2026-11-02T10:00:00Z",
+            "status": "confirmed", "stripe_session_id": "cs_test_retry",
+        }}, f)
+    return path
+
+
+def test_failed_insert_releases_its_slot_for_the_retry():
+    client = FlakyClient()
+    path = write_dlq_file("failed-retry.json")
+    conflicts = recovery_dlq.build_conflict_index(client, [path])
+
+    assert recovery_dlq.process_file(client, path, conflicts=conflicts) == "failed"
+    assert os.path.exists(path)
+
+    # the watch session reuses the same index for the retry
+    assert recovery_dlq.process_file(client, path, conflicts=conflicts) == "recovered"
+    assert not os.path.exists(os.path.join(recovery_dlq.CONFLICT_DIR, "failed-retry.json"))
+    assert os.path.exists(os.path.join(recovery_dlq.PROCESSED_DIR, "failed-retry.json"))
+    assert conflicts.stats["conflicts"] == 0
@@ -0,0 +1,37 @@
+"""Slot lock sweeper: a failed PATCH must leave the lapsed locks scheduled for retry."""
+
+import pytest
+
+from slot_lock_sweeper import SlotLockSweeper
+
+
+class FlakyClient:
+    """The first PATCH fails with a connection error; later ones expire every id asked for."""
+
+    def __init__(self):
+        self.patches = 0
+
+    def update(self, table, params, values, returning=False):
+        self.patches += 1
+        if self.patches == 1:
+            raise ConnectionError("connection reset by peer")
+        ids = params["id"][len("in.("):-1].split(",")
+        return [{"id": int(i)} for i in ids]
+
+
+def test_failed_patch_keeps_lapsed_locks_for_the_next_sweep():
+    now = 1_800_000_000.0
+    sweeper = SlotLockSweeper(FlakyClient(), clock=lambda: now)
+    for booking_id in (1, 2):
+        sweeper.apply({"id": booking_id, "status": "pending", "customer_email": f"p{booking_id}@example.com",
+                       "start_time": "2027-01-04T09:00:00Z", "slot_lock_expires_at": "2027-01-15T08:00:00Z",
+                       "updated_at": "2027-01-15T07:45:00Z"})
+
+    with pytest.raises(ConnectionError):
+        sweeper.sweep()
+    assert sweeper.next_expiry() is not None
+
+    result = sweeper.sweep()
+    assert sorted(result["lock_ids"]) == [1, 2]
+    assert result["locks"] == 2
+    assert not sweeper.pending and sweeper.next_expiry() is None
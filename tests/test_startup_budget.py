@@ -0,0 +1,23 @@
+"""CLI start-up budget: the hot-path commands must stay cheap to import."""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+import ops
+
+
+@pytest.fixture(scope="module")
+def interpreter_modules():
+    """Modules a bare interpreter imports anyway (not charged to the scripts)."""
+    baseline = subprocess.run([sys.executable, "-X", "importtime", "-c", "pass"],
+                              stderr=subprocess.PIPE, text=True).stderr
+    return set(ops.parse_importtime(baseline))
+
+
+@pytest.mark.parametrize("argv", ops.STARTUP_CHECKS, ids=" ".join)
+def test_hot_path_imports_stay_under_budget(argv, interpreter_modules):
+    total, _, heaviest = ops.measure(argv, dict(os.environ), ops.STARTUP_RUNS, interpreter_modules)
+    assert total <= ops.STARTUP_BUDGET_MS, f"{' '.join(argv)}: {total:.1f} ms, heaviest {heaviest}"